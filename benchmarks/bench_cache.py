@@ -0,0 +1,63 @@
+"""Benchmarks repeated queries against a fixed set of planes and lines with
+and without a QueryCache, and the hit rates of several cache sizes.
+
+Run from the repository root with ``python -m benchmarks.bench_cache``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import (P3, Vec3, Line3, Plane, Intersection,
+                      ShortestDistance, QueryCache)
+
+PLANES = 20
+LINES = 200
+QUERIES = 20_000
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    planes = [Plane(P3(*rng.normal(size=3).tolist()),
+                    Vec3(*rng.normal(size=3).tolist()))
+              for _ in range(PLANES)]
+    lines = [Line3(Vec3(*rng.normal(size=3).tolist()),
+                   Vec3(*rng.normal(size=3).tolist()))
+             for _ in range(LINES)]
+    # callers ask about a skewed mix of the same lines and planes
+    picks = np.minimum(rng.zipf(1.5, size=(QUERIES, 2)) - 1, LINES - 1)
+    pairs = [(lines[i], planes[j % PLANES], lines[j])
+             for i, j in picks.tolist()]
+
+    queries = {
+        "line_plane": (Intersection.line_plane, QueryCache.line_plane,
+                       lambda line, plane, other: (line, plane)),
+        "contains_point": (Plane.contains_point,
+                           QueryCache.contains_point,
+                           lambda line, plane, other:
+                           (plane, line.point_at_t(1))),
+        "line_line": (ShortestDistance.line_line, QueryCache.line_line,
+                      lambda line, plane, other: (line, other)),
+    }
+    for name, (func, cached, arguments) in queries.items():
+        args = [arguments(*pair) for pair in pairs]
+        plain = min(timeit.repeat(lambda: [func(*a) for a in args],
+                                  number=1, repeat=5))
+        print(f"{name:>14}: uncached {plain * 1e3:7.2f} ms")
+        for max_bytes in (1 << 14, 1 << 17, 1 << 20):
+            for quantum in (0.0, 1e-9):
+                def run():
+                    cache = QueryCache(max_bytes, quantum)
+                    for a in args:
+                        cached(cache, *a)
+                    return cache
+                elapsed = min(timeit.repeat(run, number=1, repeat=5))
+                stats = run().stats()
+                print(f"{'':>14}  max_bytes={max_bytes:>8} "
+                      f"quantum={quantum:<6g}: {elapsed * 1e3:7.2f} ms "
+                      f"({plain / elapsed:4.2f}x), "
+                      f"hit rate {stats.hit_rate:.3f}, "
+                      f"{stats.entries} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmarks plane fitting on a noisy cloud of 1e6 points.
+
+Run from the repository root with ``python -m benchmarks.bench_fitting``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import fit_plane, ransac_planes
+
+N_POINTS = 1_000_000
+
+
+def make_cloud(n: int, seed: int = 0) -> np.ndarray:
+    """Two noisy planes with 20% uniformly distributed outliers"""
+    rng = np.random.default_rng(seed)
+    n_plane = int(n * 0.4)
+    floor = np.column_stack([
+        rng.uniform(-10, 10, n_plane),
+        rng.uniform(-10, 10, n_plane),
+        rng.normal(0, 0.01, n_plane),
+    ])
+    wall = np.column_stack([
+        rng.normal(5, 0.01, n_plane),
+        rng.uniform(-10, 10, n_plane),
+        rng.uniform(0, 10, n_plane),
+    ])
+    outliers = rng.uniform(-10, 10, (n - 2 * n_plane, 3))
+    return np.concatenate([floor, wall, outliers])
+
+
+def main() -> None:
+    cloud = make_cloud(N_POINTS)
+    floor = cloud[:int(N_POINTS * 0.4)]
+
+    t = min(timeit.repeat(lambda: fit_plane(floor), number=1, repeat=5))
+    print(f"fit_plane, {len(floor)} points: {t * 1e3:.1f} ms")
+
+    for iterations in (100, 500):
+        t = min(timeit.repeat(
+            lambda: ransac_planes(cloud, 0.05, max_planes=2,
+                                  iterations=iterations, seed=0),
+            number=1, repeat=3,
+        ))
+        print(f"ransac_planes, {N_POINTS} points, 2 planes, "
+              f"{iterations} iterations: {t * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
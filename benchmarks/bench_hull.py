@@ -0,0 +1,34 @@
+"""Benchmarks 2D and 3D convex hulls with and without the interior
+pre-filter.
+
+Run from the repository root with ``python -m benchmarks.bench_hull``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import convex_hull_2d, convex_hull_3d
+
+SIZE = 1_000_000
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    clouds = {
+        "uniform cube": rng.uniform(-1, 1, (SIZE, 3)),
+        "gaussian": rng.normal(size=(SIZE, 3)),
+    }
+    for name, points in clouds.items():
+        for dims, hull in ((2, convex_hull_2d), (3, convex_hull_3d)):
+            data = points[:, :dims]
+            times = [min(timeit.repeat(lambda: hull(data, prefilter=flag),
+                                       number=1, repeat=3))
+                     for flag in (True, False)]
+            print(f"{name:>12}, n={SIZE}, {dims}D: "
+                  f"prefilter {times[0] * 1e3:8.1f} ms, "
+                  f"no prefilter {times[1] * 1e3:8.1f} ms "
+                  f"({times[1] / times[0]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
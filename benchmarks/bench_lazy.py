@@ -0,0 +1,36 @@
+"""Benchmarks a chain of vector arithmetic evaluated eagerly and lazily.
+
+Run from the repository root with ``python -m benchmarks.bench_lazy``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import Vec3Array
+
+SIZES = (100_000, 1_000_000, 10_000_000)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        v1, v2, v3 = (Vec3Array(rng.normal(size=(size, 3)))
+                      for _ in range(3))
+        eager = min(timeit.repeat(
+            lambda: ((v1 + v2) * 3 - v3) / 2, number=1, repeat=5
+        ))
+        lazy = min(timeit.repeat(
+            lambda: (((v1.lazy() + v2) * 3 - v3) / 2).evaluate(),
+            number=1, repeat=5
+        ))
+        lazy_z = min(timeit.repeat(
+            lambda: (((v1.lazy() + v2) * 3 - v3) / 2).z,
+            number=1, repeat=5
+        ))
+        print(f"n={size:>10}: eager {eager * 1e3:8.2f} ms, "
+              f"lazy {lazy * 1e3:8.2f} ms ({eager / lazy:.2f}x), "
+              f"lazy z only {lazy_z * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmarks rays against a triangle mesh with the box hierarchy and
+against every triangle.
+
+Run from the repository root with ``python -m benchmarks.bench_mesh``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import Line3Array, TriangleMesh, line_mesh_intersections
+
+RAYS = 10_000
+
+
+def sphere(subdivisions: int) -> TriangleMesh:
+    """A UV sphere of radius 1 with 2 * subdivisions^2 triangles"""
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, subdivisions + 1),
+                             np.linspace(0, 2 * np.pi, subdivisions + 1),
+                             indexing="ij")
+    vertices = np.stack([np.sin(theta) * np.cos(phi),
+                         np.sin(theta) * np.sin(phi),
+                         np.cos(theta)], axis=-1).reshape(-1, 3)
+    index = np.arange(len(vertices)).reshape(subdivisions + 1, -1)
+    a, b = index[:-1, :-1].ravel(), index[:-1, 1:].ravel()
+    c, d = index[1:, :-1].ravel(), index[1:, 1:].ravel()
+    faces = np.concatenate([np.stack([a, c, b], 1), np.stack([b, c, d], 1)])
+    return TriangleMesh(vertices, faces)
+
+
+def brute_force(lines: Line3Array, mesh: TriangleMesh) -> np.ndarray:
+    """The nearest hit of every line found by testing every triangle"""
+    nearest = np.full(len(lines), np.inf)
+    for face in mesh.faces:
+        single = TriangleMesh(mesh.vertices, [face])
+        np.minimum(nearest, line_mesh_intersections(lines, single)[0],
+                   out=nearest)
+    return nearest
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    origins = rng.normal(size=(RAYS, 3)) * 3
+    lines = Line3Array(origins, rng.uniform(-0.5, 0.5, (RAYS, 3)) - origins)
+    for subdivisions in (16, 64, 256):
+        mesh = sphere(subdivisions)
+        build = min(timeit.repeat(lambda: TriangleMesh(
+            mesh.vertices, mesh.faces)._boxes(), number=1, repeat=3))
+        accelerated = min(timeit.repeat(
+            lambda: line_mesh_intersections(lines, mesh), number=1, repeat=3
+        ))
+        line = f"{len(mesh):>7} triangles, {RAYS} rays: " \
+               f"hierarchy build {build * 1e3:7.1f} ms, " \
+               f"intersect {accelerated * 1e3:8.1f} ms"
+        if len(mesh) <= 10_000:
+            brute = min(timeit.repeat(lambda: brute_force(lines, mesh),
+                                      number=1, repeat=1))
+            line += f", every triangle {brute * 1e3:8.1f} ms " \
+                    f"({brute / accelerated:.0f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Benchmarks octree box and frustum queries against testing every point.
+
+Run from the repository root with ``python -m benchmarks.bench_octree``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import AABB, Frustum, Octree, P3, Vec3
+
+SIZES = (100_000, 1_000_000, 4_000_000)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    box = AABB(P3(-10, -10, -10), P3(10, 10, 10))
+    frustum = Frustum.perspective(P3(0, 0, -150), P3(0, 0, 0),
+                                  Vec3(0, 1, 0), fov_deg=10, aspect=1,
+                                  near=1, far=200)
+    for size in SIZES:
+        points = rng.uniform(-100, 100, (size, 3))
+        build = min(timeit.repeat(lambda: Octree.from_points(points),
+                                  number=1, repeat=3))
+        tree = Octree.from_points(points)
+        for name, view, query in (("box", box, tree.query_box),
+                                  ("frustum", frustum, tree.query_frustum)):
+            brute = min(timeit.repeat(
+                lambda: np.flatnonzero(view.contains_points(points)),
+                number=1, repeat=5
+            ))
+            culled = min(timeit.repeat(lambda: query(view),
+                                       number=1, repeat=5))
+            print(f"n={size:>9} {name:>7}: build {build * 1e3:8.1f} ms, "
+                  f"brute force {brute * 1e3:8.2f} ms, "
+                  f"octree {culled * 1e3:8.2f} ms "
+                  f"({brute / culled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmarks space-filling curve keys, and spatial structures built over
+points in random order and in Hilbert order.
+
+Run from the repository root with ``python -m benchmarks.bench_ordering``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import (
+    Octree, SpatialHashGrid, hilbert_keys, morton_keys, reorder,
+)
+
+SIZES = (100_000, 1_000_000)
+
+
+def pairs(points: np.ndarray) -> None:
+    grid = SpatialHashGrid(0.01)
+    grid.rebuild(points)
+    grid.pairs_within(0.005)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        points = rng.uniform(0, 1, (size, 3))
+        morton = min(timeit.repeat(lambda: morton_keys(points),
+                                   number=1, repeat=3))
+        hilbert = min(timeit.repeat(lambda: hilbert_keys(points),
+                                    number=1, repeat=3))
+        ordered, = reorder(points)
+        print(f"n={size:>9}: morton keys {morton * 1e3:7.1f} ms, "
+              f"hilbert keys {hilbert * 1e3:7.1f} ms")
+        for name, func in (("octree build", Octree.from_points),
+                           ("hash grid pairs", pairs)):
+            unordered = min(timeit.repeat(lambda: func(points),
+                                          number=1, repeat=3))
+            coherent = min(timeit.repeat(lambda: func(ordered),
+                                         number=1, repeat=3))
+            print(f"  {name:>15}: random order {unordered * 1e3:8.1f} ms, "
+                  f"hilbert order {coherent * 1e3:8.1f} ms "
+                  f"({unordered / coherent:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
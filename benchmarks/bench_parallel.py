@@ -0,0 +1,66 @@
+"""Benchmarks ParallelExecutor against the single-process batch functions
+for different worker counts.
+
+Run from the repository root with ``python -m benchmarks.bench_parallel``
+"""
+import os
+import timeit
+
+import numpy as np
+
+from vectorzz import (
+    Line3Array, ParallelExecutor, Plane, P3, Vec3,
+    knn, line_plane_intersections, point_plane_distances,
+)
+
+N_POINTS = 10_000_000
+N_KNN_POINTS = 50_000
+N_KNN_QUERIES = 5_000
+
+
+def best_of(func, repeat: int = 3) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-10, 10, (N_POINTS, 3))
+    lines = Line3Array(points, rng.uniform(-1, 1, (N_POINTS, 3)))
+    knn_points = points[:N_KNN_POINTS]
+    queries = points[-N_KNN_QUERIES:]
+    plane = Plane(P3(0, 0, 1), Vec3(1, 2, 3))
+
+    serial = {
+        "distances": best_of(lambda: point_plane_distances(points, plane)),
+        "intersections": best_of(
+            lambda: line_plane_intersections(lines, plane)
+        ),
+        "knn": best_of(lambda: knn(knn_points, queries, 8), repeat=1),
+    }
+    for name, t in serial.items():
+        print(f"{name:>13}, serial: {t * 1e3:8.1f} ms")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ParallelExecutor(workers=workers) as executor:
+            # start the worker processes before timing
+            executor.point_plane_distances(points[:workers], plane)
+            timings = {
+                "distances": best_of(
+                    lambda: executor.point_plane_distances(points, plane)
+                ),
+                "intersections": best_of(
+                    lambda: executor.line_plane_intersections(lines, plane)
+                ),
+                "knn": best_of(
+                    lambda: executor.knn(knn_points, queries, 8), repeat=1
+                ),
+            }
+        for name, t in timings.items():
+            print(f"{name:>13}, {workers:2} workers: {t * 1e3:8.1f} ms "
+                  f"({serial[name] / t:.2f}x)")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
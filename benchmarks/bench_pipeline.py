@@ -0,0 +1,66 @@
+"""Benchmarks streaming points from a local socket through no stages,
+through filter stages on the event loop and offloaded to threads, and
+through the filters and dedupe.
+
+Run from the repository root with ``python -m benchmarks.bench_pipeline``
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from vectorzz import (P3, Vec3, Plane, AABB, Pipeline, socket_source,
+                      transform, filter_plane, filter_box, dedupe)
+
+SIZE = 4_000_000
+PIECE_BYTES = 1 << 16
+
+
+def stages(offload: bool, deduplicate: bool) -> list:
+    result = [
+        transform(np.eye(3), [0, 0, 0.1], offload=offload),
+        filter_plane(Plane(P3(0, 0, 0), Vec3(0, 0, 1)), offload=offload),
+        filter_box(AABB(P3(-2, -2, -2), P3(2, 2, 2)), offload=offload),
+    ]
+    if deduplicate:
+        result.append(dedupe(1e-3, offload=offload))
+    return result
+
+
+async def stream(payload: bytes, address: str, steps: list) -> float:
+    async def serve(reader, writer):
+        for start in range(0, len(payload), PIECE_BYTES):
+            writer.write(payload[start:start + PIECE_BYTES])
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_unix_server(serve, address)
+    async with server:
+        start = time.perf_counter()
+        await Pipeline(socket_source(address), steps).run()
+        elapsed = time.perf_counter() - start
+    os.unlink(address)
+    return elapsed
+
+
+def main() -> None:
+    payload = np.random.default_rng(0).normal(size=(SIZE, 3)).tobytes()
+    megabytes = len(payload) / 2 ** 20
+    with tempfile.TemporaryDirectory() as directory:
+        address = os.path.join(directory, "bench.sock")
+        runs = [("no stages", [])]
+        runs += [(f"filters, offload={offload}", stages(offload, False))
+                 for offload in (False, True)]
+        runs += [("filters and dedupe, offload=True", stages(True, True))]
+        for name, steps in runs:
+            elapsed = asyncio.run(stream(payload, address, steps))
+            print(f"{SIZE} points ({megabytes:.0f} MB), {name:>33}: "
+                  f"{elapsed * 1e3:8.1f} ms, "
+                  f"{SIZE / elapsed / 1e6:6.2f} M points/s, "
+                  f"{megabytes / elapsed:6.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Benchmarks classifying points against zone polygons.
+
+Run from the repository root with ``python -m benchmarks.bench_planar``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import Polygon, points_in_polygons
+
+SIZES = (100_000, 1_000_000, 5_000_000)
+
+
+def zones(count: int, vertices: int) -> list[Polygon]:
+    """Irregular polygons around the centers of a count x count grid"""
+    rng = np.random.default_rng(1)
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    result = []
+    for cx in range(count):
+        for cy in range(count):
+            radii = rng.uniform(0.3, 0.5, vertices)
+            result.append(Polygon(np.stack([
+                cx + 0.5 + radii * np.cos(angles),
+                cy + 0.5 + radii * np.sin(angles),
+            ], axis=1)))
+    return result
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    polygons = zones(20, 200)
+    print(f"{len(polygons)} zones with 200 vertices each")
+    for size in SIZES:
+        points = rng.uniform(0, 20, (size, 2))
+        elapsed = min(timeit.repeat(
+            lambda: points_in_polygons(points, polygons), number=1, repeat=3
+        ))
+        print(f"n={size:>9}: {elapsed * 1e3:8.1f} ms, "
+              f"{size / elapsed / 1e6:.1f} M points/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Benchmarks the batch functions on float64 and float32 collections.
+
+Run from the repository root with ``python -m benchmarks.bench_precision``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import (P3, Vec3, Plane, P3Array, Vec3Array, Line3Array,
+                      point_plane_distances, line_plane_intersections, knn)
+
+SIZES = (100_000, 1_000_000, 10_000_000)
+KNN_SIZE = 20_000
+
+
+def best(func) -> float:
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    plane = Plane(P3(0, 0, 0.5), Vec3(1, 2, 3))
+    for size in SIZES:
+        a, b = rng.normal(size=(size, 3)), rng.normal(size=(size, 3))
+        for dtype in (np.float64, np.float32):
+            points = P3Array(a, dtype)
+            v1, v2 = Vec3Array(a, dtype), Vec3Array(b, dtype)
+            lines = Line3Array(a, b, dtype)
+            distances = best(lambda: point_plane_distances(points, plane))
+            dot = best(lambda: v1.dot(v2))
+            cross = best(lambda: v1.cross(v2))
+            intersections = best(
+                lambda: line_plane_intersections(lines, plane)
+            )
+            print(f"n={size:>10} {np.dtype(dtype).name}: "
+                  f"{points.data.nbytes / 2 ** 20:7.1f} MB, "
+                  f"distances {size / distances / 1e6:7.1f} M/s, "
+                  f"dot {size / dot / 1e6:7.1f} M/s, "
+                  f"cross {size / cross / 1e6:7.1f} M/s, "
+                  f"line-plane {size / intersections / 1e6:7.1f} M/s")
+
+    data = rng.normal(size=(KNN_SIZE, 3))
+    for dtype in (np.float64, np.float32):
+        points = P3Array(data, dtype)
+        elapsed = best(lambda: knn(points, points[:2000], k=8))
+        print(f"knn {KNN_SIZE} points, 2000 queries, "
+              f"{np.dtype(dtype).name}: {elapsed * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
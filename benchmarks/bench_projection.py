@@ -0,0 +1,56 @@
+"""Benchmarks projecting points onto lines one at a time with
+Line3.closest_point against point_line_projections, and snapping points to
+the nearest of many segments.
+
+Run from the repository root with ``python -m benchmarks.bench_projection``
+"""
+import timeit
+
+import numpy as np
+
+from vectorzz import (P3Array, Line3Array, point_line_projections,
+                      nearest_segment_projections)
+
+POINTS = 100_000
+SCALAR_POINTS = 10_000
+SEGMENTS = (10, 100, 1000)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    points = P3Array(rng.normal(size=(POINTS, 3)))
+    lines = Line3Array(rng.normal(size=(POINTS, 3)),
+                       rng.normal(size=(POINTS, 3)))
+
+    scalar_points = points[:SCALAR_POINTS].to_points()
+    scalar_lines = lines[:SCALAR_POINTS].to_lines()
+    seconds = min(timeit.repeat(
+        lambda: [line.closest_point(point)
+                 for line, point in zip(scalar_lines, scalar_points)],
+        number=1, repeat=3,
+    ))
+    print(f"Line3.closest_point:       "
+          f"{SCALAR_POINTS / seconds / 1e6:7.2f} M points/s")
+    for dtype in (np.float64, np.float32):
+        data, batch = points.astype(dtype), lines.astype(dtype)
+        seconds = min(timeit.repeat(
+            lambda: point_line_projections(data, batch),
+            number=1, repeat=5,
+        ))
+        print(f"point_line_projections "
+              f"{np.dtype(dtype).name}: {POINTS / seconds / 1e6:7.2f} "
+              f"M points/s")
+
+    for count in SEGMENTS:
+        segments = lines[:count]
+        queries = points[:POINTS * 10 // count]
+        seconds = min(timeit.repeat(
+            lambda: nearest_segment_projections(queries, segments),
+            number=1, repeat=3,
+        ))
+        print(f"nearest_segment_projections, {count:4} segments: "
+              f"{len(queries) * count / seconds / 1e6:7.2f} M pairs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmarks saving and loading collections and scenes in the binary
+format against pickling them.
+
+Run from the repository root with ``python -m benchmarks.bench_serialization``
+"""
+import os
+import pickle
+import tempfile
+import timeit
+
+import numpy as np
+
+from vectorzz import P3, Vec3, P3Array, Scene, save, load
+
+SIZES = (1_000_000, 10_000_000)
+SCENE_SIZE = 100_000
+
+
+def best(func) -> float:
+    return min(timeit.repeat(func, number=1, repeat=3))
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.vzz")
+        for size in SIZES:
+            points = P3Array(rng.normal(size=(size, 3)))
+            megabytes = points.data.nbytes / 2 ** 20
+            saving = best(lambda: save(path, points))
+            loading = best(lambda: load(path))
+            mapping = best(lambda: load(path, mmap=True))
+            pickling = best(lambda: pickle.loads(pickle.dumps(points, 5)))
+            print(f"P3Array n={size:>10} ({megabytes:6.1f} MB): "
+                  f"save {megabytes / saving:7.0f} MB/s, "
+                  f"load {megabytes / loading:7.0f} MB/s, "
+                  f"mmap load {mapping * 1e3:6.2f} ms, "
+                  f"pickle round trip {megabytes / pickling:7.0f} MB/s")
+
+        scene = Scene()
+        data = rng.normal(size=(SCENE_SIZE, 3)).tolist()
+        scene.add(*(P3(*row) for row in data), *(Vec3(*row) for row in data))
+        legacy = best(lambda: pickle.loads(pickle.dumps(vars(scene))))
+
+        def round_trip() -> Scene:
+            save(path, scene)
+            return load(path)
+
+        binary = best(round_trip)
+        print(f"Scene with {SCENE_SIZE} points and vectors: "
+              f"pickling the objects {legacy * 1e3:8.2f} ms, "
+              f"binary round trip {binary * 1e3:8.2f} ms "
+              f"({legacy / binary:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Benchmarks the workers= parameter of the batch functions against
+single-threaded calls for 1e4 to 1e7 points.
+
+Run from the repository root with ``python -m benchmarks.bench_threads``
+"""
+import os
+import timeit
+
+import numpy as np
+
+from vectorzz import (
+    Line3Array, Plane, P3, Vec3,
+    line_plane_intersections, plane_contains_points, point_plane_distances,
+)
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def best_of(func) -> float:
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    workers = os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    plane = Plane(P3(0, 0, 1), Vec3(1, 2, 3))
+    print(f"{workers} workers")
+    for size in SIZES:
+        points = rng.uniform(-10, 10, (size, 3))
+        lines = Line3Array(points, rng.uniform(-1, 1, (size, 3)))
+        kernels = {
+            "distances": lambda w: point_plane_distances(
+                points, plane, workers=w
+            ),
+            "contains": lambda w: plane_contains_points(
+                plane, points, 0.1, workers=w
+            ),
+            "intersections": lambda w: line_plane_intersections(
+                lines, plane, workers=w
+            ),
+        }
+        for name, kernel in kernels.items():
+            serial = best_of(lambda: kernel(1))
+            threaded = best_of(lambda: kernel(workers))
+            print(f"{name:>13}, n={size:>10}: {serial * 1e3:9.3f} ms -> "
+                  f"{threaded * 1e3:9.3f} ms ({serial / threaded:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,37 @@ from vectorzz import is_scalar_multiple
 from vectorzz import Intersection
 from vectorzz import XY_PLANE, ZX_PLANE, YZ_PLANE
 from vectorzz import ShortestDistance
+from vectorzz import P3Array
+from vectorzz import point_plane_distances, plane_contains_points
+from vectorzz import fit_plane, ransac_planes
+from vectorzz import Line3Array, line_plane_intersections, knn
+from vectorzz import ParallelExecutor
+from vectorzz import Vec3Array, LazyVec3
+from vectorzz import PlaneArray, line_line_closest_points
+from vectorzz import plane_plane_intersections, pairwise_plane_intersections
+from vectorzz import plane_plane_plane_intersections
+from vectorzz import AABB, AABBArray, box_box_overlaps, line_box_intersections
+from vectorzz import SpatialHashGrid
+from vectorzz import Octree, Frustum
+from vectorzz import morton_keys, hilbert_keys, spatial_order, reorder
+from vectorzz import TriangleMesh, line_mesh_intersections
+from vectorzz import P2, P2Array, Segment2Array, Polygon
+from vectorzz import points_in_polygons, segment_intersections
+from vectorzz import pairwise_segment_intersections
+from vectorzz import convex_hull_2d, convex_hull_3d
+from vectorzz import save, load, dumps, loads
+from vectorzz import Pipeline, Stage, array_source, file_source, pipe_source
+from vectorzz import socket_source, transform, filter_plane, filter_box
+from vectorzz import dedupe, ArraySink, SceneSink, FileSink
+from vectorzz import QueryCache
+from vectorzz.batch import _split_rows as split_rows
+from vectorzz import point_line_projections, point_segment_projections
+from vectorzz import point_plane_projections, nearest_segment_projections
+import threading
+import asyncio
+import os
+import pickle
+import numpy as np
 
 
 def test_initialize_vec3():
@@ -475,12 +506,80 @@ def test_plane_is_parallel():
         p1.is_parallel(Vec2(1, 2))
 
 
+def test_line3_zero_direction_components():
+    line1 = Line3(Vec3(0, 0, 0), Vec3(0, 0, 1))
+    line2 = Line3(Vec3(1, 1, 0), Vec3(0, 0, 2))
+    assert line1.is_parallel(line2)
+    assert line1.contains_point(P3(0, 0, 5))
+    assert not line1.contains_point(P3(0, 1, 5))
+    assert line1 == Line3(Vec3(0, 0, 3), Vec3(0, 0, -1))
+
+
+def test_line3_cache_invalidation():
+    line = Line3(Vec3(0, 0, 0), Vec3(3, 0, 4))
+    assert line.direction_squared_magnitude == 25
+    assert line.unit_direction == Vec3(0.6, 0, 0.8)
+    line.direction_vector = Vec3(0, 2, 0)
+    assert line.direction_squared_magnitude == 4
+    assert line.unit_direction == Vec3(0, 1, 0)
+    assert line.contains_point(P3(0, 7, 0))
+    line.origin_vector = Vec3(1, 0, 0)
+    assert not line.contains_point(P3(0, 7, 0))
+    with pytest.raises(ValueError):
+        Line3(Vec3(0, 0, 0), Vec3(0, 0, 0)).unit_direction
+
+
+def test_plane_canonical_form():
+    plane = Plane(P3(0, 0, 2), Vec3(0, 0, 4))
+    unit_normal, distance = plane.canonical_form()
+    assert unit_normal == Vec3(0, 0, 1)
+    assert distance == -2
+    assert plane.normal_squared_magnitude == 16
+    assert plane.signed_distance(P3(5, 5, 5)) == 3
+    assert plane.signed_distance(P3(5, 5, 0)) == -2
+    plane.point = P3(0, 0, 0)
+    assert plane.d == 0
+    assert plane.signed_distance(P3(5, 5, 5)) == 5
+    plane.normal = Vec3(1, 0, 0)
+    assert plane.unit_normal == Vec3(1, 0, 0)
+    assert plane.contains_point(P3(0, 3, 3))
+
+
+def test_plane_from_normal_and_d():
+    plane = Plane.from_normal_and_d(Vec3(1, 0, 0), -2)
+    assert plane.d == -2
+    assert plane.point == P3(2, 0, 0)
+    assert plane.contains_point(P3(2, 7, -1))
+    assert plane == Plane(P3(2, 1, 1), Vec3(-3, 0, 0))
+    assert XY_PLANE == XY_PLANE
+    assert XY_PLANE != YZ_PLANE
+    with pytest.raises(ValueError):
+        Plane.from_normal_and_d(Vec3(0, 0, 0), 1)
+
+
 def test_point_at_t():
     l1 = Line3(Vec3(1, 2, 3), Vec3(4, 5, 6))
     assert l1.point_at_t(0) == P3(1, 2, 3)
     assert l1.point_at_t(1) == P3(5, 7, 9)
 
 
+def test_closest_point():
+    line = Line3(Vec3(1, 1, 0), Vec3(2, 0, 0))
+    assert line.closest_t(P3(7, 4, 4)) == 3
+    assert line.closest_point(P3(7, 4, 4)) == P3(7, 1, 0)
+    assert line.closest_t(P3(-3, 1, 0)) == -2
+    assert Line3(Vec3(1, 1, 0), Vec3(0, 0, 0)).closest_t(P3(7, 4, 4)) == 0
+    # exact inputs give exact results
+    diagonal = Line3(Vec3(0, 0, 0), Vec3(1, 1, 1))
+    assert diagonal.closest_t(P3(1, 1, 1)) == 1
+    assert diagonal.closest_point(P3(2, 2, 2)) == P3(2, 2, 2)
+    plane = Plane(P3(0, 0, 1), Vec3(0, 0, 2))
+    assert plane.closest_point(P3(3, 4, -2)) == P3(3, 4, 1)
+    assert plane.closest_point(P3(3, 4, 1)) == P3(3, 4, 1)
+    with pytest.raises(ValueError):
+        Plane(P3(0, 0, 0), Vec3(0, 0, 0)).closest_point(P3(1, 2, 3))
+
+
 def test_line_plane_intersection():
     plane = Plane.from_normal_and_d(Vec3(3, -2, 1), -10)
     line = Line3(Vec3(2, 1, 0), Vec3(-1, 1, 3))
@@ -503,6 +602,64 @@ def test_line_plane_intersection():
     assert Intersection.line_plane(line, YZ_PLANE) is None
 
 
+def test_line_line_intersection():
+    line1 = Line3(Vec3(0, 0, 0), Vec3(1, 0, 0))
+    line2 = Line3(Vec3(2, -1, 0), Vec3(0, 1, 0))
+    assert Intersection.line_line(line1, line2) == P3(2, 0, 0)
+    assert Intersection.closest_points(line1, line2) == \
+        (P3(2, 0, 0), P3(2, 0, 0))
+    skew = Line3(Vec3(2, -1, 3), Vec3(0, 1, 0))
+    assert Intersection.line_line(line1, skew) is None
+    assert Intersection.closest_points(line1, skew) == \
+        (P3(2, 0, 0), P3(2, 0, 3))
+    assert Intersection.line_line(line1, skew, tolerance=3) == P3(2, 0, 1.5)
+    assert Intersection.line_line(line1, Line3(Vec3(0, 0, 0), Vec3(-2, 0, 0)))\
+        == line1
+    assert Intersection.line_line(line1, Line3(Vec3(0, 1, 0), Vec3(1, 0, 0)))\
+        is None
+    assert Intersection.closest_points(line1, line1) is None
+
+    # a line with a zero direction vector is a single point
+    on_line = Line3(Vec3(3, 0, 0), Vec3(0, 0, 0))
+    off_line = Line3(Vec3(3, 2, 0), Vec3(0, 0, 0))
+    for args in ((on_line, line1), (line1, on_line)):
+        assert Intersection.line_line(*args) == P3(3, 0, 0)
+    for args in ((off_line, line1), (line1, off_line)):
+        assert Intersection.line_line(*args) is None
+    assert Intersection.line_line(off_line, line1, tolerance=2) \
+        == P3(3, 2, 0)
+    assert Intersection.line_line(on_line, on_line) == P3(3, 0, 0)
+    assert Intersection.line_line(on_line, off_line) is None
+
+
+def test_plane_plane_intersection():
+    plane = Plane(P3(1, 0, 0), Vec3(1, 0, 0))
+    line = Intersection.plane_plane(XY_PLANE, plane)
+    assert line == Line3(Vec3(1, 0, 0), Vec3(0, 5, 0))
+    plane1 = Plane(P3(1, 2, 3), Vec3(1, 1, 0))
+    plane2 = Plane(P3(1, 2, 3), Vec3(0, 1, 1))
+    line = Intersection.plane_plane(plane1, plane2)
+    assert plane1.contains_point(line.point_at_t(2))
+    assert plane2.contains_point(line.point_at_t(2))
+    assert Intersection.plane_plane(XY_PLANE, XY_PLANE) is XY_PLANE
+    assert Intersection.plane_plane(
+        XY_PLANE, Plane(P3(0, 0, 1), Vec3(0, 0, 1))
+    ) is None
+
+
+def test_plane_plane_plane_intersection():
+    plane1 = Plane(P3(1, 2, 3), Vec3(1, 0, 0))
+    plane2 = Plane(P3(1, 2, 3), Vec3(1, 1, 0))
+    plane3 = Plane(P3(1, 2, 3), Vec3(0, 1, 1))
+    assert Intersection.plane_plane_plane(plane1, plane2, plane3) == \
+        P3(1, 2, 3)
+    assert Intersection.plane_plane_plane(XY_PLANE, YZ_PLANE, ZX_PLANE) == \
+        P3(0, 0, 0)
+    assert Intersection.plane_plane_plane(
+        XY_PLANE, Plane(P3(0, 0, 1), Vec3(0, 0, 1)), YZ_PLANE
+    ) is None
+
+
 def test_shortest_distance_point_point():
     p1 = P3(1, 2, 3)
     p2 = P3(4, 5, 6)
@@ -518,23 +675,65 @@ def test_shortest_distance_point_point():
 
 
 def test_shortest_distance_line_line():
-    pass
+    line1 = Line3(Vec3(0, 0, 0), Vec3(1, 0, 0))
+    assert ShortestDistance.line_line(
+        line1, Line3(Vec3(2, -1, 3), Vec3(0, 1, 0))
+    ) == 3
+    assert ShortestDistance.line_line(
+        line1, Line3(Vec3(0, 3, 4), Vec3(2, 0, 0))
+    ) == 5
+    assert ShortestDistance.line_line(line1, line1) == 0
+    # lines with a zero direction vector are single points
+    point = Line3(Vec3(3, 4, 0), Vec3(0, 0, 0))
+    assert ShortestDistance.line_line(point, line1) == 4
+    assert ShortestDistance.line_line(line1, point) == 4
+    assert ShortestDistance.line_line(
+        point, Line3(Vec3(0, 0, 0), Vec3(0, 0, 0))
+    ) == 5
 
 
 def test_shortest_distance_line_plane():
-    pass
+    assert ShortestDistance.line_plane(
+        Line3(Vec3(0, 0, 3), Vec3(1, 1, 0)), XY_PLANE
+    ) == 3
+    assert ShortestDistance.line_plane(
+        Line3(Vec3(0, 0, -3), Vec3(1, 1, 0)), XY_PLANE
+    ) == 3
+    assert ShortestDistance.line_plane(
+        Line3(Vec3(0, 0, 3), Vec3(1, 1, 1)), XY_PLANE
+    ) == 0
+    assert ShortestDistance.line_plane(
+        Line3(Vec3(1, 2, 0), Vec3(1, 0, 0)), XY_PLANE
+    ) == 0
 
 
 def test_shortest_distance_plane_plane():
-    pass
+    assert ShortestDistance.plane_plane(
+        XY_PLANE, Plane(P3(5, 5, -2), Vec3(0, 0, -4))
+    ) == 2
+    assert ShortestDistance.plane_plane(
+        Plane(P3(1, 0, 0), Vec3(3, 4, 0)), Plane(P3(0, 5, 0), Vec3(6, 8, 0))
+    ) == pytest.approx(3.4)
+    assert ShortestDistance.plane_plane(XY_PLANE, YZ_PLANE) == 0
+    assert ShortestDistance.plane_plane(XY_PLANE, XY_PLANE) == 0
 
 
 def test_shortest_distance_point_line():
-    pass
+    line = Line3(Vec3(1, 1, 0), Vec3(2, 0, 0))
+    assert ShortestDistance.point_line(P3(7, 4, 4), line) == 5
+    assert ShortestDistance.point_line(P3(-3, 1, 0), line) == 0
+    assert ShortestDistance.point_line(
+        P3(3, 3, 3), Line3(Vec3(0, 0, 0), Vec3(1, 1, 1))
+    ) == 0
+    point_line = Line3(Vec3(1, 1, 0), Vec3(0, 0, 0))
+    assert ShortestDistance.point_line(P3(1, 4, 4), point_line) == 5
 
 
 def test_shortest_distance_point_plane():
-    pass
+    plane = Plane(P3(0, 0, 1), Vec3(0, 0, 2))
+    assert ShortestDistance.point_plane(P3(3, 4, -2), plane) == 3
+    assert ShortestDistance.point_plane(P3(3, 4, 5), plane) == 4
+    assert ShortestDistance.point_plane(P3(3, 4, 1), plane) == 0
 
 
 def test_init_scene():
@@ -591,3 +790,1199 @@ def test_draw_scene():
     scene.add(v1, p1, line)
     scene.draw(show=False)
     assert True
+
+
+def test_p3_array():
+    points = P3Array.from_points([P3(1, 2, 3), P3(4, 5, 6)])
+    assert len(points) == 2
+    assert points[1] == P3(4, 5, 6)
+    assert list(points) == [P3(1, 2, 3), P3(4, 5, 6)]
+    assert list(points.z) == [3, 6]
+    assert len(points[points.x > 2]) == 1
+    with pytest.raises(ValueError):
+        P3Array(np.zeros((4, 2)))
+
+
+def test_point_plane_distances():
+    plane = Plane(P3(0, 0, 1), Vec3(0, 0, 2))
+    points = P3Array([[0, 0, 3], [1, 1, 1], [5, 5, -1]])
+    assert list(point_plane_distances(points, plane)) == [2, 0, -2]
+    assert list(point_plane_distances(points, plane, signed=False)) == \
+        [2, 0, 2]
+    assert list(plane_contains_points(plane, points)) == \
+        [False, True, False]
+    assert list(plane_contains_points(plane, points, tolerance=4)) == \
+        [True, True, True]
+
+
+def test_fit_plane():
+    rng = np.random.default_rng(1)
+    xy = rng.uniform(-5, 5, (200, 2))
+    points = np.column_stack([xy, 2 * xy[:, 0] - xy[:, 1] + 3])
+    plane = fit_plane(points)
+    assert np.allclose(point_plane_distances(points, plane), 0)
+    assert plane.normal.magnitude() == pytest.approx(1)
+    with pytest.raises(ValueError):
+        fit_plane(points[:2])
+
+
+def test_ransac_planes():
+    rng = np.random.default_rng(2)
+    floor = np.column_stack([
+        rng.uniform(-5, 5, (300, 2)), rng.normal(0, 0.001, 300)
+    ])
+    wall = np.column_stack([
+        rng.normal(2, 0.001, 200), rng.uniform(-5, 5, (200, 2))
+    ])
+    noise = rng.uniform(-5, 5, (50, 3))
+    points = P3Array(np.concatenate([floor, wall, noise]))
+
+    results = ransac_planes(points, 0.01, max_planes=2, seed=3)
+    assert len(results) == 2
+    (floor_plane, floor_mask), (wall_plane, wall_mask) = results
+    assert floor_mask[:300].all()
+    assert wall_mask[300:500].all()
+    assert not (floor_mask & wall_mask).any()
+    assert abs(floor_plane.unit_normal.z) == pytest.approx(1, abs=1e-4)
+    assert abs(wall_plane.unit_normal.x) == pytest.approx(1, abs=1e-4)
+
+    again = ransac_planes(points, 0.01, max_planes=2, seed=3)
+    assert all((a[1] == b[1]).all() for a, b in zip(results, again))
+
+
+def test_line_plane_intersections():
+    lines = [
+        Line3(Vec3(2, 1, 0), Vec3(-1, 1, 3)),
+        Line3(Vec3(0, 0, 1), Vec3(0, 0, 2)),
+        Line3(Vec3(1, 1, 1), Vec3(0, 1, 0)),
+    ]
+    plane = Plane.from_normal_and_d(Vec3(3, -2, 1), -10)
+    result = line_plane_intersections(lines, plane)
+    assert np.allclose(result[0], [5, -2, -9])
+    result = line_plane_intersections(Line3Array.from_lines(lines), XY_PLANE)
+    assert np.allclose(result[:2], [[2, 1, 0], [0, 0, 0]])
+    assert np.isnan(result[2]).all()
+
+
+def test_knn():
+    points = np.array([[0, 0, 0], [1, 0, 0], [0, 2, 0], [5, 5, 5]])
+    distances, indices = knn(points, [[0.1, 0, 0], [4, 4, 4]], k=2)
+    assert indices.tolist() == [[0, 1], [3, 2]]
+    assert distances[0] == pytest.approx([0.1, 0.9])
+    with pytest.raises(ValueError):
+        knn(points, points, k=5)
+
+
+def test_parallel_executor():
+    rng = np.random.default_rng(4)
+    points = rng.uniform(-1, 1, (1000, 3))
+    origins = rng.uniform(-1, 1, (1000, 3))
+    directions = rng.uniform(-1, 1, (1000, 3))
+    plane = Plane(P3(0, 0, 0.5), Vec3(1, 2, 3))
+    with ParallelExecutor(workers=2, chunk_size=128) as executor:
+        assert np.allclose(
+            executor.point_plane_distances(points, plane),
+            point_plane_distances(points, plane),
+        )
+        assert (
+            executor.plane_contains_points(plane, points, 0.1)
+            == plane_contains_points(plane, points, 0.1)
+        ).all()
+        lines = Line3Array(origins, directions)
+        assert np.allclose(
+            executor.line_plane_intersections(lines, plane),
+            line_plane_intersections(lines, plane),
+        )
+        distances, indices = executor.knn(points, origins[:300], k=3)
+        expected_distances, expected_indices = knn(points, origins[:300], 3)
+        assert (indices == expected_indices).all()
+        assert np.allclose(distances, expected_distances)
+
+
+def test_batch_workers():
+    rng = np.random.default_rng(5)
+    points = rng.uniform(-1, 1, (100_000, 3))
+    lines = Line3Array(points, rng.uniform(-1, 1, (100_000, 3)))
+    plane = Plane(P3(0, 0, 0.5), Vec3(1, 2, 3))
+    for workers in (2, 3, None):
+        assert (
+            point_plane_distances(points, plane, workers=workers)
+            == point_plane_distances(points, plane)
+        ).all()
+        assert (
+            plane_contains_points(plane, points, 0.1, workers=workers)
+            == plane_contains_points(plane, points, 0.1)
+        ).all()
+        assert np.array_equal(
+            line_plane_intersections(lines, plane, workers=workers),
+            line_plane_intersections(lines, plane),
+            equal_nan=True,
+        )
+        assert (
+            knn(points[:500], points[:50], 4, workers=workers)[1]
+            == knn(points[:500], points[:50], 4)[1]
+        ).all()
+    results = ransac_planes(points, 0.01, iterations=20, seed=0, workers=3)
+    expected = ransac_planes(points, 0.01, iterations=20, seed=0)
+    assert (results[0][1] == expected[0][1]).all()
+
+    # larger worker counts reuse the same threads instead of adding pools
+    threads = threading.active_count()
+    for workers in (4, 8, 16):
+        point_plane_distances(points, plane, workers=workers)
+    assert threading.active_count() <= threads + (os.cpu_count() or 1)
+
+    # a batch function called from a thread of the pool runs serially
+    # instead of waiting for the pool it is running on
+    nested = split_rows(
+        lambda start, stop: point_plane_distances(points[start:stop], plane,
+                                                  workers=4),
+        len(points), 2,
+    )
+    assert (np.concatenate(nested)
+            == point_plane_distances(points, plane)).all()
+
+
+def test_vec3_array_arithmetic():
+    v1 = Vec3Array.from_vectors([Vec3(1, 2, 3), Vec3(4, 5, 6)])
+    v2 = Vec3Array([[1, 1, 1], [2, 2, 2]])
+    assert list(v1 + v2) == [Vec3(2, 3, 4), Vec3(6, 7, 8)]
+    assert list(v1 - v2) == [Vec3(0, 1, 2), Vec3(2, 3, 4)]
+    assert list(2 * v1) == [Vec3(2, 4, 6), Vec3(8, 10, 12)]
+    assert list(v1 * np.array([1, -1])) == [Vec3(1, 2, 3), Vec3(-4, -5, -6)]
+    assert list(v2 / 2) == [Vec3(0.5, 0.5, 0.5), Vec3(1, 1, 1)]
+    assert list((-v2).x) == [-1, -2]
+    assert v2.magnitude() == pytest.approx([3 ** 0.5, 12 ** 0.5])
+    with pytest.raises(DifferentDimensionException):
+        v1 + P3Array([[1, 2, 3], [4, 5, 6]])
+    with pytest.raises(ValueError):
+        v1 + v2[:1]
+
+
+def test_lazy_vec3():
+    rng = np.random.default_rng(6)
+    v1, v2, v3 = (Vec3Array(rng.normal(size=(5000, 3))) for _ in range(3))
+    weights = rng.normal(size=5000)
+    expected = ((v1 + v2) * 3 - v3 * weights) / 2
+    expression = ((v1.lazy() + v2) * 3 - v3.lazy() * weights) / 2
+    assert isinstance(expression, LazyVec3)
+    assert len(expression) == 5000
+    assert np.allclose(expression.z, expected.z)
+    assert np.allclose(expression.evaluate("zx"), expected.data[:, [2, 0]])
+    assert np.allclose(expression.data, expected.data)
+    assert expression.collect() is expression.collect()
+
+    shared = v1.lazy() - v2
+    doubled = shared + shared
+    out = np.empty((5000, 3))
+    assert doubled.evaluate(out=out) is out
+    assert np.allclose(out, 2 * (v1 - v2).data)
+    assert np.allclose((v1 + (-v1.lazy())).data, 0)
+    assert v1.lazy()[3] == v1[3]
+    with pytest.raises(ValueError):
+        v1.lazy() * v2
+    with pytest.raises(ValueError):
+        v1.lazy() + v2[:10]
+
+    # long chains are walked without recursion, and their operations
+    # share a single block buffer
+    chain = v1.lazy()
+    for _ in range(5000):
+        chain = chain + v2
+    assert np.allclose(chain.x, v1.x + 5000 * v2.x)
+    assert str(chain).startswith("LazyVec3(((((")
+    assert chain._buffer_slots(chain._nodes(), True)[1] == 1
+    assert chain._buffer_slots(chain._nodes(), False)[1] == 1
+    # a subexpression keeps its buffer until its last use
+    reused = ((shared * 2 + v3) * 3 - shared) / 2
+    assert np.allclose(reused.data,
+                       ((((v1 - v2) * 2 + v3) * 3 - (v1 - v2)) / 2).data)
+    assert np.allclose(reused.evaluate("y")[:, 0], reused.data[:, 1])
+
+
+def test_plane_array():
+    planes = PlaneArray.from_planes([XY_PLANE, Plane(P3(1, 2, 3),
+                                                     Vec3(1, 1, 0))])
+    assert len(planes) == 2
+    assert list(planes.d) == [0, -3]
+    assert planes[1] == Plane(P3(3, 0, 0), Vec3(2, 2, 0))
+    assert list(planes) == [XY_PLANE, Plane(P3(1, 2, 3), Vec3(1, 1, 0))]
+    with pytest.raises(ValueError):
+        PlaneArray([[0, 0, 1]], [1, 2])
+
+
+def test_batch_line_line_closest_points():
+    lines1 = [Line3(Vec3(0, 0, 0), Vec3(1, 0, 0))] * 3
+    lines2 = [
+        Line3(Vec3(2, -1, 3), Vec3(0, 1, 0)),
+        Line3(Vec3(2, -1, 0), Vec3(0, 1, 0)),
+        Line3(Vec3(0, 1, 0), Vec3(3, 0, 0)),
+    ]
+    p1, p2 = line_line_closest_points(lines1, lines2)
+    assert np.allclose(p1[:2], [[2, 0, 0], [2, 0, 0]])
+    assert np.allclose(p2[:2], [[2, 0, 3], [2, 0, 0]])
+    assert np.isnan(p1[2]).all() and np.isnan(p2[2]).all()
+
+
+def test_batch_plane_intersections():
+    rng = np.random.default_rng(7)
+    planes = PlaneArray(rng.normal(size=(40, 3)), rng.normal(size=40))
+    planes.normals[1] = planes.normals[0] * 2
+    lines = plane_plane_intersections(planes[:20], planes[20:])
+    for k in range(20):
+        expected = Intersection.plane_plane(planes[k], planes[20 + k])
+        assert np.allclose(lines.origins[k], expected._origin)
+        assert np.allclose(lines.directions[k], expected._direction)
+
+    i, j, lines = pairwise_plane_intersections(planes)
+    assert len(i) == 40 * 39 // 2 - 1
+    assert (0, 1) not in set(zip(i.tolist(), j.tolist()))
+    for plane_index in (i, j):
+        values = np.einsum("ij,ij->i", planes.normals[plane_index],
+                           lines.origins + lines.directions * 0.5)
+        assert np.allclose(values, -planes.d[plane_index])
+
+    points = plane_plane_plane_intersections(planes[:10], planes[10:20],
+                                             planes[20:30])
+    for k in range(10):
+        expected = Intersection.plane_plane_plane(
+            planes[k], planes[10 + k], planes[20 + k]
+        )
+        assert np.allclose(points[k], [expected.x, expected.y, expected.z])
+    points = plane_plane_plane_intersections(planes[:1], planes[1:2],
+                                             planes[2:3])
+    assert np.isnan(points).all()
+
+
+def test_collection_precision():
+    data = np.arange(12, dtype=np.float32).reshape(4, 3)
+    points = P3Array(data)
+    assert points.dtype == np.float32
+    assert points[1:].dtype == np.float32
+    assert P3Array(data.tolist()).dtype == np.float64
+    assert P3Array(data, np.float64).dtype == np.float64
+    assert points.astype(np.float64).data.tolist() == data.tolist()
+    assert Vec3Array.from_vectors([Vec3(1, 2, 3)], np.float32).dtype \
+        == np.float32
+    lines = Line3Array(data, data[::-1].copy())
+    assert lines.dtype == np.float32
+    assert Line3Array(data, data.astype(np.float64)).dtype == np.float64
+    planes = PlaneArray(data, np.ones(4, dtype=np.float32))
+    assert planes.astype(np.float64).d.dtype == np.float64
+    with pytest.raises(ValueError):
+        P3Array(data, np.int32)
+    with pytest.raises(ValueError):
+        lines.astype(np.float16)
+
+
+def test_float32_kernels():
+    rng = np.random.default_rng(39)
+    data = rng.normal(size=(10000, 3)) * 100
+    v1 = Vec3Array(data, np.float32)
+    v2 = Vec3Array(data[::-1], np.float32)
+    exact1, exact2 = v1.astype(np.float64), v2.astype(np.float64)
+    # the products are computed in float64, so only the result is rounded
+    dot = v1.dot(v2)
+    assert dot.dtype == np.float32
+    scale = exact1.magnitude() * exact2.magnitude()
+    assert np.abs(dot - exact1.dot(exact2)).max() <= 2 ** -23 * scale.max()
+    cross = v1.cross(v2)
+    assert cross.dtype == np.float32
+    assert np.allclose(cross.data, exact1.cross(exact2).data, rtol=2 ** -23,
+                       atol=2 ** -23 * scale.max())
+    assert np.allclose(v1.magnitude(), exact1.magnitude(), rtol=2 ** -23)
+
+    plane = Plane(P3(1, 2, 3), Vec3(0.3, 0.4, 1))
+    points = P3Array(v1.data)
+    distances = point_plane_distances(points, plane, workers=2)
+    assert distances.dtype == np.float32
+    assert np.allclose(distances,
+                       point_plane_distances(points.astype(np.float64),
+                                             plane), rtol=2 ** -23)
+    lines = Line3Array(v1.data, v2.data)
+    assert line_plane_intersections(lines, plane).dtype == np.float32
+    assert ((v1.lazy() + v2) * 0.1).evaluate().dtype == np.float32
+
+    distances, indices = knn(points, points[:100], k=3)
+    assert distances.dtype == np.float32
+    expected_distances, expected_indices = knn(points.astype(np.float64),
+                                               points[:100].astype(np.float64),
+                                               k=3)
+    assert (indices[:, 0] == np.arange(100)).all()
+    assert (indices == expected_indices).all()
+    assert np.allclose(distances, expected_distances, rtol=2 ** -22,
+                       atol=1e-5)
+
+
+def test_aabb():
+    rng = np.random.default_rng(8)
+    points = rng.uniform(-3, 5, (200_000, 3))
+    box = AABB.from_points(points)
+    assert np.array_equal(box.minimum, points.min(axis=0))
+    assert np.array_equal(box.maximum, points.max(axis=0))
+    assert box.contains_points(points).all()
+
+    box = AABB(P3(0, 0, 0), P3(2, 4, 6))
+    assert str(box) == "AABB(P3(0.0, 0.0, 0.0), P3(2.0, 4.0, 6.0))"
+    assert box.center == P3(1, 2, 3)
+    assert box.volume() == 48
+    assert box.contains_point(P3(2, 0, 3))
+    assert not box.contains_point(P3(2.1, 0, 3))
+    assert list(box.contains_points([[1, 1, 1], [1, -1, 1], [2, 4, 6]])) == \
+        [True, False, True]
+    assert box.overlaps(AABB(P3(2, 4, 6), P3(3, 5, 7)))
+    assert not box.overlaps(AABB(P3(2, 4, 6.5), P3(3, 5, 7)))
+    assert box.union(AABB(P3(-1, 0, 0), P3(1, 1, 1))) == \
+        AABB(P3(-1, 0, 0), P3(2, 4, 6))
+    assert box.expanded(1) == AABB(P3(-1, -1, -1), P3(3, 5, 7))
+    with pytest.raises(ValueError):
+        AABB(P3(1, 0, 0), P3(0, 1, 1))
+
+
+def test_box_box_overlaps():
+    rng = np.random.default_rng(9)
+    minimums = rng.uniform(0, 10, (300, 3))
+    boxes_a = AABBArray(minimums[:100], minimums[:100] + 1)
+    boxes_b = AABBArray(minimums[100:], minimums[100:] + 0.5)
+    i, j = box_box_overlaps(boxes_a, boxes_b)
+    expected = {
+        (a, b) for a in range(100) for b in range(200)
+        if boxes_a[a].overlaps(boxes_b[b])
+    }
+    assert set(zip(i.tolist(), j.tolist())) == expected
+
+    i, j = boxes_a.contains_points(minimums)
+    assert {(0, 0), (1, 1)} <= set(zip(i.tolist(), j.tolist()))
+    assert all(boxes_a[a].contains_point(P3(*minimums[p]))
+               for a, p in zip(i, j))
+
+
+def test_line_box_intersections():
+    box = AABB(P3(0, 0, 0), P3(1, 1, 1))
+    lines = Line3Array(
+        [[-1, 0.5, 0.5], [-1, 2, 0.5], [0.5, 0.5, 5], [1, 0.5, 0.5],
+         [2, 0.5, 0.5]],
+        [[1, 0, 0], [1, 0, 0], [0, 0, -2], [0, 1, 0], [1, 0, 0]],
+    )
+    hit, t_near, t_far = line_box_intersections(lines, box)
+    assert list(hit) == [True, False, True, True, True]
+    assert (t_near[0], t_far[0]) == (1, 2)
+    assert (t_near[2], t_far[2]) == (2, 2.5)
+    hit, _, _ = line_box_intersections(lines, box, t_min=0)
+    assert list(hit) == [True, False, True, True, False]
+
+
+def test_scene_bounds():
+    scene = Scene()
+    assert scene.bounds() is None
+    scene.add(Vec3(1, 2, 3), P3(-4, 5, 0))
+    assert scene.bounds() == AABB(P3(-4, 0, 0), P3(1, 5, 3))
+    scene.draw(show=False, auto_fit=True)
+
+
+def _brute_force_pairs(points, distance):
+    return {
+        (i, j) for i in range(len(points)) for j in range(i + 1, len(points))
+        if np.linalg.norm(points[i] - points[j]) <= distance
+    }
+
+
+def test_spatial_hash_incremental():
+    grid = SpatialHashGrid(1.0)
+    a = grid.insert(P3(0.5, 0.5, 0.5))
+    b = grid.insert(P3(1.2, 0.5, 0.5))
+    c = grid.insert(P3(5, 5, 5))
+    assert len(grid) == 3
+    assert grid.cell_of(P3(-0.5, 1.5, 2)) == (-1, 1, 2)
+    assert sorted(grid.query(P3(0, 0, 0), 2).tolist()) == [a, b]
+    grid.move(c, P3(0.6, 0.6, 0.6))
+    assert grid.position(c) == P3(0.6, 0.6, 0.6)
+    assert sorted(grid.query(P3(0, 0, 0), 1.1).tolist()) == [a, c]
+    grid.remove(a)
+    assert a not in grid
+    assert len(grid) == 2
+    assert grid.query(P3(0, 0, 0), 1.1).tolist() == [c]
+    assert grid.insert(P3(9, 9, 9)) == a
+    with pytest.raises(KeyError):
+        grid.move(10, P3(0, 0, 0))
+    i, j = grid.candidate_pairs()
+    assert set(zip(i.tolist(), j.tolist())) == {(b, c)}
+
+
+def test_spatial_hash_pairs():
+    rng = np.random.default_rng(10)
+    points = rng.uniform(-3, 3, (400, 3))
+    grid = SpatialHashGrid(0.5)
+    grid.rebuild(points)
+    assert len(grid) == 400
+    i, j = grid.candidate_pairs()
+    candidates = set(zip(i.tolist(), j.tolist()))
+    assert len(candidates) == len(i)
+    assert all(a < b for a, b in candidates)
+    assert _brute_force_pairs(points, 0.5) <= candidates
+    i, j = grid.pairs_within(0.8)
+    assert set(zip(i.tolist(), j.tolist())) == \
+        _brute_force_pairs(points, 0.8)
+
+    for k in range(0, 400, 3):
+        points[k] += rng.normal(0, 0.3, 3)
+        grid.move(k, P3(*points[k]))
+    i, j = grid.pairs_within(0.5)
+    assert set(zip(i.tolist(), j.tolist())) == \
+        _brute_force_pairs(points, 0.5)
+    query = grid.query(P3(0, 0, 0), 1)
+    expected = np.flatnonzero(np.linalg.norm(points, axis=1) <= 1)
+    assert query.tolist() == expected.tolist()
+
+    # keys are relative to the occupied cells, so far away points work
+    far = points + [3e7, -5e8, 1e9]
+    grid.rebuild(far)
+    i, j = grid.pairs_within(0.5)
+    assert set(zip(i.tolist(), j.tolist())) == _brute_force_pairs(far, 0.5)
+    # points too far apart for a key raise instead of sharing keys
+    grid = SpatialHashGrid(1)
+    grid.rebuild([(0, 2.0 ** 20, 0), (0, -2.0 ** 20, 0)])
+    with pytest.raises(ValueError):
+        grid.candidate_pairs()
+    for bad in (np.inf, np.nan, 1e300):
+        with pytest.raises(ValueError):
+            grid.insert(P3(0, bad, 0))
+        with pytest.raises(ValueError):
+            grid.move(0, P3(0, bad, 0))
+        with pytest.raises(ValueError):
+            grid.rebuild([(0, 0, 0), (0, bad, 0)])
+    assert len(grid) == 2
+
+
+def test_octree_queries():
+    rng = np.random.default_rng(11)
+    points = rng.uniform(-10, 10, (20_000, 3))
+    tree = Octree.from_points(points, leaf_capacity=32)
+    assert len(tree) == 20_000
+    box = AABB(P3(-2, -3, 0), P3(4, 1, 9))
+    expected = np.flatnonzero(box.contains_points(points))
+    assert tree.query_box(box).tolist() == expected.tolist()
+
+    frustum = Frustum.perspective(P3(0, 0, -15), P3(0, 0, 0), Vec3(0, 1, 0),
+                                  fov_deg=40, aspect=1.5, near=1, far=20)
+    assert frustum.contains_point(P3(0, 0, 0))
+    assert not frustum.contains_point(P3(0, 0, -16))
+    assert not frustum.contains_point(P3(9, 0, -10))
+    expected = np.flatnonzero(frustum.contains_points(points))
+    assert 0 < len(expected) < len(points)
+    assert tree.query_frustum(frustum).tolist() == expected.tolist()
+
+
+def test_octree_incremental():
+    rng = np.random.default_rng(12)
+    points = rng.normal(0, 5, (3000, 3))
+    tree = Octree(leaf_capacity=8)
+    for k, point in enumerate(points):
+        assert tree.insert(P3(*point)) == k
+    assert len(tree) == 3000
+    assert tree.bounds.contains_points(points).all()
+    box = AABB(P3(-1, -1, -1), P3(3, 3, 3))
+    expected = np.flatnonzero(box.contains_points(points))
+    assert tree.query_box(box).tolist() == expected.tolist()
+
+    centroids, counts = tree.level_of_detail(2)
+    assert counts.sum() == 3000
+    assert len(counts) <= 64
+    assert np.allclose((centroids * counts[:, None]).sum(axis=0),
+                       points.sum(axis=0))
+
+    for bad in (np.inf, -np.inf, np.nan):
+        with pytest.raises(ValueError):
+            tree.insert(P3(1, bad, 2))
+        with pytest.raises(ValueError):
+            Octree.from_points(np.array([[0, 0, 0], [1, bad, 2]]))
+    assert len(tree) == 3000
+    empty = Octree()
+    with pytest.raises(ValueError):
+        empty.insert(P3(np.nan, 0, 0))
+    assert empty.bounds is None
+
+
+def test_scene_index():
+    scene = Scene(index=True)
+    inside, outside = P3(1, 1, 1), P3(8, 8, 8)
+    scene.add(inside, outside, Vec3(1, 2, 1), Vec3(-5, 0, 0))
+    box = AABB(P3(0, 0, 0), P3(2, 2, 2))
+    assert scene.visible(box) == ([Vec3(1, 2, 1)], [inside])
+    assert Scene().visible(box) == ([], [])
+    scene.draw(show=False, view=box)
+
+    # a point the index rejects is not added at all
+    scene = Scene(index=True)
+    scene.add(P3(0, 0, 0))
+    with pytest.raises(ValueError):
+        scene.add(P3(np.inf, 0, 0))
+    with pytest.raises(ValueError):
+        scene.add(Vec3(np.nan, 0, 0))
+    scene.add(P3(5, 5, 5))
+    assert scene.points == [P3(0, 0, 0), P3(5, 5, 5)]
+    assert scene.visible(AABB(P3(4, 4, 4), P3(6, 6, 6))) \
+        == ([], [P3(5, 5, 5)])
+
+
+def test_curve_keys():
+    assert morton_keys(np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1],
+                                 [7, 7, 7]]), bits=3).tolist() == \
+        [1, 2, 4, 511]
+    for dims in (2, 3):
+        grid = np.stack(np.meshgrid(*[np.arange(8.0)] * dims,
+                                    indexing="ij"), axis=-1)
+        grid = grid.reshape(-1, dims)
+        for keys in (morton_keys(grid, bits=3), hilbert_keys(grid, bits=3)):
+            assert sorted(keys.tolist()) == list(range(8 ** dims))
+        # consecutive cells along the Hilbert curve are neighbours
+        ordered = grid[spatial_order(grid, bits=3)]
+        assert (np.abs(np.diff(ordered, axis=0)).sum(axis=1) == 1).all()
+    with pytest.raises(ValueError):
+        morton_keys(grid, bits=22)
+    with pytest.raises(ValueError):
+        spatial_order(grid, curve="peano")
+
+
+def test_reorder():
+    rng = np.random.default_rng(13)
+    points = P3Array(rng.uniform(-1, 1, (500, 3)))
+    weights = np.arange(500)
+    labels = [str(i) for i in range(500)]
+    ordered, ordered_weights, ordered_labels = reorder(points, weights,
+                                                       labels)
+    assert isinstance(ordered, P3Array) and isinstance(ordered_labels, list)
+    assert np.array_equal(ordered.data, points.data[ordered_weights])
+    assert ordered_labels == [str(i) for i in ordered_weights]
+    assert sorted(ordered_weights.tolist()) == list(range(500))
+    keys = hilbert_keys(ordered)
+    assert (np.diff(keys.astype(np.float64)) >= 0).all()
+    lines = Line3Array(points.data, points.data)
+    assert np.array_equal(reorder(lines)[0].origins, ordered.data)
+    with pytest.raises(ValueError):
+        reorder(points, weights[:10])
+
+
+def _unit_cube_mesh():
+    corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1)
+                        for z in (0, 1)], dtype=np.float64)
+    faces = []
+    for axis in range(3):
+        for side in (0, 1):
+            quad = [i for i in range(8) if corners[i, axis] == side]
+            a, b, c, d = quad
+            faces += [(a, b, d), (a, d, c)]
+    return TriangleMesh(corners, faces)
+
+
+def test_triangle_mesh():
+    mesh = TriangleMesh.from_triangles([
+        (P3(0, 0, 0), P3(1, 0, 0), P3(0, 1, 0)),
+        (P3(1, 0, 0), P3(1, 1, 0), P3(0, 1, 0)),
+    ])
+    assert len(mesh) == 2 and len(mesh.vertices) == 4
+    assert np.allclose(mesh.areas(), 0.5)
+    assert np.allclose(np.abs(mesh.normals()), [[0, 0, 1], [0, 0, 1]])
+    assert mesh.bounds() == AABB(P3(0, 0, 0), P3(1, 1, 0))
+    with pytest.raises(ValueError):
+        TriangleMesh(mesh.vertices, [(0, 1, 4)])
+    with pytest.raises(ValueError):
+        mesh.vertices = mesh.vertices[:3]
+    assert len(mesh.vertices) == 4
+    mesh.vertices = mesh.vertices * 2
+    assert np.allclose(mesh.areas(), 2)
+
+    cube = _unit_cube_mesh()
+    assert len(cube) == 12
+    culled = cube.culled(AABB(P3(0.2, 0.2, 0.9), P3(0.8, 0.8, 1.1)))
+    assert len(culled) == 2
+
+
+def test_line_mesh_intersections():
+    cube = _unit_cube_mesh()
+    lines = [
+        Line3(Vec3(0.25, 0.5, -2), Vec3(0, 0, 1)),
+        Line3(Vec3(0.25, 0.5, 3), Vec3(0, 0, -2)),
+        Line3(Vec3(0.5, 0.5, 0.5), Vec3(1, 0, 0)),
+        Line3(Vec3(5, 5, 5), Vec3(1, 0, 0)),
+        Line3(Vec3(0.5, 0.5, -2), Vec3(0, 0, -1)),
+    ]
+    t, triangles, barycentric = line_mesh_intersections(lines, cube)
+    assert np.allclose(t[:4], [2, 1, 0.5, np.inf])
+    # the last line points away from the cube, but hits it as a whole line
+    assert t[4] == np.inf
+    assert line_mesh_intersections(lines[4:], cube,
+                                   t_min=-np.inf)[0].tolist() == [-3]
+    assert triangles[3] == -1 and np.isnan(barycentric[3]).all()
+    corners = np.stack(cube.corners(), axis=1)[triangles[:3]]
+    hits = (barycentric[:3, :, None] * corners).sum(axis=1)
+    assert np.allclose(hits, [[0.25, 0.5, 0], [0.25, 0.5, 1],
+                              [1, 0.5, 0.5]])
+
+    # many rays against a larger mesh match testing every triangle
+    rng = np.random.default_rng(14)
+    vertices = rng.uniform(-5, 5, (900, 3))
+    mesh = TriangleMesh(vertices, rng.integers(0, 900, (600, 3)))
+    rays = Line3Array(rng.uniform(-6, 6, (300, 3)), rng.normal(size=(300, 3)))
+    t, triangles, _ = line_mesh_intersections(rays, mesh)
+    assert (triangles >= 0).any()
+    best = np.full(len(rays), np.inf)
+    for face in mesh.faces:
+        single = TriangleMesh(mesh.vertices, [face])
+        np.minimum(best, line_mesh_intersections(rays, single)[0], out=best)
+    assert np.allclose(t, best)
+
+
+def test_scene_mesh():
+    scene = Scene()
+    scene.add(_unit_cube_mesh(), P3(-1, 0, 0))
+    assert scene.bounds() == AABB(P3(-1, 0, 0), P3(1, 1, 1))
+    scene.draw(show=False, auto_fit=True,
+               view=AABB(P3(0, 0, 0), P3(2, 2, 2)))
+
+
+def test_p2():
+    p = P2(1, 2)
+    assert p + P2(1, 1) == P2(2, 3)
+    assert p - P2(1, 1) == P2(0, 1)
+    assert p.to_vec2() == Vec2(1, 2)
+    assert Vec2(3, 4).to_point() == P2(3, 4)
+    points = P2Array.from_points([p, P2(3, 4)])
+    assert points[1] == P2(3, 4) and len(points[:1]) == 1
+    assert points.to_points() == [p, P2(3, 4)]
+    with pytest.raises(ValueError):
+        P2Array(np.zeros((3, 3)))
+
+
+def _star(n=7, inner=0.4):
+    angles = np.linspace(0, 2 * np.pi, 2 * n, endpoint=False)
+    radii = np.where(np.arange(2 * n) % 2, inner, 1.0)
+    return Polygon(np.stack([radii * np.cos(angles),
+                             radii * np.sin(angles)], axis=1))
+
+
+def test_polygon():
+    square = Polygon([P2(0, 0), P2(2, 0), P2(2, 2), P2(0, 2), P2(0, 0)])
+    assert len(square) == 4
+    assert square.signed_area() == 4
+    assert Polygon(square.vertices[::-1]).signed_area() == -4
+    assert square.centroid() == P2(1, 1)
+    assert square.bounds() == (P2(0, 0), P2(2, 2))
+    assert square.edges().lengths().tolist() == [2, 2, 2, 2]
+    l_shape = Polygon([P2(0, 0), P2(2, 0), P2(2, 1), P2(1, 1), P2(1, 2),
+                       P2(0, 2)])
+    assert l_shape.area() == 3
+    centroid = l_shape.centroid()
+    assert centroid.x == pytest.approx(5 / 6)
+    assert centroid.y == pytest.approx(5 / 6)
+    assert l_shape.contains_point(P2(0.5, 1.5))
+    assert not l_shape.contains_point(P2(1.5, 1.5))
+    with pytest.raises(ValueError):
+        Polygon([P2(0, 0), P2(1, 1)])
+
+    from matplotlib.path import Path
+    star = _star()
+    points = np.random.default_rng(15).uniform(-1.2, 1.2, (20_000, 2))
+    expected = Path(star.vertices).contains_points(points)
+    assert np.array_equal(star.contains_points(points), expected)
+
+
+def test_points_in_polygons():
+    left = Polygon([P2(0, 0), P2(1, 0), P2(1, 1), P2(0, 1)])
+    right = Polygon([P2(1, 0), P2(2, 0), P2(2, 1), P2(1, 1)])
+    star = _star()
+    points = np.array([[0.5, 0.5], [1.5, 0.5], [1, 0.5], [3, 3],
+                       [-0.1, 0.0]])
+    assert points_in_polygons(points, [left, right, star]).tolist() == \
+        [0, 1, 1, -1, 2]
+    rng = np.random.default_rng(16)
+    points = rng.uniform(-1, 2, (5000, 2))
+    zones = [star, left, right]
+    result = points_in_polygons(P2Array(points), zones)
+    expected = np.full(len(points), -1)
+    for k in reversed(range(len(zones))):
+        expected[zones[k].contains_points(points)] = k
+    assert np.array_equal(result, expected)
+
+
+def test_segment_intersections():
+    segments1 = Segment2Array.from_segments([
+        (P2(0, 0), P2(2, 2)), (P2(0, 0), P2(1, 0)), (P2(0, 0), P2(1, 1)),
+    ])
+    segments2 = Segment2Array.from_segments([
+        (P2(0, 2), P2(2, 0)), (P2(0, 1), P2(1, 1)), (P2(2, 0), P2(3, 5)),
+    ])
+    result = segment_intersections(segments1, segments2)
+    assert result[0].tolist() == [1, 1]
+    assert np.isnan(result[1:]).all()
+    with pytest.raises(ValueError):
+        segment_intersections(segments1, segments2[:2])
+
+    rng = np.random.default_rng(17)
+    a = Segment2Array(rng.uniform(0, 10, (200, 2)),
+                      rng.uniform(0, 10, (200, 2)))
+    b = Segment2Array(rng.uniform(0, 10, (150, 2)),
+                      rng.uniform(0, 10, (150, 2)))
+    i, j, points = pairwise_segment_intersections(a, b)
+    assert len(i) > 0
+    rows = np.repeat(np.arange(200), 150)
+    columns = np.tile(np.arange(150), 200)
+    expected = segment_intersections(a[rows], b[columns])
+    hit = ~np.isnan(expected[:, 0])
+    assert sorted(zip(i.tolist(), j.tolist())) == \
+        list(zip(rows[hit].tolist(), columns[hit].tolist()))
+    order = np.lexsort((j, i))
+    assert np.allclose(points[order], expected[hit])
+
+
+def test_planar_precision():
+    rng = np.random.default_rng(39)
+    data = rng.uniform(0, 10, (400, 2)).astype(np.float32)
+    points = P2Array(data)
+    assert points.dtype == np.float32 and points[1:].dtype == np.float32
+    assert P2Array(data, np.float64).dtype == np.float64
+    assert P2Array.from_points([P2(1, 2)], np.float32).dtype == np.float32
+    assert points.astype(np.float64).data.tolist() == data.tolist()
+    with pytest.raises(ValueError):
+        points.astype(np.int32)
+
+    segments = Segment2Array(data[:200], data[200:])
+    assert segments.dtype == np.float32
+    assert Segment2Array(data[:200], data[200:].astype(np.float64)).dtype \
+        == np.float64
+    exact = segments.astype(np.float64)
+    # the intersections are computed in float64 and rounded once
+    result = segment_intersections(segments, segments[::-1])
+    expected = segment_intersections(exact, exact[::-1])
+    assert result.dtype == np.float32
+    assert np.array_equal(result, expected.astype(np.float32),
+                          equal_nan=True)
+    i, j, result = pairwise_segment_intersections(segments, segments[:50])
+    expected_i, expected_j, expected = pairwise_segment_intersections(
+        exact, exact[:50])
+    assert result.dtype == np.float32
+    assert np.array_equal(i, expected_i) and np.array_equal(j, expected_j)
+    assert np.array_equal(result, expected.astype(np.float32))
+
+    star = _star()
+    polygon = Polygon(star.vertices.astype(np.float32))
+    assert polygon.vertices.dtype == np.float32
+    assert polygon.signed_area() \
+        == Polygon(polygon.vertices.astype(np.float64)).signed_area()
+    inside = (data - 5) / 4
+    assert np.array_equal(
+        polygon.contains_points(inside),
+        Polygon(polygon.vertices.astype(np.float64)).contains_points(
+            inside.astype(np.float64))
+    )
+
+
+def test_convex_hull_2d():
+    rng = np.random.default_rng(18)
+    inside = rng.uniform(-1, 1, (1000, 2))
+    corners = [(-1, -1), (1, -1), (1, 1), (-1, 1)]
+    edge_points = [(0, -1), (1, 0.5), (-1, -1)]
+    points = np.concatenate([inside, corners, edge_points])
+    for prefilter in (True, False):
+        hull = convex_hull_2d(points, prefilter=prefilter)
+        assert sorted(map(tuple, hull.vertices.tolist())) == \
+            sorted(corners)
+        assert hull.signed_area() == 4
+    hull = convex_hull_2d([Vec2(0, 0), Vec2(2, 0), Vec2(0, 2), Vec2(1, 1),
+                           Vec2(0.5, 0.5)])
+    assert hull.area() == 2 and len(hull) == 3
+    with pytest.raises(ValueError):
+        convex_hull_2d([P2(0, 0), P2(1, 1), P2(2, 2)])
+
+
+def test_convex_hull_3d():
+    rng = np.random.default_rng(19)
+    corners = np.array([[x, y, z] for x in (0, 2) for y in (0, 2)
+                        for z in (0, 2)], dtype=np.float64)
+    points = np.concatenate([rng.uniform(0, 2, (2000, 3)), corners])
+    for prefilter in (True, False):
+        hull = convex_hull_3d(points, prefilter=prefilter)
+        assert sorted(map(tuple, hull.vertices.tolist())) == \
+            sorted(map(tuple, corners.tolist()))
+        assert hull.volume() == pytest.approx(8)
+        assert hull.surface_area() == pytest.approx(24)
+
+    points = rng.normal(size=(3000, 3))
+    hull = convex_hull_3d(P3Array(points))
+    a, b, c = hull.corners()
+    normals = np.cross(b - a, c - a)
+    heights = np.einsum("ij,kj->ki", normals, points) \
+        - np.einsum("ij,ij->i", normals, a)
+    # every point lies on or below every face, which faces outwards
+    assert heights.max() < 1e-9
+    assert hull.volume() == pytest.approx(
+        convex_hull_3d(points, prefilter=False).volume())
+    with pytest.raises(ValueError):
+        convex_hull_3d(np.c_[points[:, :2], np.zeros(len(points))])
+
+
+def test_convex_hull_3d_offset():
+    rng = np.random.default_rng(3)
+    offset = np.array([5e5, 4e6, 100])
+    for scale in ([10, 10, 0.01], [1e6, 1, 1e-3], [10, 10, 10]):
+        points = rng.random((2000, 3)) * scale
+        expected = convex_hull_3d(points)
+        for prefilter in (True, False):
+            hull = convex_hull_3d(points + offset, prefilter=prefilter)
+            assert hull.volume() == pytest.approx(expected.volume(),
+                                                  rel=1e-9)
+            assert len(hull.vertices) == len(expected.vertices)
+            a, b, c = (corner - offset for corner in hull.corners())
+            normals = np.cross(b - a, c - a)
+            normals /= np.linalg.norm(normals, axis=1)[:, None]
+            heights = np.einsum("ij,kj->ki", normals, points) \
+                - np.einsum("ij,ij->i", normals, a)
+            # every input point lies inside the hull
+            assert heights.max() < 1e-9 * max(scale)
+
+
+def test_serialize_collections(tmp_path):
+    rng = np.random.default_rng(40)
+    objects = [
+        P3Array(rng.normal(size=(100, 3)).astype(np.float32)),
+        Vec3Array(rng.normal(size=(100, 3))),
+        P2Array(rng.normal(size=(100, 2))),
+        Line3Array(rng.normal(size=(100, 3)), rng.normal(size=(100, 3))),
+        PlaneArray(rng.normal(size=(100, 3)), rng.normal(size=100)),
+        TriangleMesh(rng.normal(size=(4, 3)), [[0, 1, 2], [1, 2, 3]]),
+        Vec3Array(np.empty((0, 3))),
+    ]
+    for obj in objects:
+        path = tmp_path / "geometry.vzz"
+        save(path, obj)
+        for copy in (load(path), load(path, mmap=True), loads(dumps(obj)),
+                     pickle.loads(pickle.dumps(obj, protocol=5))):
+            assert type(copy) is type(obj)
+            for name, value in vars(obj).items():
+                if isinstance(value, np.ndarray):
+                    assert getattr(copy, name).dtype == value.dtype
+                    assert (getattr(copy, name) == value).all()
+
+    path = tmp_path / "points.vzz"
+    save(path, objects[0])
+    mapped = load(path, mmap=True)
+    mapped.data[0] = 0
+    assert (load(path).data[0] == objects[0].data[0]).all()
+    with pytest.raises(ValueError):
+        dumps([P3(1, 2, 3)])
+    with pytest.raises(ValueError):
+        loads(b"not a vectorzz file")
+    with pytest.raises(ValueError):
+        loads(dumps(objects[1])[:-8])
+
+
+def test_serialize_scene():
+    scene = Scene(index=True)
+    scene.add(Vec3(1, 2, 3), Vec3(-1, 0, 4), P3(4, 5, 6),
+              Line3(Vec3(0, 0, 0), Vec3(1, 1, 1)),
+              TriangleMesh([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]]),
+              TriangleMesh([[0, 0, 1], [1, 0, 1], [0, 1, 1], [1, 1, 1]],
+                           [[0, 1, 2], [1, 3, 2]]))
+    for copy in (loads(dumps(scene)), pickle.loads(pickle.dumps(scene))):
+        assert copy.vectors == scene.vectors
+        assert copy.points == scene.points
+        assert copy.lines == scene.lines
+        assert [len(mesh) for mesh in copy.meshes] == [1, 2]
+        assert (copy.meshes[1].vertices == scene.meshes[1].vertices).all()
+        assert len(copy.point_index) == 1 and len(copy.vector_index) == 2
+    empty = loads(dumps(Scene()))
+    assert empty.vectors == [] and empty.meshes == []
+    assert empty.point_index is None
+
+
+def test_pipeline_stages():
+    rng = np.random.default_rng(41)
+    data = rng.uniform(-1, 1, (1000, 3))
+    data = np.concatenate([data, data[:100]])
+    stages = [transform(np.eye(3) * 2, [0, 0, 1]), dedupe(),
+              filter_plane(Plane(P3(0, 0, 0), Vec3(0, 0, 1))),
+              filter_box(AABB(P3(-1, -1, -1), P3(1, 1, 2)))]
+    pipeline = Pipeline(array_source(data, chunk_rows=64), stages)
+    assert asyncio.run(pipeline.run()) == len(pipeline.sink.points)
+    expected = data[:1000] * 2 + [0, 0, 1]
+    expected = expected[(expected[:, 2] >= 0)
+                        & (np.abs(expected) <= [1, 1, 2]).all(axis=1)]
+    assert (pipeline.sink.points.data == expected).all()
+
+    grid = dedupe(tolerance=0.5)
+    kept = grid(P3Array([[0.1, 0.1, 0.1], [0.2, 0.2, 0.2], [0.6, 0, 0]]))
+    assert kept.data.tolist() == [[0.1, 0.1, 0.1], [0.6, 0, 0]]
+    assert len(grid(P3Array([[0.3, 0.3, 0.3]]))) == 0
+
+    scene = Scene(index=True)
+    count = asyncio.run(Pipeline(array_source(data[:10]),
+                                 sink=SceneSink(scene)).run())
+    assert count == 10 and len(scene.point_index) == 10
+
+    def fail(chunk):
+        raise RuntimeError("bad chunk")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(Pipeline(array_source(data), [Stage(fail)]).run())
+
+    async def failing_source():
+        try:
+            for start in range(0, len(data), 10):
+                yield P3Array(data[start:start + 10])
+        finally:
+            raise OSError("connection lost")
+
+    # the source fails to close while it is cancelled, and both failures
+    # are raised
+    with pytest.raises(ExceptionGroup) as error:
+        asyncio.run(Pipeline(failing_source(), [Stage(fail)],
+                             queue_chunks=1).run())
+    assert {type(e) for e in error.value.exceptions} \
+        == {RuntimeError, OSError}
+
+
+def test_pipeline_backpressure():
+    produced, written = [], []
+
+    async def source():
+        for i in range(20):
+            produced.append(i)
+            yield P3Array([[i, 0, 0]])
+
+    class SlowSink(ArraySink):
+        async def write(self, chunk):
+            # the source can only be a few chunks ahead of the sink
+            written.append(len(produced) - len(written))
+            await asyncio.sleep(0.001)
+
+    asyncio.run(Pipeline(source(), [transform(offset=[1, 0, 0])],
+                         SlowSink(), queue_chunks=1).run())
+    assert len(written) == 20
+    assert max(written) <= 4
+
+
+def test_pipeline_io_sources(tmp_path):
+    rng = np.random.default_rng(42)
+    data = rng.normal(size=(500, 3))
+    path = str(tmp_path / "points.bin")
+    sink = FileSink(path)
+    # the file is only created when the pipeline runs
+    assert not os.path.exists(path)
+    asyncio.run(Pipeline(array_source(data, 100), sink=sink).run())
+    sink = ArraySink()
+    asyncio.run(Pipeline(file_source(path, chunk_rows=64), sink=sink).run())
+    assert (sink.points.data == data).all()
+
+    def fail_late(chunk):
+        if chunk.data[0, 0] == data[300, 0]:
+            raise RuntimeError("bad chunk")
+        return chunk
+
+    # a failed pipeline leaves no incomplete file behind
+    failed = str(tmp_path / "failed.bin")
+    with pytest.raises(RuntimeError):
+        asyncio.run(Pipeline(array_source(data, 100), [Stage(fail_late)],
+                             FileSink(failed)).run())
+    assert not os.path.exists(failed)
+    asyncio.run(Pipeline(array_source(data[:0]), sink=FileSink(failed)).run())
+    assert os.path.getsize(failed) == 0
+
+    async def from_socket():
+        payload = data.astype("<f4").tobytes()
+
+        async def serve(reader, writer):
+            # odd pieces, so rows arrive split across reads
+            for start in range(0, len(payload), 1000):
+                writer.write(payload[start:start + 1000])
+                await writer.drain()
+            writer.close()
+
+        address = str(tmp_path / "sensor.sock")
+        server = await asyncio.start_unix_server(serve, address)
+        async with server:
+            sink = ArraySink()
+            await Pipeline(socket_source(address, dtype=np.float32),
+                           sink=sink).run()
+        return sink.points
+
+    points = asyncio.run(from_socket())
+    assert points.dtype == np.float32
+    assert (points.data == data.astype(np.float32)).all()
+
+    async def from_pipe():
+        read_end, write_end = os.pipe()
+        with open(read_end, "rb", buffering=0) as pipe:
+            os.write(write_end, data.tobytes())
+            os.close(write_end)
+            sink = ArraySink()
+            await Pipeline(pipe_source(pipe), sink=sink).run()
+        return sink.points
+
+    assert (asyncio.run(from_pipe()).data == data).all()
+
+
+def test_query_cache():
+    cache = QueryCache()
+    plane = Plane(P3(0, 0, 1), Vec3(0, 0, 2))
+    line = Line3(Vec3(1, 2, 3), Vec3(0, 1, 1))
+    assert cache.line_plane(line, plane) == Intersection.line_plane(line,
+                                                                    plane)
+    # equal geometry built from other objects shares the entry
+    same_plane = Plane(P3(5, 5, 1), Vec3(0, 0, 2))
+    assert cache.line_plane(Line3(Vec3(1, 2, 3), Vec3(0, 1, 1)),
+                            same_plane) == P3(1, 0, 1)
+    assert cache.contains_point(plane, P3(3, 4, 1))
+    assert not cache.contains_point(plane, P3(3, 4, 2))
+    assert cache.signed_distance(plane, P3(0, 0, 3)) == 2
+    assert cache.point_point(P3(0, 0, 0), P3(3, 4, 0)) == 5
+    assert cache.line_line(line, Line3(Vec3(0, 0, 0), Vec3(1, 0, 0))) \
+        == ShortestDistance.line_line(line, Line3(Vec3(0, 0, 0),
+                                                  Vec3(1, 0, 0)))
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 6, 6)
+    assert stats.hit_rate == pytest.approx(1 / 7)
+    assert 0 < stats.size_bytes <= stats.max_bytes
+
+    rounded = QueryCache(quantum=1e-6)
+    rounded.point_point(P3(0, 0, 0), P3(1, 0, 0))
+    assert rounded.point_point(P3(0, 0, 0), P3(1 + 1e-9, 0, 0)) == 1
+    assert rounded.stats().hits == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.stats().misses == 0
+
+
+def test_query_cache_canonical_keys():
+    cache = QueryCache()
+    # scaled and reversed normals give the same plane
+    cache.contains_point(Plane(P3(0, 0, 3), Vec3(0, 0, 1)), P3(1, 1, 3))
+    assert cache.contains_point(Plane(P3(1, 2, 3), Vec3(0, 0, -2)),
+                                P3(1, 1, 3))
+    assert cache.stats().hits == 1
+    # but the signed distance depends on the side of the normal
+    assert cache.signed_distance(Plane(P3(0, 0, 3), Vec3(0, 0, 1)),
+                                 P3(0, 0, 5)) == 2
+    assert cache.signed_distance(Plane(P3(1, 2, 3), Vec3(0, 0, -2)),
+                                 P3(0, 0, 5)) == -2
+    assert cache.stats().hits == 1
+    # other origins and scaled or reversed directions give the same line
+    axis = Line3(Vec3(0, 0, 0), Vec3(0, 1, 0))
+    cache.line_line(Line3(Vec3(0, 0, 1), Vec3(2, 0, 0)), axis)
+    assert cache.line_line(Line3(Vec3(5, 0, 1), Vec3(-1, 0, 0)), axis) == 1
+    assert cache.line_plane(Line3(Vec3(1, 1, 0), Vec3(0, 0, 1)),
+                            Plane(P3(0, 0, 2), Vec3(0, 0, 1))) == P3(1, 1, 2)
+    assert cache.line_plane(Line3(Vec3(1, 1, 7), Vec3(0, 0, -3)),
+                            Plane(P3(4, 4, 2), Vec3(0, 0, -5))) == P3(1, 1, 2)
+    assert cache.stats().hits == 3
+    # the point closest to the origin of a line is off by the last bits
+    # for equal lines given differently, which the quantum absorbs
+    rounded = QueryCache(quantum=1e-9)
+    rounded.line_line(Line3(Vec3(0.1, 0.2, 0.3), Vec3(1, 2, 2)), axis)
+    rounded.line_line(Line3(Vec3(0.1 + 3 * 0.7, 0.2 + 6 * 0.7,
+                                 0.3 + 6 * 0.7), Vec3(-2, -4, -4)), axis)
+    assert rounded.stats().hits == 1
+    # zero normals and directions are keyed on their coordinates
+    point = Line3(Vec3(1, 2, 3), Vec3(0, 0, 0))
+    assert cache.line_line(point, axis) == ShortestDistance.line_line(point,
+                                                                      axis)
+    assert cache.contains_point(Plane(P3(0, 0, 0), Vec3(0, 0, 0)),
+                                P3(1, 2, 3)) \
+        == Plane(P3(0, 0, 0), Vec3(0, 0, 0)).contains_point(P3(1, 2, 3))
+
+
+def test_query_cache_eviction():
+    cache = QueryCache(max_bytes=4096)
+    for i in range(100):
+        cache.point_point(P3(i, 0, 0), P3(0, 0, 0))
+    stats = cache.stats()
+    assert stats.size_bytes <= 4096 and stats.evictions > 0
+    assert stats.entries + stats.evictions == 100
+    # the most recently used entries are kept
+    cache.point_point(P3(99, 0, 0), P3(0, 0, 0))
+    assert cache.stats().hits == 1
+    cache.point_point(P3(0, 0, 0), P3(0, 0, 0))
+    assert cache.stats().hits == 1
+    with pytest.raises(ValueError):
+        QueryCache(quantum=-1)
+
+
+def test_query_cache_threads():
+    cache = QueryCache(max_bytes=1 << 14)
+    planes = [Plane(P3(0, 0, i), Vec3(0, 0, 1)) for i in range(10)]
+    points = [P3(0, 0, i % 12) for i in range(200)]
+    errors = []
+
+    def work():
+        for point in points:
+            for plane in planes:
+                if cache.contains_point(plane, point) \
+                        != plane.contains_point(point):
+                    errors.append((plane, point))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert not errors
+    assert stats.hits + stats.misses == 4 * 200 * 10
+    assert stats.size_bytes <= 1 << 14
+
+
+def test_point_projections():
+    rng = np.random.default_rng(43)
+    points = P3Array(rng.normal(size=(50, 3)) * 10)
+    lines = Line3Array(rng.normal(size=(50, 3)), rng.normal(size=(50, 3)))
+    projected, t, distances = point_line_projections(points, lines)
+    for k in (0, 17, 49):
+        line, point = lines[k], points[k]
+        assert np.isclose(t[k], line.closest_t(point))
+        expected = line.closest_point(point)
+        assert np.allclose(projected[k], [expected.x, expected.y, expected.z])
+        assert np.isclose(distances[k],
+                          ShortestDistance.point_point(point, expected))
+
+    projected, t, distances = point_segment_projections(
+        [P3(-1, 1, 0), P3(1, 1, 0), P3(3, 0, 2)],
+        Line3(Vec3(0, 0, 0), Vec3(2, 0, 0)),
+    )
+    assert projected.tolist() == [[0, 0, 0], [1, 0, 0], [2, 0, 0]]
+    assert t.tolist() == [0, 0.5, 1]
+    assert np.allclose(distances, [np.sqrt(2), 1, np.sqrt(5)])
+
+    plane = Plane(P3(1, 2, 3), Vec3(0.3, 0.4, 1))
+    projected, distances = point_plane_projections(points, plane)
+    assert np.allclose(distances, point_plane_distances(points, plane))
+    assert np.allclose(point_plane_distances(projected, plane), 0)
+    planes = PlaneArray(rng.normal(size=(50, 3)), rng.normal(size=50))
+    projected, distances = point_plane_projections(points, planes)
+    for k in (0, 17, 49):
+        expected = planes[k].closest_point(points[k])
+        assert np.allclose(projected[k], [expected.x, expected.y, expected.z])
+        assert np.isclose(distances[k], planes[k].signed_distance(points[k]))
+
+    single = point_line_projections(points.astype(np.float32), lines[3])
+    assert all(result.dtype == np.float32 for result in single)
+    with pytest.raises(ValueError):
+        point_line_projections(points, lines[:3])
+
+
+def test_nearest_segment_projections():
+    rng = np.random.default_rng(44)
+    points = rng.normal(size=(300, 3)) * 5
+    segments = Line3Array(rng.normal(size=(40, 3)) * 5,
+                          rng.normal(size=(40, 3)))
+    indices, projected, t, distances = nearest_segment_projections(
+        points, segments
+    )
+    all_distances = np.stack([
+        point_segment_projections(points, [segment] * len(points))[2]
+        for segment in segments
+    ], axis=1)
+    assert np.allclose(distances, all_distances.min(axis=1))
+    assert np.allclose(distances, all_distances[np.arange(300), indices])
+    assert ((t >= 0) & (t <= 1)).all()
+    assert np.allclose(projected, segments.origins[indices]
+                       + segments.directions[indices] * t[:, None])
+    with pytest.raises(ValueError):
+        nearest_segment_projections(points, [])
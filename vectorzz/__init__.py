@@ -1 +1,15 @@
 from .vectorz import *  # noqa: F401, F403
+from .batch import *  # noqa: F401, F403
+from .fitting import *  # noqa: F401, F403
+from .parallel import *  # noqa: F401, F403
+from .lazy import *  # noqa: F401, F403
+from .bounds import *  # noqa: F401, F403
+from .spatial_hash import *  # noqa: F401, F403
+from .octree import *  # noqa: F401, F403
+from .planar import *  # noqa: F401, F403
+from .ordering import *  # noqa: F401, F403
+from .mesh import *  # noqa: F401, F403
+from .hull import *  # noqa: F401, F403
+from .serialization import *  # noqa: F401, F403
+from .pipeline import *  # noqa: F401, F403
+from .cache import *  # noqa: F401, F403
@@ -0,0 +1,1050 @@
+"""This module provides array-backed collections of points
+ as well as vectorized functions that operate on many of them at once"""
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import numpy as np
+
+from .vectorz import P3, Vec3, Line3, Plane, DifferentDimensionException
+
+__all__ = [
+    "P3Array",
+    "Vec3Array",
+    "Line3Array",
+    "PlaneArray",
+    "point_plane_distances",
+    "plane_contains_points",
+    "line_plane_intersections",
+    "knn",
+    "line_line_closest_points",
+    "plane_plane_intersections",
+    "pairwise_plane_intersections",
+    "plane_plane_plane_intersections",
+    "point_line_projections",
+    "point_segment_projections",
+    "point_plane_projections",
+    "nearest_segment_projections",
+]
+
+# Maximum number of pairwise distances computed at once by knn,
+# which bounds its memory use to roughly 128 MB
+_KNN_BLOCK_ELEMENTS = 1 << 24
+
+# Number of plane pairs intersected at once by pairwise_plane_intersections
+_PAIR_BLOCK_ROWS = 1 << 20
+
+# Maximum number of point-segment pairs nearest_segment_projections
+# handles at once, which bounds its temporary arrays to roughly 100 MB
+_PROJECTION_BLOCK_PAIRS = 1 << 20
+
+# Smallest number of rows worth handing to a separate thread
+_MIN_ROWS_PER_THREAD = 16384
+
+# Number of float32 rows a kernel converts to float64 at once. The
+# converted block of 384 KB stays in the CPU cache, so computing in
+# float64 costs no extra memory traffic
+_UPCAST_BLOCK_ROWS = 16384
+
+# Thread pool shared by all batch functions called with workers > 1. It
+# is created once with one thread per CPU; its threads mark themselves in
+# _POOL_THREAD, so that batch functions called from them run serially
+_THREAD_POOL: ThreadPoolExecutor | None = None
+_THREAD_POOL_LOCK = threading.Lock()
+_POOL_THREAD = threading.local()
+
+T = TypeVar("T")
+
+
+def _storage_dtype(dtype, *arrays) -> np.dtype:
+    """
+    Returns the dtype a collection stores its arrays in: float32 or
+    float64. Without a dtype, float32 is kept when every array already
+    holds float32, and anything else is stored as float64
+    """
+    if dtype is None:
+        if arrays and all(isinstance(a, np.ndarray) and a.dtype == np.float32
+                          for a in arrays):
+            return np.dtype(np.float32)
+        return np.dtype(np.float64)
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"dtype must be float32 or float64, got {dtype}")
+    return dtype
+
+
+class P3Array:
+    """
+    Represents a collection of points in 3D space
+
+    The points are stored in a single ``(n, 3)`` array, so batch functions
+    can process all of them without creating a P3 object per point. The
+    array holds float64 values, or float32 values to halve the memory use;
+    see ``_storage_dtype`` for how the dtype is chosen.
+    """
+    def __init__(self, data, dtype=None) -> None:
+        data = np.asarray(data, dtype=_storage_dtype(dtype, data))
+        if data.ndim != 2 or data.shape[1] != 3:
+            raise ValueError(
+                f"Expected an array of shape (n, 3), got {data.shape} instead"
+            )
+        self.data: np.ndarray = data
+
+    @staticmethod
+    def from_points(points: Iterable[P3], dtype=np.float64) -> P3Array:
+        """Creates a collection from P3 objects"""
+        return P3Array(
+            np.array([(p.x, p.y, p.z) for p in points],
+                     dtype=np.float64).reshape(-1, 3), dtype
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the stored coordinates, float32 or float64"""
+        return self.data.dtype
+
+    def astype(self, dtype) -> P3Array:
+        """Returns a copy of the collection stored with another dtype"""
+        return P3Array(self.data.astype(_storage_dtype(dtype)))
+
+    def to_points(self) -> list[P3]:
+        """Converts the collection to a list of P3 objects"""
+        return [P3(x, y, z) for x, y, z in self.data.tolist()]
+
+    @property
+    def x(self) -> np.ndarray:
+        """The x coordinates of the points"""
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        """The y coordinates of the points"""
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        """The z coordinates of the points"""
+        return self.data[:, 2]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, item) -> P3 | P3Array:
+        """Returns a single point for an integer index and a collection
+        for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            x, y, z = self.data[item].tolist()
+            return P3(x, y, z)
+        return P3Array(self.data[item])
+
+    def __iter__(self) -> Iterator[P3]:
+        return iter(self.to_points())
+
+    def __str__(self) -> str:
+        return f"P3Array({len(self)} points)"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        # pickled as the raw array, which protocol 5 sends out of band
+        return P3Array, (self.data,)
+
+
+class Vec3Array:
+    """
+    Represents a collection of 3D vectors
+
+    The vectors are stored in a single ``(n, 3)`` array. Arithmetic works
+    element by element like it does for Vec3, and scalars can also be
+    given as an array with one value per vector. Call ``lazy`` to build an
+    expression that is evaluated in a single fused pass instead.
+    """
+    def __init__(self, data, dtype=None) -> None:
+        self.data: np.ndarray = P3Array(data, dtype).data
+
+    @staticmethod
+    def from_vectors(vectors: Iterable[Vec3], dtype=np.float64) -> Vec3Array:
+        """Creates a collection from Vec3 objects"""
+        return Vec3Array(
+            np.array([(v.x, v.y, v.z) for v in vectors],
+                     dtype=np.float64).reshape(-1, 3), dtype
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the stored components, float32 or float64"""
+        return self.data.dtype
+
+    def astype(self, dtype) -> Vec3Array:
+        """Returns a copy of the collection stored with another dtype"""
+        return Vec3Array(self.data.astype(_storage_dtype(dtype)))
+
+    def to_vectors(self) -> list[Vec3]:
+        """Converts the collection to a list of Vec3 objects"""
+        return [Vec3(x, y, z) for x, y, z in self.data.tolist()]
+
+    @property
+    def x(self) -> np.ndarray:
+        """The x components of the vectors"""
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        """The y components of the vectors"""
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        """The z components of the vectors"""
+        return self.data[:, 2]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, item) -> Vec3 | Vec3Array:
+        """Returns a single vector for an integer index and a collection
+        for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            x, y, z = self.data[item].tolist()
+            return Vec3(x, y, z)
+        return Vec3Array(self.data[item])
+
+    def __iter__(self) -> Iterator[Vec3]:
+        return iter(self.to_vectors())
+
+    def __str__(self) -> str:
+        return f"Vec3Array({len(self)} vectors)"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        return Vec3Array, (self.data,)
+
+    def _other_data(self, other) -> np.ndarray:
+        """Returns the array of another collection of the same size"""
+        if type(other) is not Vec3Array:
+            raise DifferentDimensionException(self, other)
+        if len(other) != len(self):
+            raise ValueError(
+                f"Collections have different lengths: "
+                f"{len(self)} and {len(other)}"
+            )
+        return other.data
+
+    def _scalar(self, other) -> float | np.ndarray:
+        """Returns a scalar or one scalar per vector, ready to broadcast"""
+        if isinstance(other, np.ndarray) and other.ndim == 1:
+            return other[:, None]
+        return other
+
+    def __add__(self, other: Vec3Array) -> Vec3Array:
+        """Adds two collections of vectors element by element"""
+        if _is_lazy(other):
+            return NotImplemented
+        return Vec3Array(self.data + self._other_data(other))
+
+    def __sub__(self, other: Vec3Array) -> Vec3Array:
+        """Subtracts two collections of vectors element by element"""
+        if _is_lazy(other):
+            return NotImplemented
+        return Vec3Array(self.data - self._other_data(other))
+
+    def __mul__(self, other: int | float | np.ndarray) -> Vec3Array:
+        """Multiplies the vectors by a scalar or by one scalar each"""
+        return Vec3Array(self.data * self._scalar(other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: int | float | np.ndarray) -> Vec3Array:
+        """Divides the vectors by a scalar or by one scalar each"""
+        return Vec3Array(self.data / self._scalar(other))
+
+    def __neg__(self) -> Vec3Array:
+        return Vec3Array(-self.data)
+
+    def magnitude(self) -> np.ndarray:
+        """Calculates the magnitude of every vector"""
+        return _float64_rows(
+            lambda start, stop: np.sqrt(_rowwise_dot(
+                _float64(self.data[start:stop]),
+                _float64(self.data[start:stop]))),
+            len(self), (), self.data.dtype
+        )
+
+    def dot(self, other: Vec3Array) -> np.ndarray:
+        """Calculates the dot product of every pair of corresponding
+        vectors, in float64 and returned with the dtype of the vectors"""
+        b = self._other_data(other)
+        return _float64_rows(
+            lambda start, stop: _rowwise_dot(_float64(self.data[start:stop]),
+                                             _float64(b[start:stop])),
+            len(self), (), np.result_type(self.data, b)
+        )
+
+    def cross(self, other: Vec3Array) -> Vec3Array:
+        """Calculates the cross product of every pair of corresponding
+        vectors, in float64 and returned with the dtype of the vectors"""
+        b = self._other_data(other)
+        return Vec3Array(_float64_rows(
+            lambda start, stop: np.cross(_float64(self.data[start:stop]),
+                                         _float64(b[start:stop])),
+            len(self), (3,), np.result_type(self.data, b)
+        ))
+
+    def lazy(self):
+        """
+        Starts a lazy expression. Operations on the returned LazyVec3 only
+        record what to compute, and the result is calculated in one pass
+        when it is evaluated or accessed
+        """
+        from .lazy import LazyVec3
+        return LazyVec3.leaf(self.data)
+
+
+def _is_lazy(obj) -> bool:
+    """Checks if an object is a lazy vector expression"""
+    from .lazy import LazyVec3
+    return isinstance(obj, LazyVec3)
+
+
+class Line3Array:
+    """
+    Represents a collection of lines in 3D space
+
+    The origin and direction vectors are stored in two ``(n, 3)`` arrays
+    of the same dtype.
+    """
+    def __init__(self, origins, directions, dtype=None) -> None:
+        dtype = _storage_dtype(dtype, origins, directions)
+        self.origins: np.ndarray = P3Array(origins, dtype).data
+        self.directions: np.ndarray = P3Array(directions, dtype).data
+        if self.origins.shape != self.directions.shape:
+            raise ValueError(
+                f"Got {len(self.origins)} origins and "
+                f"{len(self.directions)} directions"
+            )
+
+    @staticmethod
+    def from_lines(lines: Iterable[Line3], dtype=np.float64) -> Line3Array:
+        """Creates a collection from Line3 objects"""
+        lines = list(lines)
+        return Line3Array(
+            np.array([line._origin for line in lines],
+                     dtype=np.float64).reshape(-1, 3),
+            np.array([line._direction for line in lines],
+                     dtype=np.float64).reshape(-1, 3),
+            dtype,
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the stored vectors, float32 or float64"""
+        return self.origins.dtype
+
+    def astype(self, dtype) -> Line3Array:
+        """Returns a copy of the collection stored with another dtype"""
+        dtype = _storage_dtype(dtype)
+        return Line3Array(self.origins.astype(dtype),
+                          self.directions.astype(dtype))
+
+    def to_lines(self) -> list[Line3]:
+        """Converts the collection to a list of Line3 objects"""
+        return [
+            Line3(Vec3(*origin), Vec3(*direction))
+            for origin, direction in zip(self.origins.tolist(),
+                                         self.directions.tolist())
+        ]
+
+    def __len__(self) -> int:
+        return len(self.origins)
+
+    def __getitem__(self, item) -> Line3 | Line3Array:
+        """Returns a single line for an integer index and a collection
+        for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            return Line3(Vec3(*self.origins[item].tolist()),
+                         Vec3(*self.directions[item].tolist()))
+        return Line3Array(self.origins[item], self.directions[item])
+
+    def __iter__(self) -> Iterator[Line3]:
+        return iter(self.to_lines())
+
+    def __str__(self) -> str:
+        return f"Line3Array({len(self)} lines)"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        return Line3Array, (self.origins, self.directions)
+
+
+class PlaneArray:
+    """
+    Represents a collection of planes in 3D space
+
+    Every plane is stored by the coefficients of its equation
+    Ax + By + Cz + D = 0: the normal vectors (A, B, C) in an ``(n, 3)``
+    array and the D values in an ``(n,)`` array of the same dtype.
+    """
+    def __init__(self, normals, d, dtype=None) -> None:
+        dtype = _storage_dtype(dtype, normals, d)
+        self.normals: np.ndarray = P3Array(normals, dtype).data
+        self.d: np.ndarray = np.asarray(d, dtype=dtype).reshape(-1)
+        if len(self.normals) != len(self.d):
+            raise ValueError(
+                f"Got {len(self.normals)} normals and {len(self.d)} d values"
+            )
+
+    @staticmethod
+    def from_planes(planes: Iterable[Plane], dtype=np.float64) -> PlaneArray:
+        """Creates a collection from Plane objects"""
+        planes = list(planes)
+        return PlaneArray(
+            np.array([plane._abc for plane in planes],
+                     dtype=np.float64).reshape(-1, 3),
+            np.array([plane.d for plane in planes], dtype=np.float64),
+            dtype,
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the stored coefficients, float32 or float64"""
+        return self.normals.dtype
+
+    def astype(self, dtype) -> PlaneArray:
+        """Returns a copy of the collection stored with another dtype"""
+        dtype = _storage_dtype(dtype)
+        return PlaneArray(self.normals.astype(dtype), self.d.astype(dtype))
+
+    def to_planes(self) -> list[Plane]:
+        """Converts the collection to a list of Plane objects"""
+        return [
+            Plane.from_normal_and_d(Vec3(*normal), d)
+            for normal, d in zip(self.normals.tolist(), self.d.tolist())
+        ]
+
+    def __len__(self) -> int:
+        return len(self.normals)
+
+    def __getitem__(self, item) -> Plane | PlaneArray:
+        """Returns a single plane for an integer index and a collection
+        for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            return Plane.from_normal_and_d(
+                Vec3(*self.normals[item].tolist()), float(self.d[item])
+            )
+        return PlaneArray(self.normals[item], self.d[item])
+
+    def __iter__(self) -> Iterator[Plane]:
+        return iter(self.to_planes())
+
+    def __str__(self) -> str:
+        return f"PlaneArray({len(self)} planes)"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        return PlaneArray, (self.normals, self.d)
+
+
+def _as_array(points: P3Array | np.ndarray | Iterable[P3]) -> np.ndarray:
+    """Returns the (n, 3) coordinate array of a collection of points,
+    which can also be given as P3 objects or as rows of coordinates"""
+    if isinstance(points, P3Array):
+        return points.data
+    if not isinstance(points, np.ndarray):
+        points = list(points)
+        if not points or isinstance(points[0], P3):
+            return P3Array.from_points(points).data
+    return P3Array(points).data
+
+
+def _mark_pool_thread() -> None:
+    _POOL_THREAD.active = True
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    """Returns the shared thread pool, so that small batches do not pay for
+    starting threads. Ranges beyond its size wait in its queue"""
+    global _THREAD_POOL
+    with _THREAD_POOL_LOCK:
+        if _THREAD_POOL is None:
+            _THREAD_POOL = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix="vectorzz",
+                initializer=_mark_pool_thread,
+            )
+        return _THREAD_POOL
+
+
+def _split_rows(func: Callable[[int, int], T], n: int,
+                workers: int | None,
+                min_rows: int = _MIN_ROWS_PER_THREAD) -> list[T]:
+    """
+    Calls func(start, stop) on disjoint row ranges covering range(n)
+    and returns the results in order.
+
+    With more than one worker the ranges are processed on a thread pool.
+    NumPy releases the GIL inside ufuncs and matrix products, so kernels
+    that write into disjoint slices of preallocated arrays run in
+    parallel. ``workers=None`` uses one thread per CPU. Every thread gets
+    at least ``min_rows`` rows, so small inputs are not split. Calls made
+    from a thread of the pool run serially, since waiting for the pool
+    from inside it could deadlock.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, n // min_rows)
+    if workers <= 1 or getattr(_POOL_THREAD, "active", False):
+        return [func(0, n)]
+    bounds = np.linspace(0, n, workers + 1).astype(int).tolist()
+    pool = _thread_pool()
+    futures = [pool.submit(func, start, stop)
+               for start, stop in zip(bounds[1:-1], bounds[2:])]
+    # the calling thread processes the first range itself
+    return [func(bounds[0], bounds[1])] + [f.result() for f in futures]
+
+
+def _float64(data: np.ndarray) -> np.ndarray:
+    """Returns an array as float64, without a copy if it already is"""
+    return data.astype(np.float64, copy=False)
+
+
+def _upcast_blocks(dtype: np.dtype, start: int,
+                   stop: int) -> Iterator[tuple[int, int]]:
+    """
+    Splits a row range into the blocks a kernel converts to float64: the
+    whole range for float64 data, which needs no conversion, and blocks
+    that fit in the CPU cache for float32 data
+    """
+    if dtype == np.float64:
+        yield start, stop
+        return
+    for first in range(start, stop, _UPCAST_BLOCK_ROWS):
+        yield first, min(first + _UPCAST_BLOCK_ROWS, stop)
+
+
+def _float64_out(result: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """The float64 rows a kernel writes into: the rows of a float64 result
+    themselves, otherwise a temporary block that is copied into the result
+    afterwards, which rounds every value once"""
+    if result.dtype == np.float64:
+        return result[start:stop]
+    return np.empty((stop - start, *result.shape[1:]), dtype=np.float64)
+
+
+def _float64_rows(func: Callable[[int, int], np.ndarray], n: int,
+                  shape: tuple, dtype: np.dtype) -> np.ndarray:
+    """Builds an (n, *shape) array of dtype from func(start, stop), which
+    computes a block of its rows in float64. Every block is copied into
+    the result anyway, so float64 rows are processed in blocks as well"""
+    result = np.empty((n, *shape), dtype=dtype)
+    for start in range(0, n, _UPCAST_BLOCK_ROWS):
+        stop = min(start + _UPCAST_BLOCK_ROWS, n)
+        result[start:stop] = func(start, stop)
+    return result
+
+
+def point_plane_distances(points: P3Array | np.ndarray | Iterable[P3],
+                          plane: Plane,
+                          signed: bool = True,
+                          workers: int | None = 1) -> np.ndarray:
+    """
+    Distances from many points to a plane. Signed distances are positive
+    on the side the normal vector of the plane points to
+    """
+    data = _as_array(points)
+    unit_normal, distance = plane.canonical_form()
+    n = np.array([unit_normal.x, unit_normal.y, unit_normal.z])
+    result = np.empty(len(data), dtype=data.dtype)
+
+    def kernel(start: int, stop: int) -> None:
+        for first, last in _upcast_blocks(data.dtype, start, stop):
+            out = _float64_out(result, first, last)
+            np.matmul(_float64(data[first:last]), n, out=out)
+            out += distance
+            if not signed:
+                np.abs(out, out=out)
+            if result.dtype != np.float64:
+                result[first:last] = out
+
+    _split_rows(kernel, len(data), workers)
+    return result
+
+
+def plane_contains_points(plane: Plane,
+                          points: P3Array | np.ndarray | Iterable[P3],
+                          tolerance: float = 0.0,
+                          workers: int | None = 1) -> np.ndarray:
+    """
+    Checks which points lie on a plane. A point is on the plane if the
+    plane equation evaluated at that point is at most ``tolerance`` in
+    absolute value; the default of 0 matches Plane.contains_point
+    """
+    data = _as_array(points)
+    a, b, c = plane.normal.x, plane.normal.y, plane.normal.z
+    abc = np.array([a, b, c], dtype=np.float64)
+    result = np.empty(len(data), dtype=bool)
+
+    def kernel(start: int, stop: int) -> None:
+        for first, last in _upcast_blocks(data.dtype, start, stop):
+            values = _float64(data[first:last]) @ abc
+            values += plane.d
+            np.abs(values, out=values)
+            np.less_equal(values, tolerance, out=result[first:last])
+
+    _split_rows(kernel, len(data), workers)
+    return result
+
+
+def _as_lines(lines: Line3Array | Iterable[Line3]) -> Line3Array:
+    """Returns lines as a Line3Array"""
+    if isinstance(lines, Line3Array):
+        return lines
+    return Line3Array.from_lines(lines)
+
+
+def line_plane_intersections(lines: Line3Array | Iterable[Line3],
+                             plane: Plane,
+                             workers: int | None = 1) -> np.ndarray:
+    """
+    Intersection points of many lines with a plane, as an (n, 3) array.
+    Lines that are parallel to the plane, including lines that lie on it,
+    have no single intersection point and get a row of NaN
+    """
+    lines = _as_lines(lines)
+    normal = np.array([plane.normal.x, plane.normal.y, plane.normal.z],
+                      dtype=np.float64)
+    result = np.empty((len(lines), 3), dtype=lines.dtype)
+
+    def kernel(start: int, stop: int) -> None:
+        for first, last in _upcast_blocks(lines.dtype, start, stop):
+            origins = _float64(lines.origins[first:last])
+            directions = _float64(lines.directions[first:last])
+            denominator = directions @ normal
+            t = origins @ normal
+            t += plane.d
+            np.negative(t, out=t)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t /= denominator
+            t[denominator == 0] = np.nan
+            out = _float64_out(result, first, last)
+            np.multiply(directions, t[:, None], out=out)
+            out += origins
+            if result.dtype != np.float64:
+                result[first:last] = out
+
+    _split_rows(kernel, len(lines), workers)
+    return result
+
+
+def knn(points: P3Array | np.ndarray | Iterable[P3],
+        queries: P3Array | np.ndarray | Iterable[P3],
+        k: int = 1,
+        workers: int | None = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the k nearest points to every query point by brute force.
+    Returns two (m, k) arrays with the distances and the indices of the
+    neighbours, ordered from nearest to farthest.
+
+    When the points and the queries are float32, the neighbours are
+    selected with float32 distances and the distances of the selected
+    neighbours are then recomputed in float64 from the coordinates, so
+    they are accurate to float32 precision. Only a neighbour whose squared
+    distance is within about 2^-21 (|q|^2 + |p|^2) of that of the k-th
+    nearest point can be swapped with it
+    """
+    data = _as_array(points)
+    queries = _as_array(queries)
+    if not 0 < k <= len(data):
+        raise ValueError(f"k must be between 1 and {len(data)}, got {k}")
+    dtype = np.result_type(data, queries)
+    data, queries = data.astype(dtype, copy=False), \
+        queries.astype(dtype, copy=False)
+    distances = np.empty((len(queries), k), dtype=dtype)
+    indices = np.empty((len(queries), k), dtype=np.intp)
+    data_sq = np.einsum("ij,ij->i", data, data)
+    # every thread holds one block of pairwise distances
+    threads = workers or os.cpu_count() or 1
+    block = max(1, _KNN_BLOCK_ELEMENTS // (max(1, len(data)) * threads))
+
+    def kernel(first: int, last: int) -> None:
+        for start in range(first, last, block):
+            stop = min(start + block, last)
+            q = queries[start:stop]
+            # |q - p|^2 = |q|^2 - 2 q.p + |p|^2
+            sq = q @ data.T
+            sq *= -2
+            sq += data_sq
+            sq += np.einsum("ij,ij->i", q, q)[:, None]
+            if k < len(data):
+                nearest = np.argpartition(sq, k - 1, axis=1)[:, :k]
+            else:
+                nearest = np.broadcast_to(np.arange(k), (len(q), k))
+            if dtype == np.float64:
+                nearest_sq = np.take_along_axis(sq, nearest, axis=1)
+            else:
+                offsets = _float64(data[nearest]) - _float64(q)[:, None]
+                nearest_sq = np.einsum("ijk,ijk->ij", offsets, offsets)
+            order = np.argsort(nearest_sq, axis=1)
+            indices[start:stop] = np.take_along_axis(nearest, order, 1)
+            np.maximum(np.take_along_axis(nearest_sq, order, 1), 0,
+                       out=distances[start:stop])
+            np.sqrt(distances[start:stop], out=distances[start:stop])
+
+    # every query row is compared with all points, so even a few rows
+    # are worth a thread
+    _split_rows(kernel, len(queries), workers, min_rows=1)
+    return distances, indices
+
+
+def _as_planes(planes: PlaneArray | Iterable[Plane]) -> PlaneArray:
+    """Returns planes as a PlaneArray"""
+    if isinstance(planes, PlaneArray):
+        return planes
+    return PlaneArray.from_planes(planes)
+
+
+def _rowwise_dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Dot products of corresponding rows of two (n, 3) arrays"""
+    return np.einsum("ij,ij->i", a, b)
+
+
+def _is_parallel(cross_sq: np.ndarray, a: np.ndarray, b: np.ndarray,
+                 tolerance: float) -> np.ndarray:
+    """
+    Checks which pairs of rows of a and b are parallel, given the squared
+    magnitudes of their cross products. The tolerance is the largest sine
+    of the angle between two vectors that are treated as parallel
+    """
+    if tolerance == 0:
+        return cross_sq == 0
+    return cross_sq <= (tolerance * tolerance) \
+        * _rowwise_dot(a, a) * _rowwise_dot(b, b)
+
+
+def line_line_closest_points(lines1: Line3Array | Iterable[Line3],
+                             lines2: Line3Array | Iterable[Line3],
+                             tolerance: float = 0.0
+                             ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every pair of corresponding lines, calculates the point on each
+    line that is closest to the other line, like
+    Intersection.closest_points. Returns two (n, 3) arrays; pairs of
+    parallel lines get rows of NaN. Directions within ``tolerance`` (the
+    sine of the angle between them) of being parallel are treated as
+    parallel. The closest points of intersecting lines are their
+    intersection point
+    """
+    lines1, lines2 = _as_lines(lines1), _as_lines(lines2)
+    if len(lines1) != len(lines2):
+        raise ValueError(
+            f"Got {len(lines1)} and {len(lines2)} lines, expected the same"
+        )
+    dtype = np.result_type(lines1.dtype, lines2.dtype)
+    o1, o2 = _float64(lines1.origins), _float64(lines2.origins)
+    d1, d2 = _float64(lines1.directions), _float64(lines2.directions)
+    n = np.cross(d1, d2)
+    n_sq = _rowwise_dot(n, n)
+    n_sq[_is_parallel(n_sq, d1, d2, tolerance)] = np.nan
+    w = o2 - o1
+    t = _rowwise_dot(np.cross(w, d2), n) / n_sq
+    s = _rowwise_dot(np.cross(w, d1), n) / n_sq
+    return ((o1 + d1 * t[:, None]).astype(dtype, copy=False),
+            (o2 + d2 * s[:, None]).astype(dtype, copy=False))
+
+
+def _plane_plane(n1: np.ndarray, d1: np.ndarray,
+                 n2: np.ndarray, d2: np.ndarray,
+                 tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """Origins and directions of the lines in which planes intersect,
+    computed in float64"""
+    n1, d1, n2, d2 = (_float64(a) for a in (n1, d1, n2, d2))
+    u = np.cross(n1, n2)
+    u_sq = _rowwise_dot(u, u)
+    u_sq[_is_parallel(u_sq, n1, n2, tolerance)] = np.nan
+    # see Intersection.plane_plane
+    origins = np.cross(n2, u) * -d1[:, None]
+    origins += np.cross(u, n1) * -d2[:, None]
+    origins /= u_sq[:, None]
+    u[np.isnan(u_sq)] = np.nan
+    return origins, u
+
+
+def plane_plane_intersections(planes1: PlaneArray | Iterable[Plane],
+                              planes2: PlaneArray | Iterable[Plane],
+                              tolerance: float = 0.0) -> Line3Array:
+    """
+    Lines in which corresponding pairs of planes intersect, like
+    Intersection.plane_plane. Parallel planes get rows of NaN.
+    Normal vectors within ``tolerance`` (the sine of the angle between
+    them) of being parallel are treated as parallel
+    """
+    planes1, planes2 = _as_planes(planes1), _as_planes(planes2)
+    if len(planes1) != len(planes2):
+        raise ValueError(
+            f"Got {len(planes1)} and {len(planes2)} planes, expected the same"
+        )
+    return Line3Array(*_plane_plane(planes1.normals, planes1.d,
+                                    planes2.normals, planes2.d, tolerance),
+                      np.result_type(planes1.dtype, planes2.dtype))
+
+
+def pairwise_plane_intersections(planes: PlaneArray | Iterable[Plane],
+                                 tolerance: float = 0.0
+                                 ) -> tuple[np.ndarray, np.ndarray,
+                                            Line3Array]:
+    """
+    Intersects every pair of planes in a collection. Returns the indices
+    i < j of the pairs that are not parallel and the lines in which they
+    intersect
+    """
+    planes = _as_planes(planes)
+    i, j = np.triu_indices(len(planes), k=1)
+    results = []
+    # the pairs are processed in blocks to bound the temporary arrays
+    for start in range(0, len(i), _PAIR_BLOCK_ROWS):
+        bi = i[start:start + _PAIR_BLOCK_ROWS]
+        bj = j[start:start + _PAIR_BLOCK_ROWS]
+        origins, directions = _plane_plane(planes.normals[bi], planes.d[bi],
+                                           planes.normals[bj], planes.d[bj],
+                                           tolerance)
+        keep = ~np.isnan(directions[:, 0])
+        results.append((bi[keep], bj[keep],
+                        origins[keep].astype(planes.dtype, copy=False),
+                        directions[keep].astype(planes.dtype, copy=False)))
+    if not results:
+        return i, j, Line3Array(np.empty((0, 3)), np.empty((0, 3)),
+                                planes.dtype)
+    i, j, origins, directions = (np.concatenate(r) for r in zip(*results))
+    return i, j, Line3Array(origins, directions)
+
+
+def plane_plane_plane_intersections(planes1: PlaneArray | Iterable[Plane],
+                                    planes2: PlaneArray | Iterable[Plane],
+                                    planes3: PlaneArray | Iterable[Plane],
+                                    tolerance: float = 0.0) -> np.ndarray:
+    """
+    Points in which corresponding triples of planes intersect, like
+    Intersection.plane_plane_plane, as an (n, 3) array. Triples without a
+    single intersection point get a row of NaN. A triple is treated as
+    singular when the determinant of its unit normals is at most
+    ``tolerance`` in absolute value
+    """
+    planes = [_as_planes(p) for p in (planes1, planes2, planes3)]
+    if len({len(p) for p in planes}) != 1:
+        raise ValueError("Expected the same number of planes in each input")
+    dtype = np.result_type(*(p.dtype for p in planes))
+    (n1, n2, n3), (h1, h2, h3) = zip(*((_float64(p.normals), -_float64(p.d))
+                                       for p in planes))
+    c23, c31, c12 = np.cross(n2, n3), np.cross(n3, n1), np.cross(n1, n2)
+    determinant = _rowwise_dot(n1, c23)
+    lengths = np.sqrt(_rowwise_dot(n1, n1) * _rowwise_dot(n2, n2)
+                      * _rowwise_dot(n3, n3))
+    singular = np.abs(determinant) <= tolerance * lengths
+    determinant[singular] = np.nan
+    # Cramer's rule for n_i . r = -d_i
+    result = c23 * h1[:, None]
+    result += c31 * h2[:, None]
+    result += c12 * h3[:, None]
+    result /= determinant[:, None]
+    return result.astype(dtype, copy=False)
+
+
+def _line_rows(lines: Line3 | Line3Array | Iterable[Line3],
+               n: int) -> tuple[np.ndarray, np.ndarray, np.dtype | None]:
+    """
+    The origins and directions of the lines that n points are projected
+    onto: a single Line3 shared by all points, or one line per point.
+    Also returns the dtype of the collection, or None for a single line
+    """
+    if isinstance(lines, Line3):
+        return (np.broadcast_to(np.array(lines._origin, dtype=np.float64),
+                                (n, 3)),
+                np.broadcast_to(np.array(lines._direction, dtype=np.float64),
+                                (n, 3)),
+                None)
+    lines = _as_lines(lines)
+    if len(lines) != n:
+        raise ValueError(
+            f"Got {n} points and {len(lines)} lines, expected the same "
+            f"number or a single Line3"
+        )
+    return lines.origins, lines.directions, lines.dtype
+
+
+def _project_lines(points: P3Array | np.ndarray | Iterable[P3],
+                   lines: Line3 | Line3Array | Iterable[Line3],
+                   clamp: bool,
+                   workers: int | None
+                   ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Projects points onto lines, or onto segments with clamp"""
+    data = _as_array(points)
+    origins, directions, dtype = _line_rows(lines, len(data))
+    dtype = data.dtype if dtype is None else np.result_type(data, dtype)
+    projected = np.empty((len(data), 3), dtype=dtype)
+    t = np.empty(len(data), dtype=dtype)
+    distances = np.empty(len(data), dtype=dtype)
+
+    def kernel(start: int, stop: int) -> None:
+        for first, last in _upcast_blocks(dtype, start, stop):
+            p = _float64(data[first:last])
+            o = _float64(origins[first:last])
+            d = _float64(directions[first:last])
+            # see Line3.closest_t
+            w = p - o
+            d_sq = _rowwise_dot(d, d)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                s = _rowwise_dot(w, d) / d_sq
+            s[d_sq == 0] = 0
+            if clamp:
+                np.clip(s, 0, 1, out=s)
+            out = _float64_out(projected, first, last)
+            np.multiply(d, s[:, None], out=out)
+            out += o
+            # the distance is taken from the residual rather than from
+            # |w|^2 - s (w . d), which cancels for points near the line
+            np.subtract(p, out, out=w)
+            t[first:last] = s
+            distances[first:last] = np.sqrt(_rowwise_dot(w, w))
+            if projected.dtype != np.float64:
+                projected[first:last] = out
+
+    _split_rows(kernel, len(data), workers)
+    return projected, t, distances
+
+
+def point_line_projections(points: P3Array | np.ndarray | Iterable[P3],
+                           lines: Line3 | Line3Array | Iterable[Line3],
+                           workers: int | None = 1
+                           ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Projects points onto a single Line3 or onto one line per point, like
+    Line3.closest_point. Returns the (n, 3) projected points, the t
+    values at which Line3.point_at_t gives them and the distances from
+    the points to the lines, all computed in one pass. Lines with a zero
+    direction vector project points onto their origin with t = 0
+    """
+    return _project_lines(points, lines, False, workers)
+
+
+def point_segment_projections(points: P3Array | np.ndarray | Iterable[P3],
+                              segments: Line3 | Line3Array | Iterable[Line3],
+                              workers: int | None = 1
+                              ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Closest points of segments to points, like point_line_projections.
+    A segment is a line whose points with t between 0 and 1 form the
+    segment, as created by Line3.from_points, and t is clamped to that
+    range
+    """
+    return _project_lines(points, segments, True, workers)
+
+
+def point_plane_projections(points: P3Array | np.ndarray | Iterable[P3],
+                            planes: Plane | PlaneArray | Iterable[Plane],
+                            workers: int | None = 1
+                            ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Projects points onto a single Plane or onto one plane per point, like
+    Plane.closest_point. Returns the (n, 3) projected points and the
+    signed distances from the planes to the points, which are positive on
+    the side the normal vectors point to. Planes in a collection with a
+    zero normal vector get rows of NaN
+    """
+    data = _as_array(points)
+    if isinstance(planes, Plane):
+        if planes.normal_squared_magnitude == 0:
+            raise ValueError(
+                "Points cannot be projected onto a plane with a zero "
+                "normal vector"
+            )
+        normals = np.broadcast_to(np.array(planes._abc, dtype=np.float64),
+                                  (len(data), 3))
+        d = np.broadcast_to(np.float64(planes.d), len(data))
+        dtype = data.dtype
+    else:
+        planes = _as_planes(planes)
+        if len(planes) != len(data):
+            raise ValueError(
+                f"Got {len(data)} points and {len(planes)} planes, expected "
+                f"the same number or a single Plane"
+            )
+        normals, d = planes.normals, planes.d
+        dtype = np.result_type(data, planes.dtype)
+    projected = np.empty((len(data), 3), dtype=dtype)
+    distances = np.empty(len(data), dtype=dtype)
+
+    def kernel(start: int, stop: int) -> None:
+        for first, last in _upcast_blocks(dtype, start, stop):
+            p = _float64(data[first:last])
+            n = _float64(normals[first:last])
+            # the plane equation at every point is shared by the
+            # projection and the distance
+            values = _rowwise_dot(p, n)
+            values += d[first:last]
+            n_sq = _rowwise_dot(n, n)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out = _float64_out(projected, first, last)
+                np.multiply(n, (values / n_sq)[:, None], out=out)
+                np.subtract(p, out, out=out)
+                distances[first:last] = values / np.sqrt(n_sq)
+            if projected.dtype != np.float64:
+                projected[first:last] = out
+
+    _split_rows(kernel, len(data), workers)
+    return projected, distances
+
+
+def nearest_segment_projections(points: P3Array | np.ndarray | Iterable[P3],
+                                segments: Line3Array | Iterable[Line3],
+                                workers: int | None = 1
+                                ) -> tuple[np.ndarray, np.ndarray,
+                                           np.ndarray, np.ndarray]:
+    """
+    Snaps every point to the nearest of many segments by brute force.
+    Returns the index of the nearest segment of every point and, like
+    point_segment_projections, the projected points, their t values on
+    that segment and the distances. Segments are given as lines, as in
+    point_segment_projections
+    """
+    data = _as_array(points)
+    segments = _as_lines(segments)
+    if not len(segments):
+        raise ValueError("Points cannot be snapped to no segments")
+    dtype = np.result_type(data, segments.dtype)
+    o = _float64(segments.origins)
+    d = _float64(segments.directions)
+    d_sq = _rowwise_dot(d, d)
+    # segments of a single point project everything onto their origin
+    inverse = np.divide(1, d_sq, out=np.zeros_like(d_sq), where=d_sq != 0)
+    indices = np.empty(len(data), dtype=np.intp)
+    projected = np.empty((len(data), 3), dtype=dtype)
+    t = np.empty(len(data), dtype=dtype)
+    distances = np.empty(len(data), dtype=dtype)
+    block_rows = max(1, _PROJECTION_BLOCK_PAIRS // len(segments))
+
+    def kernel(start: int, stop: int) -> None:
+        for first in range(start, stop, block_rows):
+            last = min(first + block_rows, stop)
+            p = _float64(data[first:last])
+            w = p[:, None, :] - o
+            s = np.einsum("ijk,jk->ij", w, d)
+            s *= inverse
+            np.clip(s, 0, 1, out=s)
+            w -= s[:, :, None] * d
+            distances_sq = np.einsum("ijk,ijk->ij", w, w)
+            best = np.argmin(distances_sq, axis=1)
+            rows = np.arange(len(best))
+            s = s[rows, best]
+            indices[first:last] = best
+            projected[first:last] = o[best] + d[best] * s[:, None]
+            t[first:last] = s
+            distances[first:last] = np.sqrt(distances_sq[rows, best])
+
+    _split_rows(kernel, len(data), workers,
+                max(1, _MIN_ROWS_PER_THREAD // len(segments)))
+    return indices, projected, t, distances
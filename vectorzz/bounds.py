@@ -0,0 +1,280 @@
+"""This module provides axis-aligned bounding boxes
+ as well as batched overlap and containment tests for them"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .batch import P3Array, Line3Array, _as_array, _as_lines
+from .vectorz import P3, Line3
+
+__all__ = [
+    "AABB",
+    "AABBArray",
+    "box_box_overlaps",
+    "line_box_intersections",
+]
+
+# Number of rows reduced at once by AABB.from_points. A block stays in the
+# CPU cache while its minimum and maximum are taken, so the points are
+# read from memory only once
+_BOUNDS_BLOCK_ROWS = 1 << 16
+
+# Maximum number of box pairs tested at once by box_box_overlaps,
+# which bounds its memory use
+_OVERLAP_BLOCK_ELEMENTS = 1 << 22
+
+
+class AABB:
+    """
+    Represents an axis-aligned bounding box in 3D space
+
+    The box contains every point whose coordinates lie between the
+    coordinates of its minimum and maximum corners, boundaries included.
+    """
+    def __init__(self, minimum: P3, maximum: P3) -> None:
+        self.minimum: np.ndarray = np.array(
+            [minimum.x, minimum.y, minimum.z], dtype=np.float64
+        )
+        self.maximum: np.ndarray = np.array(
+            [maximum.x, maximum.y, maximum.z], dtype=np.float64
+        )
+        if (self.minimum > self.maximum).any():
+            raise ValueError(
+                f"The minimum corner {minimum} is greater than the "
+                f"maximum corner {maximum}"
+            )
+
+    @staticmethod
+    def from_arrays(minimum, maximum) -> AABB:
+        """Creates a box from the coordinates of its corners"""
+        return AABB(P3(*np.asarray(minimum, dtype=np.float64).tolist()),
+                    P3(*np.asarray(maximum, dtype=np.float64).tolist()))
+
+    @staticmethod
+    def from_points(points: P3Array | np.ndarray | Iterable[P3]) -> AABB:
+        """Creates the smallest box that contains all points"""
+        data = _as_array(points)
+        if len(data) == 0:
+            raise ValueError("Cannot compute the bounds of no points")
+        minimum = data[0].copy()
+        maximum = data[0].copy()
+        for start in range(0, len(data), _BOUNDS_BLOCK_ROWS):
+            block = data[start:start + _BOUNDS_BLOCK_ROWS]
+            np.minimum(minimum, block.min(axis=0), out=minimum)
+            np.maximum(maximum, block.max(axis=0), out=maximum)
+        return AABB.from_arrays(minimum, maximum)
+
+    def __str__(self) -> str:
+        return f"AABB({self.min_point}, {self.max_point})"
+
+    __repr__ = __str__
+
+    def __eq__(self, other: AABB) -> bool:
+        """Checks if two boxes have the same corners"""
+        return (np.array_equal(self.minimum, other.minimum)
+                and np.array_equal(self.maximum, other.maximum))
+
+    @property
+    def min_point(self) -> P3:
+        """The corner with the smallest coordinates"""
+        return P3(*self.minimum.tolist())
+
+    @property
+    def max_point(self) -> P3:
+        """The corner with the largest coordinates"""
+        return P3(*self.maximum.tolist())
+
+    @property
+    def center(self) -> P3:
+        """The center of the box"""
+        return P3(*((self.minimum + self.maximum) / 2).tolist())
+
+    @property
+    def size(self) -> np.ndarray:
+        """The lengths of the edges of the box along x, y and z"""
+        return self.maximum - self.minimum
+
+    def volume(self) -> float:
+        """Calculates the volume of the box"""
+        return float(np.prod(self.size))
+
+    def expanded(self, margin: float) -> AABB:
+        """Returns a copy of the box grown by margin on every side"""
+        return AABB.from_arrays(self.minimum - margin, self.maximum + margin)
+
+    def union(self, other: AABB) -> AABB:
+        """Returns the smallest box that contains both boxes"""
+        return AABB.from_arrays(np.minimum(self.minimum, other.minimum),
+                                np.maximum(self.maximum, other.maximum))
+
+    def contains_point(self, point: P3) -> bool:
+        """Checks if a point is inside the box"""
+        (x0, y0, z0), (x1, y1, z1) = self.minimum, self.maximum
+        return (x0 <= point.x <= x1 and y0 <= point.y <= y1
+                and z0 <= point.z <= z1)
+
+    def contains_points(self, points: P3Array | np.ndarray | Iterable[P3]
+                        ) -> np.ndarray:
+        """Checks which points are inside the box"""
+        data = _as_array(points)
+        result = np.ones(len(data), dtype=bool)
+        for axis in range(3):
+            column = data[:, axis]
+            result &= column >= self.minimum[axis]
+            result &= column <= self.maximum[axis]
+        return result
+
+    def overlaps(self, other: AABB) -> bool:
+        """Checks if two boxes share at least one point"""
+        return bool((self.minimum <= other.maximum).all()
+                    and (other.minimum <= self.maximum).all())
+
+
+class AABBArray:
+    """
+    Represents a collection of axis-aligned bounding boxes
+
+    The minimum and maximum corners are stored in two ``(n, 3)`` arrays.
+    """
+    def __init__(self, minimums, maximums) -> None:
+        self.minimums: np.ndarray = P3Array(minimums).data
+        self.maximums: np.ndarray = P3Array(maximums).data
+        if self.minimums.shape != self.maximums.shape:
+            raise ValueError(
+                f"Got {len(self.minimums)} minimum and "
+                f"{len(self.maximums)} maximum corners"
+            )
+        if (self.minimums > self.maximums).any():
+            raise ValueError(
+                "Every minimum corner must be at most its maximum corner"
+            )
+
+    @staticmethod
+    def from_boxes(boxes: Iterable[AABB]) -> AABBArray:
+        """Creates a collection from AABB objects"""
+        boxes = list(boxes)
+        return AABBArray(
+            np.array([box.minimum for box in boxes]).reshape(-1, 3),
+            np.array([box.maximum for box in boxes]).reshape(-1, 3),
+        )
+
+    def to_boxes(self) -> list[AABB]:
+        """Converts the collection to a list of AABB objects"""
+        return [AABB.from_arrays(minimum, maximum)
+                for minimum, maximum in zip(self.minimums, self.maximums)]
+
+    def __len__(self) -> int:
+        return len(self.minimums)
+
+    def __getitem__(self, item) -> AABB | AABBArray:
+        """Returns a single box for an integer index and a collection
+        for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            return AABB.from_arrays(self.minimums[item], self.maximums[item])
+        return AABBArray(self.minimums[item], self.maximums[item])
+
+    def __iter__(self) -> Iterator[AABB]:
+        return iter(self.to_boxes())
+
+    def __str__(self) -> str:
+        return f"AABBArray({len(self)} boxes)"
+
+    __repr__ = __str__
+
+    def contains_points(self, points: P3Array | np.ndarray | Iterable[P3]
+                        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds every pair of a box and a point inside it. Returns the box
+        indices and the point indices of the pairs
+        """
+        data = _as_array(points)
+        return _pairs(self.minimums, self.maximums, data, data)
+
+
+def _pairs(minimums_a: np.ndarray, maximums_a: np.ndarray,
+           minimums_b: np.ndarray, maximums_b: np.ndarray
+           ) -> tuple[np.ndarray, np.ndarray]:
+    """Indices of all pairs of boxes from a and b that overlap.
+    Points are passed as boxes whose corners coincide"""
+    rows, columns = [], []
+    block = max(1, _OVERLAP_BLOCK_ELEMENTS // max(1, len(minimums_b)))
+    for start in range(0, len(minimums_a), block):
+        stop = start + block
+        overlap = np.ones((len(minimums_a[start:stop]), len(minimums_b)),
+                          dtype=bool)
+        for axis in range(3):
+            overlap &= (minimums_a[start:stop, axis, None]
+                        <= maximums_b[None, :, axis])
+            overlap &= (minimums_b[None, :, axis]
+                        <= maximums_a[start:stop, axis, None])
+        i, j = np.nonzero(overlap)
+        rows.append(i + start)
+        columns.append(j)
+    if not rows:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(rows), np.concatenate(columns)
+
+
+def box_box_overlaps(boxes_a: AABBArray | Iterable[AABB],
+                     boxes_b: AABBArray | Iterable[AABB]
+                     ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds every pair of overlapping boxes between two collections.
+    Returns the indices into ``boxes_a`` and ``boxes_b`` of the pairs,
+    so the output only grows with the number of overlaps
+    """
+    if not isinstance(boxes_a, AABBArray):
+        boxes_a = AABBArray.from_boxes(boxes_a)
+    if not isinstance(boxes_b, AABBArray):
+        boxes_b = AABBArray.from_boxes(boxes_b)
+    return _pairs(boxes_a.minimums, boxes_a.maximums,
+                  boxes_b.minimums, boxes_b.maximums)
+
+
+def line_box_intersections(lines: Line3Array | Iterable[Line3], box: AABB,
+                           t_min: float = -np.inf, t_max: float = np.inf
+                           ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Intersects many lines with a box using the slab method.
+
+    Only the part of every line with t between ``t_min`` and ``t_max`` is
+    tested; use ``t_min=0`` for rays and ``t_min=0, t_max=1`` for segments
+    between the origin and origin + direction. Returns a boolean hit mask
+    and the t values at which every line enters and leaves the box
+    """
+    lines = _as_lines(lines)
+    return _slabs(lines.origins, lines.directions, box.minimum, box.maximum,
+                  t_min, t_max)
+
+
+def _slabs(origins: np.ndarray, directions: np.ndarray,
+           minimums: np.ndarray, maximums: np.ndarray,
+           t_min: float, t_max: float
+           ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The slab method for lines and boxes given as arrays whose last axis
+    holds coordinates. The other axes are broadcast, so one call can test
+    many lines against one box or every line against every box
+    """
+    shape = np.broadcast_shapes(origins.shape[:-1], minimums.shape[:-1])
+    t_near = np.full(shape, t_min, dtype=np.float64)
+    t_far = np.full(shape, t_max, dtype=np.float64)
+    hit = np.ones(shape, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for axis in range(3):
+            origin = origins[..., axis]
+            direction = directions[..., axis]
+            low, high = minimums[..., axis], maximums[..., axis]
+            inverse = 1 / direction
+            # a line parallel to a slab does not limit t and only hits
+            # if it lies inside the slab
+            parallel = direction == 0
+            t0 = np.where(parallel, -np.inf, (low - origin) * inverse)
+            t1 = np.where(parallel, np.inf, (high - origin) * inverse)
+            hit &= ~parallel | ((origin >= low) & (origin <= high))
+            np.maximum(t_near, np.minimum(t0, t1), out=t_near)
+            np.minimum(t_far, np.maximum(t0, t1), out=t_far)
+    hit &= t_near <= t_far
+    return hit, t_near, t_far
@@ -0,0 +1,251 @@
+"""This module caches the results of repeated geometric queries"""
+from __future__ import annotations
+
+import math
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from .vectorz import P3, Line3, Plane, Intersection, ShortestDistance
+
+__all__ = [
+    "QueryCache",
+    "CacheStats",
+]
+
+# Estimated size of the bookkeeping of one entry of an OrderedDict, which
+# sys.getsizeof does not see
+_ENTRY_OVERHEAD = 104
+
+
+def _size(obj) -> int:
+    """Estimates the memory used by a key or a result in bytes"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        size += sum(_size(item) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+        size += sum(_size(value) for value in vars(obj).values())
+    return size
+
+
+def _plane_key(plane: Plane, oriented: bool) -> tuple[tuple, tuple]:
+    """
+    The canonical form of a plane as a key: its unit normal and signed
+    distance from the origin, which do not depend on the point or the
+    length of the normal it was created with. Unless oriented, the normal
+    is also flipped so that its first non-zero component is positive, so
+    both orientations of a plane share the key
+    """
+    if plane.normal_squared_magnitude == 0:
+        # no canonical form; a zero normal cannot clash with a unit one
+        return plane._abc, (plane.d,)
+    n, p = plane.canonical_form()
+    normal = (n.x, n.y, n.z)
+    if not oriented and normal < (0, 0, 0):
+        return (-n.x, -n.y, -n.z), (-p,)
+    return normal, (p,)
+
+
+def _line_key(line: Line3) -> tuple[tuple, tuple]:
+    """
+    The canonical form of a line as a key: its unit direction, with the
+    first non-zero component positive, and the point of the line closest
+    to the origin, which do not depend on the origin or the length and
+    sign of the direction it was created with
+    """
+    if line.direction_squared_magnitude == 0:
+        # the line is a single point; a zero direction cannot clash with
+        # a unit one
+        return line._direction, line._origin
+    u = line.unit_direction
+    direction = (u.x, u.y, u.z)
+    if direction < (0, 0, 0):
+        direction = (-u.x, -u.y, -u.z)
+    ux, uy, uz = direction
+    ox, oy, oz = line._origin
+    t = ox * ux + oy * uy + oz * uz
+    return direction, (ox - t * ux, oy - t * uy, oz - t * uz)
+
+
+class CacheStats:
+    """A snapshot of the counters of a QueryCache"""
+    def __init__(self, hits: int, misses: int, evictions: int, entries: int,
+                 size_bytes: int, max_bytes: int) -> None:
+        # the number of queries answered from the cache
+        self.hits: int = hits
+        # the number of queries that had to be computed
+        self.misses: int = misses
+        # the number of entries removed to stay within max_bytes
+        self.evictions: int = evictions
+        # the number of entries in the cache
+        self.entries: int = entries
+        # the estimated memory used by the entries
+        self.size_bytes: int = size_bytes
+        # the memory limit of the cache
+        self.max_bytes: int = max_bytes
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of queries answered from the cache"""
+        queries = self.hits + self.misses
+        return self.hits / queries if queries else 0.0
+
+    def __str__(self) -> str:
+        return (f"CacheStats(hits={self.hits}, misses={self.misses}, "
+                f"hit_rate={self.hit_rate:.3f}, "
+                f"evictions={self.evictions}, entries={self.entries}, "
+                f"size_bytes={self.size_bytes}, max_bytes={self.max_bytes})")
+
+    __repr__ = __str__
+
+
+class QueryCache:
+    """
+    A least-recently-used cache of the results of geometric queries
+
+    The query methods take the same arguments as the functions of the
+    vectorz module they wrap and return the same results. Entries are
+    keyed on canonical forms of the arguments rather than on the objects:
+    planes on their unit normal and distance from the origin, lines on
+    their unit direction and the point closest to the origin. So equal
+    planes and lines share entries however they were created, including
+    with scaled or reversed normals and directions, except that
+    signed_distance keeps the side the normal points to. A hit returns
+    the result of the first query, which may hold its own objects, such
+    as the line lying in a plane.
+
+    With ``quantum``, the canonical coordinates are rounded to multiples
+    of it first, so queries that differ by less than about ``quantum``
+    get the result of the first of them. This also absorbs rounding in
+    the canonical forms of equal planes and lines given differently. As
+    normals and directions are unit vectors, ``quantum`` is a length for
+    every plane and line. By default the coordinates must match exactly.
+
+    The least recently used entries are evicted when the estimated memory
+    of all entries exceeds ``max_bytes``. Results are shared between the
+    queries that hit them and must not be changed in place.
+
+    Lookups and updates are guarded by a lock, so one cache can serve many
+    threads. Results are computed outside of the lock, so threads that
+    miss at the same time compute in parallel and the last one stores
+    its result.
+
+    A hit costs about as much as a few microseconds of Python code, mostly
+    for hashing the key and taking the lock, and rounding to ``quantum``
+    costs as much again. The cache pays off for queries such as line_line
+    that take longer than that; predicates like contains_point are faster
+    to recompute, and many of them are faster still with the functions of
+    the batch module.
+    """
+    def __init__(self, max_bytes: int = 16 << 20,
+                 quantum: float = 0.0) -> None:
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        if quantum < 0 or not math.isfinite(quantum):
+            raise ValueError("quantum must be a non-negative finite number")
+        self.max_bytes: int = max_bytes
+        self.quantum: float = quantum
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = \
+            OrderedDict()
+        self._lock = threading.Lock()
+        # the estimated size of an entry for every query and result type;
+        # entries of one query have the same shape, so it is measured once
+        self._entry_sizes: dict[tuple[str, type], int] = {}
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __str__(self) -> str:
+        return f"QueryCache({len(self)} entries, {self._size} bytes)"
+
+    __repr__ = __str__
+
+    def _key(self, name: str, *coordinates: tuple) -> Hashable:
+        """The canonical key of a query on tuples of coordinates"""
+        if not self.quantum:
+            # -0.0 and 0.0 are already equal and have the same hash
+            return name, *coordinates
+        scale = 1 / self.quantum
+        return name, *(
+            tuple(round(v * scale) if math.isfinite(v) else v for v in part)
+            for part in coordinates
+        )
+
+    def _query(self, key: Hashable, func: Callable, *args):
+        """Returns the cached result of a query, or computes it with
+        func(*args) and stores it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+        result = func(*args)
+        shape = key[0], type(result)
+        size = self._entry_sizes.get(shape)
+        if size is None:
+            size = _size(key) + _size(result) + _ENTRY_OVERHEAD
+            self._entry_sizes[shape] = size
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size <= self.max_bytes:
+                self._entries[key] = (result, size)
+                self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self._evictions += 1
+        return result
+
+    def line_plane(self, line: Line3, plane: Plane) -> Line3 | P3 | None:
+        """Cached Intersection.line_plane"""
+        key = self._key("line_plane", *_line_key(line),
+                        *_plane_key(plane, oriented=False))
+        return self._query(key, Intersection.line_plane, line, plane)
+
+    def contains_point(self, plane: Plane, point: P3) -> bool:
+        """Cached Plane.contains_point"""
+        key = self._key("contains_point", *_plane_key(plane, oriented=False),
+                        (point.x, point.y, point.z))
+        return self._query(key, plane.contains_point, point)
+
+    def signed_distance(self, plane: Plane, point: P3) -> float:
+        """Cached Plane.signed_distance"""
+        key = self._key("signed_distance", *_plane_key(plane, oriented=True),
+                        (point.x, point.y, point.z))
+        return self._query(key, plane.signed_distance, point)
+
+    def point_point(self, p1: P3, p2: P3) -> float:
+        """Cached ShortestDistance.point_point"""
+        key = self._key("point_point", (p1.x, p1.y, p1.z),
+                        (p2.x, p2.y, p2.z))
+        return self._query(key, ShortestDistance.point_point, p1, p2)
+
+    def line_line(self, line1: Line3, line2: Line3) -> float:
+        """Cached ShortestDistance.line_line"""
+        key = self._key("line_line", *_line_key(line1), *_line_key(line2))
+        return self._query(key, ShortestDistance.line_line, line1, line2)
+
+    def stats(self) -> CacheStats:
+        """Returns the current counters, which can be used to tune
+        max_bytes and quantum"""
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions,
+                              len(self._entries), self._size,
+                              self.max_bytes)
+
+    def clear(self) -> None:
+        """Removes all entries and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._hits = self._misses = self._evictions = 0
@@ -0,0 +1,153 @@
+"""This module provides functions for extracting planes
+ from clouds of points"""
+from __future__ import annotations
+
+import os
+from typing import Iterable
+
+import numpy as np
+
+from .batch import P3Array, _as_array, _split_rows
+from .vectorz import P3, Vec3, Plane
+
+__all__ = [
+    "fit_plane",
+    "ransac_planes",
+]
+
+# Maximum number of point-candidate distances evaluated at once by
+# ransac_planes, which bounds its memory use to roughly 128 MB
+_RANSAC_BLOCK_ELEMENTS = 1 << 24
+
+
+def _fit_plane_array(data: np.ndarray,
+                     weights: np.ndarray | None = None
+                     ) -> tuple[np.ndarray, np.ndarray]:
+    """Least-squares plane through an (n, 3) array.
+    Returns the centroid and the unit normal, which are always computed
+    in float64"""
+    if weights is None:
+        centroid = data.mean(axis=0, dtype=np.float64)
+        centered = data - centroid
+        covariance = centered.T @ centered
+    else:
+        centroid = np.average(data, axis=0, weights=weights)
+        centered = data - centroid
+        covariance = (centered * weights[:, None]).T @ centered
+    # the normal is the direction of least variance, which is the
+    # eigenvector of the smallest eigenvalue of the covariance matrix
+    _, eigenvectors = np.linalg.eigh(covariance)
+    return centroid, eigenvectors[:, 0]
+
+
+def _to_plane(centroid: np.ndarray, normal: np.ndarray) -> Plane:
+    """Creates a Plane from numpy arrays"""
+    return Plane(P3(*centroid.tolist()), Vec3(*normal.tolist()))
+
+
+def fit_plane(points: P3Array | np.ndarray | Iterable[P3],
+              weights: np.ndarray | None = None) -> Plane:
+    """
+    Fits a plane to points by minimising the sum of squared orthogonal
+    distances. The returned plane passes through the centroid of the
+    points and has a unit normal vector
+    """
+    data = _as_array(points)
+    if len(data) < 3:
+        raise ValueError("At least 3 points are needed to fit a plane")
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(data),):
+            raise ValueError(
+                f"Expected {len(data)} weights, got {weights.shape} instead"
+            )
+    return _to_plane(*_fit_plane_array(data, weights))
+
+
+def _count_inliers(data: np.ndarray,
+                   normals: np.ndarray,
+                   offsets: np.ndarray,
+                   threshold: float,
+                   workers: int | None = 1) -> np.ndarray:
+    """Counts the points within threshold of each candidate plane"""
+    threads = workers or os.cpu_count() or 1
+    block = max(1, _RANSAC_BLOCK_ELEMENTS // (max(1, len(normals)) * threads))
+
+    def kernel(first: int, last: int) -> np.ndarray:
+        counts = np.zeros(len(normals), dtype=np.int64)
+        for start in range(first, last, block):
+            distances = data[start:min(start + block, last)] @ normals.T
+            distances += offsets
+            np.abs(distances, out=distances)
+            counts += np.count_nonzero(distances <= threshold, axis=0)
+        return counts
+
+    return sum(_split_rows(kernel, len(data), workers))
+
+
+def ransac_planes(points: P3Array | np.ndarray | Iterable[P3],
+                  threshold: float,
+                  max_planes: int = 1,
+                  iterations: int = 1000,
+                  min_inliers: int = 3,
+                  refine: bool = True,
+                  seed: int | np.random.Generator | None = None,
+                  workers: int | None = 1
+                  ) -> list[tuple[Plane, np.ndarray]]:
+    """
+    Detects planes in a noisy point cloud with RANSAC.
+
+    For every plane, ``iterations`` candidate planes through 3 random
+    points are scored together against all remaining points, and the
+    candidate with the most points within ``threshold`` wins. Its inliers
+    are then removed and the search is repeated until ``max_planes`` planes
+    are found or no candidate reaches ``min_inliers`` points.
+
+    Returns a list of (plane, inlier mask) pairs, where each boolean mask
+    indexes the original points. With ``refine`` the plane is refitted to
+    its inliers with least squares. Pass ``seed`` for reproducible results.
+    ``workers`` sets the number of threads that score the candidates.
+    """
+    data = _as_array(points)
+    rng = np.random.default_rng(seed)
+    remaining = np.arange(len(data))
+    results = []
+
+    while len(results) < max_planes and len(remaining) >= 3:
+        subset = data[remaining]
+        samples = subset[rng.integers(0, len(subset), size=(iterations, 3))]
+        normals = np.cross(samples[:, 1] - samples[:, 0],
+                           samples[:, 2] - samples[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        # collinear samples do not define a plane
+        valid = lengths > 0
+        if not valid.any():
+            break
+        normals = normals[valid] / lengths[valid, None]
+        offsets = -np.einsum("ij,ij->i", normals, samples[valid, 0])
+
+        counts = _count_inliers(subset, normals, offsets, threshold,
+                                workers)
+        best = int(np.argmax(counts))
+        if counts[best] < min_inliers:
+            break
+        normal, offset = normals[best], offsets[best]
+        inliers = np.abs(subset @ normal + offset) <= threshold
+
+        plane = _to_plane(-offset * normal, normal)
+        if refine and np.count_nonzero(inliers) >= 3:
+            centroid, refined = _fit_plane_array(subset[inliers])
+            refined_inliers = (
+                np.abs((subset - centroid) @ refined) <= threshold
+            )
+            # keep the sampled plane if refitting made it worse
+            if np.count_nonzero(refined_inliers) >= counts[best]:
+                plane = _to_plane(centroid, refined)
+                inliers = refined_inliers
+
+        mask = np.zeros(len(data), dtype=bool)
+        mask[remaining[inliers]] = True
+        results.append((plane, mask))
+        remaining = remaining[~inliers]
+
+    return results
@@ -0,0 +1,319 @@
+"""This module computes convex hulls of 2D and 3D point sets"""
+from __future__ import annotations
+
+import itertools
+from typing import Iterable
+
+import numpy as np
+
+from .batch import P3Array, _as_array, _rowwise_dot
+from .mesh import TriangleMesh
+from .planar import P2Array, Polygon, _as_points2
+from .vectorz import P2, P3
+
+__all__ = [
+    "convex_hull_2d",
+    "convex_hull_3d",
+]
+
+# Points within this distance of a hull edge or face, relative to the
+# extent of the points along it, count as lying on it
+_RELATIVE_TOLERANCE = 1e-10
+
+# The directions in which the extreme points used by the interior
+# pre-filter are found
+_DIRECTIONS_2D = np.array([(1, 0), (1, 1), (0, 1), (-1, 1),
+                           (-1, 0), (-1, -1), (0, -1), (1, -1)],
+                          dtype=np.float64)
+_DIRECTIONS_3D = np.array([d for d in itertools.product((-1, 0, 1), repeat=3)
+                           if d != (0, 0, 0)], dtype=np.float64)
+
+
+# Number of points projected onto all directions or tested against all
+# faces at once by the pre-filters
+_PREFILTER_BLOCK_ROWS = 1 << 14
+
+
+def _tolerance(data: np.ndarray) -> float:
+    """The tolerance of the 2D hull, relative to the largest extent of the
+    points rather than to their coordinates, so that it does not grow when
+    the points are far from the origin"""
+    return _RELATIVE_TOLERANCE * float(np.ptp(data, axis=0).max())
+
+
+def _face_tolerance(normals: np.ndarray, extent: np.ndarray) -> np.ndarray:
+    """
+    The distances within which points count as lying on faces with the
+    given unit normals. The rounding error of a height above a face grows
+    with the extent of the points along every axis, weighted by the
+    normal, so flat and elongated point sets get tolerances that fit them
+    """
+    return _RELATIVE_TOLERANCE * (np.abs(normals) @ extent)
+
+
+def _extremes(data: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    """The points furthest along every direction"""
+    best = np.full(len(directions), -np.inf)
+    result = np.zeros((len(directions), data.shape[1]))
+    # blocks of projections stay in the CPU cache while they are searched
+    for start in range(0, len(data), _PREFILTER_BLOCK_ROWS):
+        block = data[start:start + _PREFILTER_BLOCK_ROWS]
+        projections = block @ directions.T
+        rows = np.argmax(projections, axis=0)
+        values = projections[rows, np.arange(len(directions))]
+        better = values > best
+        best[better] = values[better]
+        result[better] = block[rows[better]]
+    return result
+
+
+def _chain(points: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """One half of the monotone chain: the hull of points sorted by x,
+    turning left at every corner"""
+    hull = []
+    for x, y in points:
+        while len(hull) >= 2:
+            (x0, y0), (x1, y1) = hull[-2], hull[-1]
+            if (x1 - x0) * (y - y0) - (y1 - y0) * (x - x0) > 0:
+                break
+            hull.pop()
+        hull.append((x, y))
+    return hull
+
+
+def _monotone_chain(data: np.ndarray) -> np.ndarray:
+    """Corners of the hull of points in counterclockwise order, without
+    points in the middle of an edge"""
+    # np.unique sorts the points by x and then y, and drops duplicates
+    points = [tuple(p) for p in np.unique(data, axis=0).tolist()]
+    if len(points) < 3:
+        return np.array(points, dtype=np.float64).reshape(-1, 2)
+    lower = _chain(points)
+    upper = _chain(points[::-1])
+    return np.array(lower[:-1] + upper[:-1], dtype=np.float64)
+
+
+def _interior_2d(data: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Marks the points strictly inside the polygon of the extreme points in
+    eight directions. Those points cannot be corners of the hull
+    """
+    extremes = _extremes(data, _DIRECTIONS_2D)
+    polygon = _monotone_chain(extremes)
+    interior = np.ones(len(data), dtype=bool)
+    if len(polygon) < 3:
+        return ~interior
+    for start, end in zip(polygon, np.roll(polygon, -1, axis=0)):
+        edge = end - start
+        cross = (edge[0] * (data[:, 1] - start[1])
+                 - edge[1] * (data[:, 0] - start[0]))
+        interior &= cross > tolerance * np.hypot(*edge)
+    return interior
+
+
+def convex_hull_2d(points: P2Array | np.ndarray | Iterable[P2],
+                   prefilter: bool = True) -> Polygon:
+    """
+    Computes the convex hull of 2D points with the monotone chain
+    algorithm in O(n log n). Returns a Polygon with the corners of the hull
+    in counterclockwise order; its ``area`` and ``centroid`` are those of
+    the hull.
+
+    With prefilter, the points inside the polygon of the extreme points in
+    eight directions are discarded first in one vectorised pass. For most
+    inputs this leaves only a small fraction of the points for the chain.
+    Raises ValueError if all points lie on one line
+    """
+    data = _as_points2(points)
+    if prefilter and len(data) > len(_DIRECTIONS_2D):
+        data = data[~_interior_2d(data, _tolerance(data))]
+    corners = _monotone_chain(data)
+    if len(corners) < 3:
+        raise ValueError("The hull of points on one line has no area")
+    return Polygon(corners)
+
+
+def _initial_simplex(data: np.ndarray, extent: np.ndarray) -> list[int]:
+    """Indices of four points that span a tetrahedron of large volume"""
+    extremes = np.concatenate([data.argmin(axis=0), data.argmax(axis=0)])
+    offsets = data[extremes][:, None] - data[extremes][None]
+    i, j = np.unravel_index(np.argmax((offsets ** 2).sum(axis=2)),
+                            (len(extremes), len(extremes)))
+    a, b = int(extremes[i]), int(extremes[j])
+    ab = data[b] - data[a]
+    if not ab.any():
+        raise ValueError("The hull of a single point has no volume")
+    across = np.cross(data - data[a], ab)
+    c = int(np.argmax(_rowwise_dot(across, across)))
+    normal = np.cross(ab, data[c] - data[a])
+    length = np.sqrt(normal @ normal)
+    if length <= _RELATIVE_TOLERANCE * np.sqrt(extent @ extent) \
+            * np.sqrt(ab @ ab):
+        raise ValueError("The hull of points on one line has no volume")
+    normal /= length
+    heights = (data - data[a]) @ normal
+    d = int(np.argmax(np.abs(heights)))
+    if abs(heights[d]) <= _face_tolerance(normal, extent):
+        raise ValueError("The hull of points in one plane has no volume")
+    return [a, b, c, d]
+
+
+def _quickhull(data: np.ndarray, extent: np.ndarray) -> np.ndarray:
+    """
+    Triangles of the hull of 3D points as an (m, 3) array of indices into
+    data, facing outwards. The points should be centred on the origin, so
+    that the offsets of the faces keep the precision of the coordinates,
+    and extent is their extent along every axis.
+
+    Every face keeps the points above it. The furthest point above a face
+    is added to the hull by removing all faces it can see and connecting
+    it to the edges around them, and the points above the removed faces
+    are handed to the new faces in one vectorised step.
+    """
+    faces: dict[int, tuple[int, int, int]] = {}
+    # the unit normal, offset and tolerance of every face
+    planes: dict[int, tuple[np.ndarray, float, float]] = {}
+    outside: dict[int, np.ndarray] = {}
+    # the face on the left of every directed edge
+    edges: dict[tuple[int, int], int] = {}
+    counter = itertools.count()
+
+    def add_face(a: int, b: int, c: int) -> int:
+        normal = np.cross(data[b] - data[a], data[c] - data[a])
+        normal /= np.sqrt(normal @ normal)
+        face = next(counter)
+        faces[face] = (a, b, c)
+        planes[face] = (normal, float(normal @ data[a]),
+                        float(_face_tolerance(normal, extent)))
+        for edge in ((a, b), (b, c), (c, a)):
+            edges[edge] = face
+        return face
+
+    def assign(candidates: np.ndarray, new_faces: list[int]) -> None:
+        """Hands points to the new face they are furthest above"""
+        normals = np.array([planes[f][0] for f in new_faces])
+        offsets = np.array([planes[f][1] for f in new_faces])
+        tolerances = np.array([planes[f][2] for f in new_faces])
+        heights = data[candidates] @ normals.T - offsets
+        best = np.argmax(heights, axis=1)
+        above = heights[np.arange(len(candidates)), best] \
+            > tolerances[best]
+        candidates, best = candidates[above], best[above]
+        order = np.argsort(best, kind="stable")
+        bounds = np.searchsorted(best[order], np.arange(len(new_faces) + 1))
+        for k, face in enumerate(new_faces):
+            outside[face] = candidates[order[bounds[k]:bounds[k + 1]]]
+
+    simplex = _initial_simplex(data, extent)
+    initial = []
+    for k in range(4):
+        a, b, c = (simplex[i] for i in range(4) if i != k)
+        normal = np.cross(data[b] - data[a], data[c] - data[a])
+        # every face must point away from the fourth corner
+        if normal @ (data[simplex[k]] - data[a]) > 0:
+            b, c = c, b
+        initial.append(add_face(a, b, c))
+    assign(np.arange(len(data)), initial)
+
+    pending = list(initial)
+    while pending:
+        face = pending.pop()
+        if face not in faces or not len(outside[face]):
+            continue
+        normal = planes[face][0]
+        candidates = outside[face]
+        eye = int(candidates[np.argmax(data[candidates] @ normal)])
+        point = data[eye]
+
+        # the faces the new point can see form a connected region. An edge
+        # whose twin was lost to rounding has no face across it, so it is
+        # left on the horizon and closed by a new face
+        visible, checked, stack = {face}, {face}, [face]
+        while stack:
+            a, b, c = faces[stack.pop()]
+            for u, v in ((a, b), (b, c), (c, a)):
+                neighbour = edges.get((v, u))
+                if neighbour is None or neighbour in checked:
+                    continue
+                checked.add(neighbour)
+                normal, offset, tolerance = planes[neighbour]
+                if point @ normal - offset > tolerance:
+                    visible.add(neighbour)
+                    stack.append(neighbour)
+
+        horizon, candidates = [], []
+        for f in visible:
+            a, b, c = faces[f]
+            for u, v in ((a, b), (b, c), (c, a)):
+                if edges.get((v, u)) not in visible:
+                    horizon.append((u, v))
+            candidates.append(outside[f])
+        for f in visible:
+            for edge in itertools.pairwise(faces[f] + faces[f][:1]):
+                if edges.get(edge) == f:
+                    del edges[edge]
+            del faces[f], planes[f], outside[f]
+
+        new_faces = [add_face(u, v, eye) for u, v in horizon]
+        candidates = np.concatenate(candidates)
+        assign(candidates[candidates != eye], new_faces)
+        pending.extend(f for f in new_faces if len(outside[f]))
+
+    return np.array(list(faces.values()), dtype=np.intp).reshape(-1, 3)
+
+
+def _interior_3d(data: np.ndarray, extent: np.ndarray) -> np.ndarray:
+    """
+    Marks the points strictly inside the hull of the extreme points in 26
+    directions. Those points cannot be corners of the hull
+    """
+    interior = np.zeros(len(data), dtype=bool)
+    extremes = np.unique(_extremes(data, _DIRECTIONS_3D), axis=0)
+    try:
+        faces = _quickhull(extremes, extent)
+    except ValueError:
+        return interior
+    a, b, c = (extremes[faces[:, k]] for k in range(3))
+    normals = np.cross(b - a, c - a)
+    normals /= np.sqrt(_rowwise_dot(normals, normals))[:, None]
+    limits = _rowwise_dot(normals, a) - _face_tolerance(normals, extent)
+    # the heights above all faces of a block of points are one product
+    for start in range(0, len(data), _PREFILTER_BLOCK_ROWS):
+        block = data[start:start + _PREFILTER_BLOCK_ROWS]
+        interior[start:start + len(block)] = (block @ normals.T
+                                              < limits).all(axis=1)
+    return interior
+
+
+def convex_hull_3d(points: P3Array | np.ndarray | Iterable[P3],
+                   prefilter: bool = True) -> TriangleMesh:
+    """
+    Computes the convex hull of 3D points with the quickhull algorithm,
+    which takes O(n log n) time for typical inputs. Returns a TriangleMesh
+    with the corners of the hull as vertices and triangles facing
+    outwards; its ``volume`` and ``surface_area`` are those of the hull.
+    Points that lie exactly on a face of the hull can also become
+    vertices.
+
+    With prefilter, the points inside the hull of the extreme points in
+    26 directions are discarded first in one vectorised pass. The hull is
+    computed around the centre of the bounding box of the points, so
+    points far from the origin, such as georeferenced coordinates, get
+    the same hull as the same points near it. Raises ValueError if all
+    points lie in one plane
+    """
+    data = _as_array(points)
+    if len(data) < 4:
+        raise ValueError(
+            f"A hull with volume needs at least 4 points, got {len(data)}"
+        )
+    low, high = data.min(axis=0), data.max(axis=0)
+    local = data - (low + high) / 2
+    extent = high - low
+    if prefilter and len(data) > len(_DIRECTIONS_3D):
+        keep = np.flatnonzero(~_interior_3d(local, extent))
+        data, local = data[keep], local[keep]
+    faces = _quickhull(local, extent)
+    # the vertices are the input points themselves, not the moved ones
+    corners, faces = np.unique(faces, return_inverse=True)
+    return TriangleMesh(data[corners], faces.reshape(-1, 3))
@@ -0,0 +1,298 @@
+"""This module provides lazy expressions over collections of vectors.
+ An expression records the operations applied to it and computes the
+ result in one fused pass when it is evaluated"""
+from __future__ import annotations
+
+from typing import Iterator
+
+import numpy as np
+
+from .batch import Vec3Array
+from .vectorz import Vec3, DifferentDimensionException
+
+__all__ = [
+    "LazyVec3",
+]
+
+# Number of rows evaluated at once. The temporary buffers of a block stay
+# in the CPU cache, so intermediate results never travel to main memory
+_BLOCK_ROWS = 2048
+
+_COMPONENTS = {"x": 0, "y": 1, "z": 2}
+
+
+class LazyVec3:
+    """
+    A lazy expression over collections of 3D vectors
+
+    Expressions are created with Vec3Array.lazy and support the same
+    arithmetic as Vec3Array: adding and subtracting collections, and
+    multiplying or dividing by scalars or by one scalar per vector.
+    Nothing is computed until ``evaluate`` is called or the result is
+    accessed through ``data``, ``x``, ``y``, ``z`` or by indexing.
+
+    Evaluation walks the rows in blocks and runs the whole expression on
+    one block before moving to the next one. Operations write into block
+    buffers that are allocated once and reused for all blocks, and a
+    buffer is handed on to a later operation as soon as its value has been
+    read for the last time, so a chain of operations of any length needs
+    one buffer. The last operation writes straight into the output.
+    Subexpressions that appear several times are computed once per block,
+    and asking for a single component only computes that component.
+    """
+    def __init__(self, op: str, args: tuple, length: int) -> None:
+        # the name of the operation, or "leaf" for an input array
+        self.op: str = op
+        # the operands: LazyVec3 nodes, scalars or arrays
+        self.args: tuple = args
+        self._length: int = length
+        # the evaluated result, kept once data has been accessed
+        self._result: Vec3Array | None = None
+
+    @staticmethod
+    def leaf(data: np.ndarray) -> LazyVec3:
+        """Creates an expression that evaluates to the given (n, 3) array"""
+        return LazyVec3("leaf", (data,), len(data))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        return f"LazyVec3({self._describe()})"
+
+    __repr__ = __str__
+
+    def _describe(self) -> str:
+        """Returns a readable form of the expression"""
+        # built from the leaves up, so long chains do not recurse
+        text = {}
+        for node in self._nodes():
+            if node.op == "leaf":
+                text[id(node)] = f"<{node._length} vectors>"
+                continue
+            operands = [
+                text[id(arg)] if isinstance(arg, LazyVec3)
+                else "<array>" if isinstance(arg, np.ndarray) else str(arg)
+                for arg in node.args
+            ]
+            if node.op == "neg":
+                text[id(node)] = f"-{operands[0]}"
+            else:
+                symbol = {"add": "+", "sub": "-", "mul": "*",
+                          "div": "/"}[node.op]
+                text[id(node)] = f"({operands[0]} {symbol} {operands[1]})"
+        return text[id(self)]
+
+    def _vector(self, other) -> LazyVec3:
+        """Converts a vector operand to an expression"""
+        if isinstance(other, Vec3Array):
+            other = LazyVec3.leaf(other.data)
+        if not isinstance(other, LazyVec3):
+            raise DifferentDimensionException(self, other)
+        if len(other) != len(self):
+            raise ValueError(
+                f"Expressions have different lengths: "
+                f"{len(self)} and {len(other)}"
+            )
+        return other
+
+    def _scalar(self, other) -> float | np.ndarray:
+        """Checks a scalar operand, which can have one value per vector"""
+        if isinstance(other, np.ndarray):
+            if other.shape != (len(self),):
+                raise ValueError(
+                    f"Expected {len(self)} scalars, got {other.shape}"
+                )
+            return other
+        if isinstance(other, (LazyVec3, Vec3Array, Vec3)):
+            raise ValueError("Vectors can only be multiplied by scalars")
+        return other
+
+    def __add__(self, other: LazyVec3 | Vec3Array) -> LazyVec3:
+        return LazyVec3("add", (self, self._vector(other)), len(self))
+
+    def __radd__(self, other: Vec3Array) -> LazyVec3:
+        return LazyVec3("add", (self._vector(other), self), len(self))
+
+    def __sub__(self, other: LazyVec3 | Vec3Array) -> LazyVec3:
+        return LazyVec3("sub", (self, self._vector(other)), len(self))
+
+    def __rsub__(self, other: Vec3Array) -> LazyVec3:
+        return LazyVec3("sub", (self._vector(other), self), len(self))
+
+    def __mul__(self, other: int | float | np.ndarray) -> LazyVec3:
+        return LazyVec3("mul", (self, self._scalar(other)), len(self))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: int | float | np.ndarray) -> LazyVec3:
+        return LazyVec3("div", (self, self._scalar(other)), len(self))
+
+    def __neg__(self) -> LazyVec3:
+        return LazyVec3("neg", (self,), len(self))
+
+    def _nodes(self) -> list[LazyVec3]:
+        """Returns the operation nodes of the graph, children first,
+        with every shared subexpression listed once"""
+        order, seen = [], set()
+        # a depth-first walk with an explicit stack, so that expressions
+        # built from thousands of operations do not exhaust the recursion
+        # limit. A node is listed when it comes off the stack the second
+        # time, after all of its operands
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            stack.append((node, True))
+            for arg in reversed(node.args):
+                if isinstance(arg, LazyVec3) and id(arg) not in seen:
+                    stack.append((arg, False))
+        return order
+
+    def _buffer_slots(self, nodes: list[LazyVec3],
+                      direct: bool) -> tuple[dict[int, int], int]:
+        """
+        Assigns every operation a reusable block buffer. A buffer is free
+        again after the last operation that reads it, so a chain of
+        operations needs a single buffer however long it is, and only
+        subexpressions that are still needed later keep theirs. An
+        operation can take over the buffer of an operand it reads for the
+        last time, since ufuncs may write over an input of the same shape.
+        Returns the buffer of every operation and the number of buffers
+        """
+        last_use = {}
+        for position, node in enumerate(nodes):
+            for arg in node.args:
+                if isinstance(arg, LazyVec3):
+                    last_use[id(arg)] = position
+        slots, free, count = {}, [], 0
+        for position, node in enumerate(nodes):
+            if node.op == "leaf":
+                continue
+            for key in {id(arg) for arg in node.args
+                        if isinstance(arg, LazyVec3)}:
+                if key in slots and last_use[key] == position:
+                    free.append(slots[key])
+            # the last operation writes into a float64 output directly
+            if node is self and direct:
+                continue
+            if free:
+                slots[id(node)] = free.pop()
+            else:
+                slots[id(node)] = count
+                count += 1
+        return slots, count
+
+    def evaluate(self, components: str = "xyz",
+                 out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Computes the expression and returns an (n, len(components)) array
+        with the requested components, for example "xyz" or "z". Pass
+        ``out`` to write the result into an existing array.
+
+        Every operation is computed in float64. The result is float32 only
+        when all input arrays are float32, and is then rounded once at the
+        end
+        """
+        if not components:
+            raise ValueError("At least one component must be requested")
+        columns = [_COMPONENTS[c] for c in components]
+        n, width = len(self), len(columns)
+        nodes = self._nodes()
+        if out is None:
+            out = np.empty((n, width), dtype=np.result_type(
+                *(arg for node in nodes for arg in node.args
+                  if isinstance(arg, np.ndarray))
+            ))
+        elif out.shape != (n, width):
+            raise ValueError(
+                f"Expected an output of shape {(n, width)}, got {out.shape}"
+            )
+        if self._result is not None:
+            out[...] = self._result.data[:, columns]
+            return out
+
+        # consecutive components can be read through a view of the input
+        if columns == list(range(columns[0], columns[0] + width)):
+            columns = slice(columns[0], columns[0] + width)
+        # the intermediate operations share as few reusable buffers as
+        # their lifetimes allow, and so does the last one unless it can
+        # write into a float64 output directly
+        direct = out.dtype == np.float64
+        slots, count = self._buffer_slots(nodes, direct)
+        buffers = [np.empty((min(n, _BLOCK_ROWS), width))
+                   for _ in range(count)]
+        for start in range(0, n, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, n)
+            values = {}
+            for node in nodes:
+                if node.op == "leaf":
+                    values[id(node)] = node.args[0][start:stop, columns]
+                    continue
+                if node is self and direct:
+                    target = out[start:stop]
+                else:
+                    target = buffers[slots[id(node)]][:stop - start]
+                operands = [
+                    values[id(arg)] if isinstance(arg, LazyVec3)
+                    else arg[start:stop, None] if isinstance(arg, np.ndarray)
+                    else arg
+                    for arg in node.args
+                ]
+                _UFUNCS[node.op](*operands, out=target)
+                values[id(node)] = target
+            if self.op == "leaf" or not direct:
+                out[start:stop] = values[id(self)]
+        return out
+
+    def collect(self) -> Vec3Array:
+        """Evaluates the expression into a Vec3Array. The result is kept,
+        so later accesses do not compute it again"""
+        if self._result is None:
+            self._result = Vec3Array(self.evaluate())
+        return self._result
+
+    @property
+    def data(self) -> np.ndarray:
+        """The evaluated (n, 3) array. It is computed on first access"""
+        return self.collect().data
+
+    @property
+    def x(self) -> np.ndarray:
+        """The x components, computed without the other components"""
+        return self._component("x")
+
+    @property
+    def y(self) -> np.ndarray:
+        """The y components, computed without the other components"""
+        return self._component("y")
+
+    @property
+    def z(self) -> np.ndarray:
+        """The z components, computed without the other components"""
+        return self._component("z")
+
+    def _component(self, name: str) -> np.ndarray:
+        if self._result is not None:
+            return self._result.data[:, _COMPONENTS[name]]
+        return self.evaluate(name)[:, 0]
+
+    def __getitem__(self, item) -> Vec3 | Vec3Array:
+        return self.collect()[item]
+
+    def __iter__(self) -> Iterator[Vec3]:
+        return iter(self.collect())
+
+
+_UFUNCS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "div": np.true_divide,
+    "neg": np.negative,
+}
@@ -0,0 +1,290 @@
+"""This module provides indexed triangle meshes
+ and batched line-triangle intersection"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from .batch import P3Array, Line3Array, _as_lines, _rowwise_dot
+from .bounds import AABB, AABBArray, _slabs
+from .octree import Frustum, _classify_box, _OUTSIDE
+from .ordering import spatial_order
+from .vectorz import P3, Line3
+
+__all__ = [
+    "TriangleMesh",
+    "line_mesh_intersections",
+]
+
+# Number of neighbouring triangles that share one bounding box at the
+# bottom of the box hierarchy
+_TRIANGLES_PER_LEAF = 8
+
+# Number of lines that walk the box hierarchy together, which bounds the
+# memory used by the pairs of lines and boxes they pass through
+_LINE_BLOCK_ROWS = 4096
+
+
+class TriangleMesh:
+    """
+    Represents a mesh of triangles in 3D space
+
+    The corners are stored once in an ``(n, 3)`` vertex array, and every
+    triangle is a row of three indices into it in an ``(m, 3)`` face array,
+    so corners shared by several triangles are stored once.
+
+    A hierarchy of bounding boxes over the triangles is built the first
+    time lines are intersected with the mesh and reused afterwards. It is
+    rebuilt when ``vertices`` or ``faces`` is assigned, but not when the
+    arrays are changed in place.
+    """
+    def __init__(self, vertices, faces) -> None:
+        self._hierarchy = None
+        self.vertices = vertices
+        self.faces = faces
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """The (n, 3) array of corner coordinates"""
+        return self._vertices
+
+    @vertices.setter
+    def vertices(self, value) -> None:
+        vertices = P3Array(value).data
+        # the constructor checks the faces after it sets the vertices
+        faces = getattr(self, "_faces", None)
+        if faces is not None and len(faces) \
+                and faces.max() >= len(vertices):
+            raise ValueError(
+                f"The faces use vertex {faces.max()}, but only "
+                f"{len(vertices)} vertices were given"
+            )
+        self._vertices = vertices
+        self._hierarchy = None
+
+    @property
+    def faces(self) -> np.ndarray:
+        """The (m, 3) array of vertex indices of every triangle"""
+        return self._faces
+
+    @faces.setter
+    def faces(self, value) -> None:
+        faces = np.asarray(value, dtype=np.intp).reshape(-1, 3)
+        if len(faces) and (faces.min() < 0
+                           or faces.max() >= len(self._vertices)):
+            raise ValueError(
+                f"Face indices must be between 0 and "
+                f"{len(self._vertices) - 1}"
+            )
+        self._faces = faces
+        self._hierarchy = None
+
+    @staticmethod
+    def from_triangles(triangles: Iterable[tuple[P3, P3, P3]]
+                       ) -> TriangleMesh:
+        """Creates a mesh from triangles given by their corners.
+        Corners with the same coordinates become one vertex"""
+        corners = np.array([(p.x, p.y, p.z) for triangle in triangles
+                            for p in triangle], dtype=np.float64)
+        if len(corners) % 3:
+            raise ValueError("Every triangle must have three corners")
+        vertices, faces = np.unique(corners.reshape(-1, 3), axis=0,
+                                    return_inverse=True)
+        return TriangleMesh(vertices, faces.reshape(-1, 3))
+
+    def __len__(self) -> int:
+        return len(self._faces)
+
+    def __str__(self) -> str:
+        return (f"TriangleMesh({len(self._vertices)} vertices, "
+                f"{len(self)} triangles)")
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        # the box hierarchy is left out and rebuilt when it is needed
+        return TriangleMesh, (self._vertices, self._faces)
+
+    def corners(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns three (m, 3) arrays with the corners of every triangle"""
+        return tuple(self._vertices[self._faces[:, k]] for k in range(3))
+
+    def normals(self) -> np.ndarray:
+        """Returns the unit normal vector of every triangle, following the
+        right-hand rule over the order of its corners"""
+        a, b, c = self.corners()
+        normals = np.cross(b - a, c - a)
+        lengths = np.sqrt(_rowwise_dot(normals, normals))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return normals / lengths[:, None]
+
+    def areas(self) -> np.ndarray:
+        """Calculates the area of every triangle"""
+        a, b, c = self.corners()
+        normals = np.cross(b - a, c - a)
+        return np.sqrt(_rowwise_dot(normals, normals)) / 2
+
+    def surface_area(self) -> float:
+        """Calculates the total area of all triangles"""
+        return float(self.areas().sum())
+
+    def volume(self) -> float:
+        """
+        Calculates the volume enclosed by a closed mesh whose triangles
+        face outwards, following the right-hand rule over their corners.
+        The result is negative when they face inwards, and meaningless
+        for meshes that are not closed
+        """
+        if len(self) == 0:
+            return 0.0
+        # the signed volumes of the tetrahedra between every triangle and
+        # the first vertex, which keeps the rounding errors small
+        a, b, c = (corner - self._vertices[0] for corner in self.corners())
+        return float(_rowwise_dot(a, np.cross(b, c)).sum() / 6)
+
+    def bounds(self) -> AABB:
+        """Returns the smallest box that contains all vertices"""
+        return AABB.from_points(self._vertices)
+
+    def triangle_bounds(self) -> AABBArray:
+        """Returns the smallest box around every triangle"""
+        corners = self._vertices[self._faces]
+        return AABBArray(corners.min(axis=1), corners.max(axis=1))
+
+    def culled(self, view) -> TriangleMesh:
+        """
+        Returns a mesh with the triangles that may be inside a view, which
+        is an AABB or a Frustum. A triangle is removed when its bounding
+        box lies outside the view, so some triangles that are kept can
+        still lie just outside of it
+        """
+        boxes = self.triangle_bounds()
+        if isinstance(view, Frustum):
+            result = view._classify(boxes.minimums, boxes.maximums)
+        else:
+            result = _classify_box(view, boxes.minimums, boxes.maximums)
+        return TriangleMesh(self._vertices, self._faces[result != _OUTSIDE])
+
+    def _boxes(self) -> tuple:
+        """
+        Builds the box hierarchy. The triangles are sorted along a Hilbert
+        curve and split into leaves of neighbouring triangles; every level
+        above joins the boxes of two neighbouring nodes of the level below.
+        Returns the sorted triangle indices, the first corner and the two
+        edges of every sorted triangle and the boxes of every level, from
+        the leaves up to the root
+        """
+        if self._hierarchy is None:
+            corners = self._vertices[self._faces]
+            order = spatial_order(corners.mean(axis=1))
+            corners = corners[order]
+            starts = np.arange(0, len(corners), _TRIANGLES_PER_LEAF)
+            levels = [(np.minimum.reduceat(corners.min(axis=1), starts),
+                       np.maximum.reduceat(corners.max(axis=1), starts))]
+            while len(levels[-1][0]) > 1:
+                minimums, maximums = levels[-1]
+                pairs = np.arange(0, len(minimums), 2)
+                levels.append((np.minimum.reduceat(minimums, pairs),
+                               np.maximum.reduceat(maximums, pairs)))
+            first = corners[:, 0]
+            self._hierarchy = (order, first, corners[:, 1] - first,
+                               corners[:, 2] - first, levels)
+        return self._hierarchy
+
+
+def _moller_trumbore(origins: np.ndarray, directions: np.ndarray,
+                     first: np.ndarray, edge1: np.ndarray, edge2: np.ndarray,
+                     t_min: float, t_max: float
+                     ) -> tuple[np.ndarray, np.ndarray, np.ndarray,
+                                np.ndarray]:
+    """Intersects corresponding rows of lines and triangles. Returns the
+    hit mask, the t values and the barycentric coordinates u and v"""
+    p = np.cross(directions, edge2)
+    det = _rowwise_dot(edge1, p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = 1 / det
+        s = origins - first
+        u = _rowwise_dot(s, p) * inverse
+        q = np.cross(s, edge1)
+        v = _rowwise_dot(directions, q) * inverse
+        t = _rowwise_dot(edge2, q) * inverse
+        # lines parallel to a triangle have det == 0 and never hit it
+        hit = ((det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1)
+               & (t >= t_min) & (t <= t_max))
+    return hit, t, u, v
+
+
+def line_mesh_intersections(lines: Line3Array | Iterable[Line3],
+                            mesh: TriangleMesh, t_min: float = 0.0,
+                            t_max: float = np.inf
+                            ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds the nearest triangle of a mesh hit by every line, with the
+    Moller-Trumbore test.
+
+    Only hits with t between ``t_min`` and ``t_max`` count, so by default
+    the lines are rays that start at their origins; use
+    ``t_min=-numpy.inf`` for whole lines. The distance of a hit is t times
+    the length of the direction vector. Returns the t value of every
+    nearest hit, the index of the triangle hit and the (n, 3) barycentric
+    coordinates (w0, w1, w2) of the hit point, which is
+    w0 * a + w1 * b + w2 * c for the corners a, b and c of the triangle.
+    Lines that miss get t = inf, the index -1 and NaN coordinates.
+
+    Every line is only tested against the triangles whose boxes in the
+    hierarchy of the mesh it passes through.
+    """
+    lines = _as_lines(lines)
+    n = len(lines)
+    nearest = np.full(n, np.inf, dtype=np.float64)
+    triangles = np.full(n, -1, dtype=np.intp)
+    barycentric = np.full((n, 3), np.nan, dtype=np.float64)
+    if n == 0 or len(mesh) == 0:
+        return nearest, triangles, barycentric
+    order, first, edge1, edge2, levels = mesh._boxes()
+
+    for start in range(0, n, _LINE_BLOCK_ROWS):
+        origins = lines.origins[start:start + _LINE_BLOCK_ROWS]
+        directions = lines.directions[start:start + _LINE_BLOCK_ROWS]
+        # walk down the hierarchy with every pair of a line and a node
+        # whose box it passes through
+        line = np.arange(len(origins))
+        node = np.zeros(len(origins), dtype=np.intp)
+        for depth in range(len(levels) - 1, -1, -1):
+            minimums, maximums = levels[depth]
+            hit, _, _ = _slabs(origins[line], directions[line],
+                               minimums[node], maximums[node], t_min, t_max)
+            line, node = line[hit], node[hit]
+            if depth:
+                # the children of node i are the nodes 2i and 2i + 1
+                line = np.repeat(line, 2)
+                node = (np.repeat(node * 2, 2)
+                        + np.tile([0, 1], len(node)))
+                exists = node < len(levels[depth - 1][0])
+                line, node = line[exists], node[exists]
+
+        # expand every leaf to its triangles
+        firsts = node * _TRIANGLES_PER_LEAF
+        counts = np.minimum(_TRIANGLES_PER_LEAF, len(order) - firsts)
+        offsets = np.arange(int(counts.sum())) - np.repeat(
+            np.cumsum(counts) - counts, counts)
+        line = np.repeat(line, counts)
+        triangle = np.repeat(firsts, counts) + offsets
+
+        hit, t, u, v = _moller_trumbore(
+            origins[line], directions[line], first[triangle],
+            edge1[triangle], edge2[triangle], t_min, t_max
+        )
+        line, triangle, t, u, v = (a[hit] for a in (line, triangle, t, u, v))
+        # keep the nearest hit of every line
+        sort = np.lexsort((t, line))
+        line, best = np.unique(line[sort], return_index=True)
+        best = sort[best]
+        rows = line + start
+        nearest[rows] = t[best]
+        triangles[rows] = order[triangle[best]]
+        barycentric[rows, 0] = 1 - u[best] - v[best]
+        barycentric[rows, 1] = u[best]
+        barycentric[rows, 2] = v[best]
+    return nearest, triangles, barycentric
@@ -0,0 +1,427 @@
+"""This module provides an octree over points in 3D space
+ with box and view frustum culling"""
+from __future__ import annotations
+
+import itertools
+import math
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .batch import P3Array, _as_array
+from .bounds import AABB
+from .vectorz import P3, Vec3, Plane, cross, dot
+
+__all__ = [
+    "Frustum",
+    "Octree",
+]
+
+# The result of testing a box against a culling volume
+_OUTSIDE, _INTERSECTING, _INSIDE = 0, 1, 2
+
+
+class Frustum:
+    """
+    Represents a convex volume bounded by planes, such as the volume
+    visible from a camera
+
+    Every plane must have its normal vector pointing into the volume, so a
+    point is inside when its signed distance to every plane is at least 0.
+    """
+    def __init__(self, planes: Iterable[Plane]) -> None:
+        self.planes: list[Plane] = list(planes)
+        if not self.planes:
+            raise ValueError("A frustum needs at least one plane")
+        self._normals = np.array([(p.normal.x, p.normal.y, p.normal.z)
+                                  for p in self.planes], dtype=np.float64)
+        self._d = np.array([p.d for p in self.planes], dtype=np.float64)
+
+    @staticmethod
+    def perspective(eye: P3, target: P3, up: Vec3, fov_deg: float,
+                    aspect: float, near: float, far: float) -> Frustum:
+        """
+        Creates the frustum seen by a perspective camera at eye looking at
+        target. fov_deg is the vertical field of view and aspect is the
+        ratio of the width to the height of the view
+        """
+        forward = (target - eye).to_vec3()
+        forward = forward / forward.magnitude()
+        right = cross(forward, up)
+        right = right / right.magnitude()
+        true_up = cross(right, forward)
+        tan_v = math.tan(math.radians(fov_deg) / 2)
+        tan_h = tan_v * aspect
+        origin = eye.to_vec3()
+
+        planes = [
+            Plane((origin + forward * near).to_point(), forward),
+            Plane((origin + forward * far).to_point(), forward * -1),
+        ]
+        # every side plane passes through the eye and contains one edge
+        # direction of the view and the axis perpendicular to it
+        for edge, axis in (
+            (forward - right * tan_h, true_up),
+            (forward + right * tan_h, true_up),
+            (forward - true_up * tan_v, right),
+            (forward + true_up * tan_v, right),
+        ):
+            normal = cross(edge, axis)
+            if dot(normal, forward) < 0:
+                normal = normal * -1
+            planes.append(Plane(eye, normal))
+        return Frustum(planes)
+
+    def __str__(self) -> str:
+        return f"Frustum({len(self.planes)} planes)"
+
+    __repr__ = __str__
+
+    def contains_point(self, point: P3) -> bool:
+        """Checks if a point is inside the frustum"""
+        return all(
+            dot(plane.normal, point.to_vec3()) + plane.d >= 0
+            for plane in self.planes
+        )
+
+    def contains_points(self, points: P3Array | np.ndarray | Iterable[P3]
+                        ) -> np.ndarray:
+        """Checks which points are inside the frustum"""
+        data = _as_array(points)
+        result = np.ones(len(data), dtype=bool)
+        for normal, d in zip(self._normals, self._d):
+            values = data @ normal
+            values += d
+            result &= values >= 0
+        return result
+
+    def _classify(self, minimums: np.ndarray,
+                  maximums: np.ndarray) -> np.ndarray:
+        """Checks if boxes are outside, inside or intersecting the frustum"""
+        result = np.full(len(minimums), _INSIDE, dtype=np.int8)
+        for normal, d in zip(self._normals, self._d):
+            # the corners of the boxes furthest along and against the normal
+            along = normal >= 0
+            positive = np.where(along, maximums, minimums) @ normal + d
+            negative = np.where(along, minimums, maximums) @ normal + d
+            result[(negative < 0) & (result == _INSIDE)] = _INTERSECTING
+            result[positive < 0] = _OUTSIDE
+        return result
+
+
+def _classify_box(box: AABB, minimums: np.ndarray,
+                  maximums: np.ndarray) -> np.ndarray:
+    """Checks if boxes are outside, inside or intersecting another box"""
+    result = np.full(len(minimums), _INTERSECTING, dtype=np.int8)
+    inside = ((minimums >= box.minimum).all(axis=1)
+              & (maximums <= box.maximum).all(axis=1))
+    outside = ((minimums > box.maximum).any(axis=1)
+               | (maximums < box.minimum).any(axis=1))
+    result[inside] = _INSIDE
+    result[outside] = _OUTSIDE
+    return result
+
+
+class _Node:
+    """A cubic cell of an octree"""
+    __slots__ = ("center", "half", "depth", "children", "indices",
+                 "count", "total")
+
+    def __init__(self, center: np.ndarray, half: float, depth: int) -> None:
+        self.center = center
+        self.half = half
+        self.depth = depth
+        # eight children for inner nodes, None for leaves
+        self.children: list[_Node] | None = None
+        # the indices of the points of a leaf
+        self.indices: list[int] = []
+        # the number of points in the subtree and the sum of their
+        # positions, which give the centroid for level of detail
+        self.count = 0
+        self.total = np.zeros(3)
+
+    @property
+    def minimum(self) -> np.ndarray:
+        return self.center - self.half
+
+    @property
+    def maximum(self) -> np.ndarray:
+        return self.center + self.half
+
+    def child_center(self, octant: int) -> np.ndarray:
+        """The center of the child cell with the given octant code"""
+        signs = np.array([octant & 1, (octant >> 1) & 1, (octant >> 2) & 1])
+        return self.center + (signs * 2 - 1) * (self.half / 2)
+
+
+def _octants(data: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """Octant codes of points relative to a center, with bit 0, 1 and 2
+    set when the x, y and z coordinate is at least the center's"""
+    above = data >= center
+    return above[:, 0] | (above[:, 1] << 1) | (above[:, 2] << 2)
+
+
+class Octree:
+    """
+    An octree over points in 3D space
+
+    Every leaf stores up to ``leaf_capacity`` point indices, unless it is
+    at ``max_depth``. Points can be added one by one with ``insert``,
+    which splits full leaves and grows the root when a point falls outside
+    of it, or built all at once with ``from_points``.
+
+    ``query_box`` and ``query_frustum`` return the indices of the points in
+    a box or a frustum, skipping every node that lies outside of it and
+    taking all points of every node that lies inside of it without testing
+    them. Every node counts the points below it, which ``level_of_detail``
+    uses to summarise distant or dense regions.
+    """
+    def __init__(self, bounds: AABB | None = None, leaf_capacity: int = 64,
+                 max_depth: int = 16) -> None:
+        if leaf_capacity < 1:
+            raise ValueError("The leaf capacity must be at least 1")
+        self.leaf_capacity: int = leaf_capacity
+        self.max_depth: int = max_depth
+        self._root: _Node | None = None
+        if bounds is not None:
+            self._root = _Node(
+                (bounds.minimum + bounds.maximum) / 2,
+                max(float(bounds.size.max()) / 2, 1e-9), 0
+            )
+        self._positions = np.empty((0, 3), dtype=np.float64)
+        self._size = 0
+
+    @staticmethod
+    def from_points(points: P3Array | np.ndarray | Iterable[P3],
+                    leaf_capacity: int = 64,
+                    max_depth: int = 16) -> Octree:
+        """Builds an octree over many points at once. The points get the
+        indices 0 to n - 1 in the order they are given"""
+        data = _as_array(points)
+        if not np.isfinite(data).all():
+            raise ValueError("Octree points must have finite coordinates")
+        tree = Octree(AABB.from_points(data) if len(data) else None,
+                      leaf_capacity, max_depth)
+        tree._positions = data.copy()
+        tree._size = len(data)
+        if len(data):
+            tree._build(tree._root, np.arange(len(data)))
+        return tree
+
+    def _build(self, node: _Node, indices: np.ndarray) -> None:
+        """Distributes points over a node and its subtree"""
+        data = self._positions[indices]
+        node.count = len(indices)
+        node.total = data.sum(axis=0)
+        if len(indices) <= self.leaf_capacity or node.depth >= self.max_depth:
+            node.indices = indices.tolist()
+            return
+        octants = _octants(data, node.center)
+        order = np.argsort(octants, kind="stable")
+        bounds = np.searchsorted(octants[order], np.arange(9))
+        node.indices = []
+        node.children = []
+        for octant in range(8):
+            child = _Node(node.child_center(octant), node.half / 2,
+                          node.depth + 1)
+            node.children.append(child)
+            members = indices[order[bounds[octant]:bounds[octant + 1]]]
+            if len(members):
+                self._build(child, members)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __str__(self) -> str:
+        return f"Octree({len(self)} points, {self.node_count()} nodes)"
+
+    __repr__ = __str__
+
+    @property
+    def bounds(self) -> AABB | None:
+        """The cube covered by the root node"""
+        if self._root is None:
+            return None
+        return AABB.from_arrays(self._root.minimum, self._root.maximum)
+
+    def points(self) -> P3Array:
+        """Returns all points in the order of their indices"""
+        return P3Array(self._positions[:self._size])
+
+    def insert(self, point: P3) -> int:
+        """Adds a point and returns its index"""
+        position = np.array([point.x, point.y, point.z], dtype=np.float64)
+        # the root could never grow to contain an infinite coordinate, and
+        # NaN fails every bounds check
+        if not np.isfinite(position).all():
+            raise ValueError(
+                f"Octree points must have finite coordinates, got {point}"
+            )
+        if self._root is None:
+            self._root = _Node(position.copy(), 0.5, 0)
+        while (np.abs(position - self._root.center) > self._root.half).any():
+            self._grow_towards(position)
+
+        index = self._size
+        if index == len(self._positions):
+            # grow the storage geometrically so inserts stay O(1)
+            positions = np.empty((max(16, 2 * index), 3), dtype=np.float64)
+            positions[:index] = self._positions[:index]
+            self._positions = positions
+        self._positions[index] = position
+        self._size += 1
+
+        node = self._root
+        while True:
+            node.count += 1
+            node.total += position
+            if node.children is None:
+                break
+            node = node.children[_octants(position[None], node.center)[0]]
+        node.indices.append(index)
+        if (len(node.indices) > self.leaf_capacity
+                and node.depth < self.max_depth):
+            self._split(node)
+        return index
+
+    def _split(self, node: _Node) -> None:
+        """Turns a full leaf into an inner node"""
+        indices = np.array(node.indices, dtype=np.intp)
+        node.indices = []
+        node.children = []
+        octants = _octants(self._positions[indices], node.center)
+        for octant in range(8):
+            child = _Node(node.child_center(octant), node.half / 2,
+                          node.depth + 1)
+            node.children.append(child)
+            members = indices[octants == octant]
+            if len(members):
+                child.indices = members.tolist()
+                child.count = len(members)
+                child.total = self._positions[members].sum(axis=0)
+                if (len(members) > self.leaf_capacity
+                        and child.depth < self.max_depth):
+                    self._split(child)
+
+    def _grow_towards(self, position: np.ndarray) -> None:
+        """Doubles the root cube in the direction of a point"""
+        old = self._root
+        direction = np.where(position >= old.center, 1.0, -1.0)
+        root = _Node(old.center + direction * old.half, old.half * 2, 0)
+        root.count = old.count
+        root.total = old.total.copy()
+        if old.count:
+            root.children = []
+            # the old root becomes the child in the opposite direction
+            old_octant = int(_octants(old.center[None], root.center)[0])
+            for octant in range(8):
+                if octant == old_octant:
+                    child = old
+                else:
+                    child = _Node(root.child_center(octant), old.half, 1)
+                root.children.append(child)
+            self._deepen(old)
+        self._root = root
+
+    def _deepen(self, node: _Node) -> None:
+        """Increases the depth of every node in a subtree by one"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            node.depth += 1
+            if node.children:
+                stack.extend(node.children)
+
+    def _leaves(self, node: _Node) -> Iterator[_Node]:
+        """Yields the non-empty leaves of a subtree"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                if node.indices:
+                    yield node
+            else:
+                stack.extend(child for child in node.children if child.count)
+
+    def node_count(self) -> int:
+        """Returns the number of nodes in the tree"""
+        if self._root is None:
+            return 0
+        count, stack = 0, [self._root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if node.children:
+                stack.extend(node.children)
+        return count
+
+    def _query(self, classify, contains) -> np.ndarray:
+        """Collects the indices of the points accepted by a culling test"""
+        if self._root is None or not self._root.count:
+            return np.empty(0, dtype=np.intp)
+        accepted, candidates = [], []
+        # the tree is walked one level at a time, so every level is
+        # classified with one vectorised call
+        level = [self._root]
+        while level:
+            centers = np.array([node.center for node in level])
+            halves = np.array([node.half for node in level])[:, None]
+            results = classify(centers - halves, centers + halves).tolist()
+            next_level = []
+            for node, result in zip(level, results):
+                if result == _OUTSIDE:
+                    continue
+                if result == _INSIDE:
+                    # every point of the subtree is accepted without a test
+                    accepted.extend(leaf.indices
+                                    for leaf in self._leaves(node))
+                elif node.children is None:
+                    candidates.append(node.indices)
+                else:
+                    next_level.extend(child for child in node.children
+                                      if child.count)
+            level = next_level
+        # the points of leaves on the boundary are tested all at once
+        parts = [np.fromiter(itertools.chain.from_iterable(accepted),
+                             dtype=np.intp)]
+        candidates = np.fromiter(itertools.chain.from_iterable(candidates),
+                                 dtype=np.intp)
+        parts.append(candidates[contains(self._positions[candidates])])
+        return np.sort(np.concatenate(parts))
+
+    def query_box(self, box: AABB) -> np.ndarray:
+        """Returns the sorted indices of the points inside a box"""
+        return self._query(
+            lambda minimum, maximum: _classify_box(box, minimum, maximum),
+            box.contains_points,
+        )
+
+    def query_frustum(self, frustum: Frustum) -> np.ndarray:
+        """Returns the sorted indices of the points inside a frustum"""
+        return self._query(frustum._classify, frustum.contains_points)
+
+    def level_of_detail(self, max_depth: int,
+                        frustum: Frustum | None = None
+                        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Summarises the points by the nodes at max_depth, or by shallower
+        leaves. Returns the centroids of the points in those nodes and the
+        number of points each of them represents. With a frustum, nodes
+        outside of it are skipped
+        """
+        centroids, counts = [], []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            if not node.count:
+                continue
+            if frustum is not None and frustum._classify(
+                    node.minimum[None], node.maximum[None])[0] == _OUTSIDE:
+                continue
+            if node.children is None or node.depth >= max_depth:
+                centroids.append(node.total / node.count)
+                counts.append(node.count)
+            else:
+                stack.extend(node.children)
+        return (np.array(centroids, dtype=np.float64).reshape(-1, 3),
+                np.array(counts, dtype=np.int64))
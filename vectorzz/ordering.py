@@ -0,0 +1,183 @@
+"""This module orders points along space-filling curves, so points that
+ are close in space are also close in memory"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from .batch import P3Array, Vec3Array, Line3Array, _as_array
+from .planar import P2Array
+from .vectorz import P3
+
+__all__ = [
+    "morton_keys",
+    "hilbert_keys",
+    "spatial_order",
+    "reorder",
+]
+
+# The largest number of bits per axis whose interleaved key fits in
+# a uint64, for 2D and 3D points
+_MAX_BITS = {2: 32, 3: 21}
+
+
+def _as_coordinates(points) -> np.ndarray:
+    """Returns the (n, 2) or (n, 3) coordinate array of a collection"""
+    if isinstance(points, (P3Array, Vec3Array)):
+        return points.data
+    if isinstance(points, Line3Array):
+        return points.origins
+    if isinstance(points, P2Array):
+        return points.data
+    if isinstance(points, np.ndarray) and points.ndim == 2 \
+            and points.shape[1] == 2:
+        return points.astype(np.float64, copy=False)
+    return _as_array(points)
+
+
+def _quantize(data: np.ndarray, bits: int | None) -> tuple[np.ndarray, int]:
+    """
+    Maps coordinates to integers between 0 and 2^bits - 1. All axes share
+    one scale, so the grid cells are squares or cubes
+    """
+    dims = data.shape[1]
+    if bits is None:
+        bits = _MAX_BITS[dims]
+    if not 1 <= bits <= _MAX_BITS[dims]:
+        raise ValueError(
+            f"bits must be between 1 and {_MAX_BITS[dims]} for {dims}D "
+            f"points, got {bits}"
+        )
+    if len(data) == 0:
+        return np.empty((0, dims), dtype=np.uint64), bits
+    minimum = data.min(axis=0)
+    extent = float((data.max(axis=0) - minimum).max())
+    cells = 1 << bits
+    scale = cells / extent if extent > 0 else 0.0
+    grid = np.floor((data - minimum) * scale)
+    np.clip(grid, 0, cells - 1, out=grid)
+    return grid.astype(np.uint64), bits
+
+
+def _spread(values: np.ndarray, dims: int) -> np.ndarray:
+    """Inserts dims - 1 zero bits between the bits of every value"""
+    v = values.astype(np.uint64)
+    if dims == 2:
+        masks = (0x0000FFFF0000FFFF, 0x00FF00FF00FF00FF,
+                 0x0F0F0F0F0F0F0F0F, 0x3333333333333333,
+                 0x5555555555555555)
+        shifts = (16, 8, 4, 2, 1)
+    else:
+        v &= np.uint64(0x1FFFFF)
+        masks = (0x1F00000000FFFF, 0x1F0000FF0000FF,
+                 0x100F00F00F00F00F, 0x10C30C30C30C30C3,
+                 0x1249249249249249)
+        shifts = (32, 16, 8, 4, 2)
+    for shift, mask in zip(shifts, masks):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _interleave(grid: np.ndarray) -> np.ndarray:
+    """Interleaves the bits of the columns, with the first column in the
+    lowest bit of every group"""
+    dims = grid.shape[1]
+    keys = np.zeros(len(grid), dtype=np.uint64)
+    for axis in range(dims):
+        keys |= _spread(grid[:, axis], dims) << np.uint64(axis)
+    return keys
+
+
+def morton_keys(points, bits: int | None = None) -> np.ndarray:
+    """
+    Computes the Morton (Z-order) key of every point. The points can be
+    2D or 3D and are quantized to a grid of 2^bits cells per axis over
+    their bounds; by default the largest grid whose keys fit in a uint64
+    is used. Returns a uint64 array
+    """
+    grid, _ = _quantize(_as_coordinates(points), bits)
+    return _interleave(grid)
+
+
+def hilbert_keys(points, bits: int | None = None) -> np.ndarray:
+    """
+    Computes the Hilbert curve key of every point. Consecutive keys belong
+    to neighbouring grid cells, so the curve keeps points closer together
+    than the Morton order. The arguments are the same as for morton_keys
+    """
+    grid, bits = _quantize(_as_coordinates(points), bits)
+    dims = grid.shape[1]
+    x = [grid[:, axis].copy() for axis in range(dims)]
+    # Skilling's transform of the axes to the transposed Hilbert index,
+    # applied to all points at once
+    zero = np.uint64(0)
+    for level in range(bits - 1, 0, -1):
+        p = np.uint64((1 << level) - 1)
+        for axis in range(dims):
+            # all ones where the bit of this level is set, otherwise zero
+            mask = zero - ((x[axis] >> np.uint64(level)) & np.uint64(1))
+            # where the bit is set, invert the low bits of the first axis,
+            # otherwise exchange the low bits of the first axis and this one
+            t = x[0] ^ x[axis]
+            t &= p & ~mask
+            x[0] ^= (p & mask) | t
+            if axis:
+                x[axis] ^= t
+    for axis in range(1, dims):
+        x[axis] ^= x[axis - 1]
+    t = np.zeros(len(grid), dtype=np.uint64)
+    for level in range(bits - 1, 0, -1):
+        mask = zero - ((x[-1] >> np.uint64(level)) & np.uint64(1))
+        t ^= mask & np.uint64((1 << level) - 1)
+    # the first axis holds the most significant bit of every group
+    return _interleave(np.stack([axis ^ t for axis in reversed(x)], axis=1))
+
+
+def spatial_order(points, curve: str = "hilbert",
+                  bits: int | None = None) -> np.ndarray:
+    """Returns the indices that sort the points along a space-filling
+    curve, "hilbert" or "morton" """
+    if curve == "hilbert":
+        keys = hilbert_keys(points, bits)
+    elif curve == "morton":
+        keys = morton_keys(points, bits)
+    else:
+        raise ValueError(
+            f"curve must be 'hilbert' or 'morton', got {curve!r}"
+        )
+    return np.argsort(keys, kind="stable")
+
+
+def _take(obj, order: np.ndarray):
+    """Reorders a collection, an array or a list"""
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(obj[i] for i in order.tolist())
+    return obj[order]
+
+
+def reorder(points: P3Array | P2Array | Vec3Array | Line3Array
+            | np.ndarray | Iterable[P3], *attributes, curve: str = "hilbert",
+            bits: int | None = None) -> tuple:
+    """
+    Sorts a collection along a space-filling curve, together with any
+    attributes that have one entry per element, such as colours, weights or
+    another collection. Lines are ordered by their origins. Returns the
+    reordered collection followed by the reordered attributes, each of the
+    same type as given
+
+    Kernels and tree builds that visit the result in order then touch
+    memory that is close together, and splitting it into chunks of rows
+    gives chunks that are close together in space.
+    """
+    if not isinstance(points, (P3Array, P2Array, Vec3Array, Line3Array,
+                               np.ndarray)):
+        points = list(points)
+    order = spatial_order(points, curve, bits)
+    for attribute in attributes:
+        if len(attribute) != len(order):
+            raise ValueError(
+                f"Expected attributes with {len(order)} entries, "
+                f"got {len(attribute)}"
+            )
+    return tuple(_take(obj, order) for obj in (points, *attributes))
@@ -0,0 +1,212 @@
+"""This module runs the batch functions on many cores at once.
+ Inputs and outputs are placed in shared memory, so workers read and write
+ them directly instead of receiving pickled copies"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Iterable
+
+import numpy as np
+
+from .batch import (
+    P3Array, Line3Array, _as_array, _as_lines,
+    point_plane_distances, plane_contains_points,
+    line_plane_intersections, knn,
+)
+from .vectorz import P3, Line3, Plane
+
+__all__ = [
+    "ParallelExecutor",
+]
+
+# (shared memory name, shape, dtype) of an array placed in shared memory
+_Handle = tuple[str, tuple, str]
+
+
+def _share(array: np.ndarray,
+           segments: list[shared_memory.SharedMemory]) -> _Handle:
+    """Copies an array into a new shared memory segment"""
+    segment = shared_memory.SharedMemory(create=True,
+                                         size=max(1, array.nbytes))
+    segments.append(segment)
+    np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+    return segment.name, array.shape, array.dtype.str
+
+
+def _allocate(shape: tuple, dtype,
+              segments: list[shared_memory.SharedMemory]
+              ) -> tuple[np.ndarray, _Handle]:
+    """Creates an uninitialised array in a new shared memory segment"""
+    dtype = np.dtype(dtype)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    segment = shared_memory.SharedMemory(create=True, size=size)
+    segments.append(segment)
+    return (np.ndarray(shape, dtype, buffer=segment.buf),
+            (segment.name, shape, dtype.str))
+
+
+def _attach(handle: _Handle) -> tuple[shared_memory.SharedMemory,
+                                      np.ndarray]:
+    """Maps a shared array created by the parent process"""
+    name, shape, dtype = handle
+    segment = shared_memory.SharedMemory(name=name)
+    return segment, np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+
+
+def _distances_kernel(inputs, outputs, start, stop, plane, signed):
+    points, = inputs
+    out, = outputs
+    out[start:stop] = point_plane_distances(points[start:stop], plane,
+                                            signed)
+
+
+def _contains_kernel(inputs, outputs, start, stop, plane, tolerance):
+    points, = inputs
+    out, = outputs
+    out[start:stop] = plane_contains_points(plane, points[start:stop],
+                                            tolerance)
+
+
+def _intersections_kernel(inputs, outputs, start, stop, plane):
+    origins, directions = inputs
+    out, = outputs
+    out[start:stop] = line_plane_intersections(
+        Line3Array(origins[start:stop], directions[start:stop]), plane
+    )
+
+
+def _knn_kernel(inputs, outputs, start, stop, k):
+    points, queries = inputs
+    distances, indices = outputs
+    distances[start:stop], indices[start:stop] = knn(
+        points, queries[start:stop], k
+    )
+
+
+def _run_chunk(kernel: Callable, input_handles: list[_Handle],
+               output_handles: list[_Handle], start: int, stop: int,
+               args: tuple) -> None:
+    """Runs a kernel on rows start:stop of shared arrays in a worker"""
+    segments, arrays = [], []
+    try:
+        for handle in input_handles + output_handles:
+            segment, array = _attach(handle)
+            segments.append(segment)
+            arrays.append(array)
+        n_inputs = len(input_handles)
+        kernel(arrays[:n_inputs], arrays[n_inputs:], start, stop, *args)
+    finally:
+        # the arrays must be released before their segments are closed
+        array = None
+        arrays.clear()
+        for segment in segments:
+            segment.close()
+
+
+class ParallelExecutor:
+    """
+    Runs batch functions across a pool of worker processes.
+
+    The input rows are split into chunks of ``chunk_size`` rows, and every
+    chunk is processed by one worker. Inputs are copied into shared memory
+    once per call and the workers write their results straight into a
+    shared output array, so neither is pickled per task. By default one
+    worker is started per CPU and every worker gets about 4 chunks.
+
+    The executor should be used as a context manager, or closed with
+    ``shutdown``, so the worker processes are stopped.
+    """
+    def __init__(self, workers: int | None = None,
+                 chunk_size: int | None = None) -> None:
+        self.workers: int = workers or os.cpu_count() or 1
+        self.chunk_size: int | None = chunk_size
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self) -> ParallelExecutor:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        """Stops the worker processes"""
+        self._pool.shutdown()
+
+    def _chunks(self, n: int) -> list[tuple[int, int]]:
+        """Splits n rows into (start, stop) ranges"""
+        size = self.chunk_size or max(1, -(-n // (self.workers * 4)))
+        return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+    def _map(self, kernel: Callable, inputs: list[np.ndarray], n: int,
+             outputs: list[tuple[tuple, type]], args: tuple = ()
+             ) -> list[np.ndarray]:
+        """Runs a kernel over n rows and returns copies of its outputs"""
+        segments, views = [], []
+        try:
+            input_handles = [_share(np.ascontiguousarray(array), segments)
+                             for array in inputs]
+            output_handles = []
+            for shape, dtype in outputs:
+                array, handle = _allocate(shape, dtype, segments)
+                views.append(array)
+                output_handles.append(handle)
+            array = None
+            futures = [
+                self._pool.submit(_run_chunk, kernel, input_handles,
+                                  output_handles, start, stop, args)
+                for start, stop in self._chunks(n)
+            ]
+            for future in futures:
+                future.result()
+            return [view.copy() for view in views]
+        finally:
+            # drop views of the shared buffers before closing the segments
+            views.clear()
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    def point_plane_distances(self,
+                              points: P3Array | np.ndarray | Iterable[P3],
+                              plane: Plane,
+                              signed: bool = True) -> np.ndarray:
+        """Parallel version of batch.point_plane_distances"""
+        data = _as_array(points)
+        return self._map(_distances_kernel, [data], len(data),
+                         [((len(data),), data.dtype)], (plane, signed))[0]
+
+    def plane_contains_points(self, plane: Plane,
+                              points: P3Array | np.ndarray | Iterable[P3],
+                              tolerance: float = 0.0) -> np.ndarray:
+        """Parallel version of batch.plane_contains_points"""
+        data = _as_array(points)
+        return self._map(_contains_kernel, [data], len(data),
+                         [((len(data),), np.bool_)], (plane, tolerance))[0]
+
+    def line_plane_intersections(self, lines: Line3Array | Iterable[Line3],
+                                 plane: Plane) -> np.ndarray:
+        """Parallel version of batch.line_plane_intersections"""
+        lines = _as_lines(lines)
+        return self._map(_intersections_kernel,
+                         [lines.origins, lines.directions], len(lines),
+                         [((len(lines), 3), lines.dtype)], (plane,))[0]
+
+    def knn(self, points: P3Array | np.ndarray | Iterable[P3],
+            queries: P3Array | np.ndarray | Iterable[P3],
+            k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """Parallel version of batch.knn, split over the query points"""
+        data = _as_array(points)
+        queries = _as_array(queries)
+        if not 0 < k <= len(data):
+            raise ValueError(
+                f"k must be between 1 and {len(data)}, got {k}"
+            )
+        dtype = np.result_type(data, queries)
+        distances, indices = self._map(
+            _knn_kernel, [data, queries], len(queries),
+            [((len(queries), k), dtype), ((len(queries), k), np.intp)],
+            (k,),
+        )
+        return distances, indices
@@ -0,0 +1,402 @@
+"""This module streams chunks of points from asynchronous sources such as
+ files, pipes and sockets through processing stages into sinks"""
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Callable, \
+    Iterable
+
+import numpy as np
+
+from .batch import P3Array, _as_array, point_plane_distances
+from .bounds import AABB
+from .vectorz import P3, Plane, Scene
+
+__all__ = [
+    "Pipeline",
+    "Stage",
+    "array_source",
+    "stream_source",
+    "file_source",
+    "pipe_source",
+    "socket_source",
+    "transform",
+    "filter_plane",
+    "filter_box",
+    "dedupe",
+    "ArraySink",
+    "SceneSink",
+    "FileSink",
+]
+
+# Number of points a source reads into one chunk at most
+_CHUNK_ROWS = 1 << 16
+
+# Number of chunks that can wait between two steps of a pipeline. A step
+# that gets this far ahead of the next one waits, and so do the steps
+# before it, down to the source
+_QUEUE_CHUNKS = 4
+
+# Put into a queue after the last chunk
+_END = None
+
+
+def _row_dtype(dtype) -> np.dtype:
+    """The little-endian dtype points are streamed in"""
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"dtype must be float32 or float64, got {dtype}")
+    return dtype.newbyteorder("<")
+
+
+def _chunk(data: bytes, dtype: np.dtype) -> P3Array:
+    """Turns packed rows into a collection of points"""
+    array = np.frombuffer(data, dtype).reshape(-1, 3)
+    return P3Array(array.astype(dtype.newbyteorder("="), copy=False))
+
+
+async def array_source(points: P3Array | np.ndarray | Iterable[P3],
+                       chunk_rows: int = _CHUNK_ROWS
+                       ) -> AsyncIterator[P3Array]:
+    """Yields points that are already in memory in chunks, for replaying
+    recorded data and standing in for a sensor in tests"""
+    data = _as_array(points)
+    for start in range(0, len(data), chunk_rows):
+        yield P3Array(data[start:start + chunk_rows])
+        # let the other steps of the pipeline run between chunks
+        await asyncio.sleep(0)
+
+
+async def stream_source(reader: asyncio.StreamReader,
+                        chunk_rows: int = _CHUNK_ROWS,
+                        dtype=np.float64) -> AsyncIterator[P3Array]:
+    """
+    Yields the points read from a stream of packed little-endian (x, y, z)
+    rows of float64 or float32 values. Every chunk holds the complete rows
+    that have arrived so far, up to ``chunk_rows``, so points are passed on
+    as soon as they arrive. Raises ValueError if the stream ends inside a
+    row
+    """
+    dtype = _row_dtype(dtype)
+    row = 3 * dtype.itemsize
+    pending = b""
+    while data := await reader.read(chunk_rows * row - len(pending)):
+        data = pending + data
+        complete = len(data) - len(data) % row
+        pending = data[complete:]
+        if complete:
+            yield _chunk(data[:complete], dtype)
+    if pending:
+        raise ValueError("The stream ended inside a row of coordinates")
+
+
+async def file_source(path: str, chunk_rows: int = _CHUNK_ROWS,
+                      dtype=np.float64) -> AsyncIterator[P3Array]:
+    """Yields the points of a file of packed rows, as written by FileSink.
+    The file is read on the default executor, so reading does not block
+    the event loop"""
+    dtype = _row_dtype(dtype)
+    row = 3 * dtype.itemsize
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as file:
+        while data := await loop.run_in_executor(None, file.read,
+                                                 chunk_rows * row):
+            if len(data) % row:
+                raise ValueError(
+                    "The file ended inside a row of coordinates"
+                )
+            yield _chunk(data, dtype)
+
+
+async def pipe_source(pipe: BinaryIO, chunk_rows: int = _CHUNK_ROWS,
+                      dtype=np.float64) -> AsyncIterator[P3Array]:
+    """Yields the points read from the read end of a pipe, such as the
+    standard output of a process, like stream_source"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+    try:
+        async for chunk in stream_source(reader, chunk_rows, dtype):
+            yield chunk
+    finally:
+        transport.close()
+
+
+async def socket_source(address: str | tuple[str, int],
+                        chunk_rows: int = _CHUNK_ROWS,
+                        dtype=np.float64) -> AsyncIterator[P3Array]:
+    """Connects to a Unix socket, given by its path, or to a TCP socket,
+    given as (host, port), and yields the points read from it like
+    stream_source"""
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+    try:
+        async for chunk in stream_source(reader, chunk_rows, dtype):
+            yield chunk
+    finally:
+        writer.close()
+
+
+class Stage:
+    """
+    A step of a pipeline that turns every chunk of points into a new one
+
+    ``func`` takes a P3Array and returns a P3Array; empty results are not
+    passed on. With offload, func runs on the executor of the pipeline
+    instead of the event loop, so a heavy batch kernel does not stop the
+    sources from reading. The chunks still go through a stage one at a
+    time and in order, so func can keep state between chunks.
+    """
+    def __init__(self, func: Callable[[P3Array], P3Array],
+                 offload: bool = False) -> None:
+        self.func: Callable[[P3Array], P3Array] = func
+        self.offload: bool = offload
+
+    def __call__(self, chunk: P3Array) -> P3Array:
+        return self.func(chunk)
+
+    def __str__(self) -> str:
+        return f"Stage({getattr(self.func, '__name__', self.func)})"
+
+    __repr__ = __str__
+
+
+def transform(matrix=None, offset=None, offload: bool = False) -> Stage:
+    """A stage that maps every point p to matrix @ p + offset. Both parts
+    are optional"""
+    matrix = None if matrix is None \
+        else np.asarray(matrix, dtype=np.float64).reshape(3, 3)
+    offset = None if offset is None \
+        else np.asarray(offset, dtype=np.float64).reshape(3)
+
+    def apply(chunk: P3Array) -> P3Array:
+        data = chunk.data
+        if matrix is not None:
+            data = data @ matrix.T
+        if offset is not None:
+            data = data + offset
+        return P3Array(data.astype(chunk.dtype, copy=False))
+
+    return Stage(apply, offload)
+
+
+def filter_plane(plane: Plane, min_distance: float = 0.0,
+                 max_distance: float = np.inf,
+                 offload: bool = True) -> Stage:
+    """A stage that keeps the points whose signed distance from a plane is
+    between min_distance and max_distance. By default these are the points
+    on the side the normal points to, including the plane itself"""
+    def apply(chunk: P3Array) -> P3Array:
+        distances = point_plane_distances(chunk, plane)
+        return chunk[(distances >= min_distance)
+                     & (distances <= max_distance)]
+
+    return Stage(apply, offload)
+
+
+def filter_box(box: AABB, offload: bool = True) -> Stage:
+    """A stage that keeps the points inside a box"""
+    return Stage(lambda chunk: chunk[box.contains_points(chunk)], offload)
+
+
+def dedupe(tolerance: float = 0.0, offload: bool = True) -> Stage:
+    """
+    A stage that drops points seen before, in the same chunk or in an
+    earlier one. With a tolerance, points that fall into the same cube of
+    a grid with cells of that size count as the same point, and the first
+    of them is kept. The stage remembers one key per point it keeps
+    """
+    if tolerance < 0:
+        raise ValueError("The tolerance must not be negative")
+    seen: set[bytes] = set()
+
+    def apply(chunk: P3Array) -> P3Array:
+        if tolerance:
+            keys = np.floor(chunk.data / tolerance).astype(np.int64)
+        else:
+            # +0.0 turns -0.0 into 0.0, so both give the same key
+            keys = np.ascontiguousarray(chunk.data, dtype=np.float64) + 0.0
+        rows = keys.view(np.dtype((np.void, keys.itemsize * 3))).ravel()
+        # the index of the first row with every key, found by letting
+        # earlier rows overwrite later ones
+        n = len(rows)
+        first = dict(zip(rows.tolist()[::-1], range(n - 1, -1, -1)))
+        keep = np.fromiter((i for key, i in first.items() if key not in seen),
+                           dtype=np.intp)
+        seen.update(first)
+        keep.sort()
+        return chunk[keep]
+
+    return Stage(apply, offload)
+
+
+class ArraySink:
+    """A sink that collects all points that reach it"""
+    def __init__(self) -> None:
+        self._chunks: list[np.ndarray] = []
+
+    async def write(self, chunk: P3Array) -> None:
+        self._chunks.append(chunk.data)
+
+    async def close(self) -> None:
+        pass
+
+    @property
+    def points(self) -> P3Array:
+        """All points received so far, in the order they arrived"""
+        if not self._chunks:
+            return P3Array(np.empty((0, 3)))
+        return P3Array(np.concatenate(self._chunks))
+
+
+class SceneSink:
+    """A sink that adds every point to a Scene, including its index"""
+    def __init__(self, scene: Scene) -> None:
+        self.scene: Scene = scene
+
+    async def write(self, chunk: P3Array) -> None:
+        self.scene.add(*chunk.to_points())
+
+    async def close(self) -> None:
+        pass
+
+
+class FileSink:
+    """
+    A sink that writes the points to a file of packed little-endian rows,
+    which file_source reads back. The file is opened when the pipeline
+    runs, written on the default executor and closed when the pipeline
+    finishes. If the pipeline fails, the incomplete file is removed
+    """
+    def __init__(self, path: str, dtype=np.float64) -> None:
+        self.path: str = path
+        self.dtype: np.dtype = _row_dtype(dtype)
+        self._file: BinaryIO | None = None
+        # the write running on the executor, which carries on when the
+        # pipeline is cancelled
+        self._pending: asyncio.Future | None = None
+
+    def _write(self, data: np.ndarray) -> None:
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        self._file.write(data)
+
+    async def write(self, chunk: P3Array) -> None:
+        data = np.ascontiguousarray(chunk.data, dtype=self.dtype)
+        self._pending = asyncio.get_running_loop().run_in_executor(
+            None, self._write, data.reshape(-1).view(np.uint8)
+        )
+        await asyncio.shield(self._pending)
+
+    async def close(self) -> None:
+        # a pipeline without points still leaves an empty file
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        self._file.close()
+
+    async def abort(self) -> None:
+        if self._pending is not None:
+            await asyncio.wait([self._pending])
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.path)
+            self._file = None
+
+
+class Pipeline:
+    """
+    Moves chunks of points from a source through stages into a sink
+
+    The source is any asynchronous iterable of P3Array chunks, such as the
+    sources of this module, and the sink any object with asynchronous
+    ``write(chunk)`` and ``close()`` methods. A sink can also have an
+    asynchronous ``abort()`` method, which is called instead of
+    ``close()`` when the pipeline fails. Every step runs as its own
+    task, and the steps are connected by queues of at most
+    ``queue_chunks`` chunks. When a step falls behind, the queue in front
+    of it fills up and the steps before it wait, so a slow sink slows
+    reading down instead of filling the memory.
+
+    Offloaded stages run on ``executor``, by default the thread pool of
+    the event loop. NumPy releases the GIL in the batch kernels, so
+    offloaded stages also run alongside each other.
+    """
+    def __init__(self, source: AsyncIterable[P3Array],
+                 stages: Iterable[Stage] = (), sink=None,
+                 queue_chunks: int = _QUEUE_CHUNKS,
+                 executor: Executor | None = None) -> None:
+        if queue_chunks < 1:
+            raise ValueError("Queues must hold at least one chunk")
+        self.source: AsyncIterable[P3Array] = source
+        self.stages: list[Stage] = list(stages)
+        self.sink = sink if sink is not None else ArraySink()
+        self.queue_chunks: int = queue_chunks
+        self.executor: Executor | None = executor
+
+    async def _produce(self, outbox: asyncio.Queue) -> None:
+        source = aiter(self.source)
+        try:
+            async for chunk in source:
+                if len(chunk):
+                    await outbox.put(chunk)
+        finally:
+            # close files and connections right away, also on errors
+            if hasattr(source, "aclose"):
+                await source.aclose()
+        await outbox.put(_END)
+
+    async def _process(self, stage: Stage, inbox: asyncio.Queue,
+                       outbox: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while (chunk := await inbox.get()) is not _END:
+            if stage.offload:
+                chunk = await loop.run_in_executor(self.executor, stage,
+                                                   chunk)
+            else:
+                chunk = stage(chunk)
+            if len(chunk):
+                await outbox.put(chunk)
+        await outbox.put(_END)
+
+    async def _consume(self, inbox: asyncio.Queue) -> int:
+        count = 0
+        try:
+            while (chunk := await inbox.get()) is not _END:
+                await self.sink.write(chunk)
+                count += len(chunk)
+        except BaseException:
+            # also when another step failed and this one was cancelled
+            await getattr(self.sink, "abort", self.sink.close)()
+            raise
+        await self.sink.close()
+        return count
+
+    async def run(self) -> int:
+        """Runs the pipeline until the source is exhausted and returns the
+        number of points written to the sink. If a step fails, the other
+        steps are cancelled and its exception is raised. If several steps
+        fail, for example a source that also fails to close while it is
+        cancelled, their exceptions are raised together in an
+        ExceptionGroup"""
+        queues = [asyncio.Queue(self.queue_chunks)
+                  for _ in range(len(self.stages) + 1)]
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self._produce(queues[0]))
+                for stage, inbox, outbox in zip(self.stages, queues,
+                                                queues[1:]):
+                    group.create_task(self._process(stage, inbox, outbox))
+                consumer = group.create_task(self._consume(queues[-1]))
+        except ExceptionGroup as error:
+            if len(error.exceptions) > 1:
+                raise
+            # cancelled steps are left out of the group, so the failure
+            # of a single step is all it holds
+            raise error.exceptions[0] from None
+        return consumer.result()
@@ -0,0 +1,423 @@
+"""This module provides 2D geometry over arrays: collections of points
+ and segments, polygons, batched point-in-polygon tests and segment
+ intersections"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .batch import _float64, _storage_dtype, _upcast_blocks
+from .vectorz import P2, Vec2
+
+__all__ = [
+    "P2Array",
+    "Segment2Array",
+    "Polygon",
+    "points_in_polygons",
+    "segment_intersections",
+    "pairwise_segment_intersections",
+]
+
+# Maximum number of segment pairs tested at once by
+# pairwise_segment_intersections, which bounds its memory use
+_SEGMENT_BLOCK_ELEMENTS = 1 << 22
+
+
+class P2Array:
+    """
+    Represents a collection of points in 2D space
+
+    The points are stored in a single ``(n, 2)`` array, so the functions
+    of this module can process all of them without creating a P2 object
+    per point. Like P3Array, the array holds float64 or float32 values.
+    """
+    def __init__(self, data, dtype=None) -> None:
+        data = np.asarray(data, dtype=_storage_dtype(dtype, data))
+        if data.ndim != 2 or data.shape[1] != 2:
+            raise ValueError(
+                f"Expected an array of shape (n, 2), got {data.shape} instead"
+            )
+        self.data: np.ndarray = data
+
+    @staticmethod
+    def from_points(points: Iterable[P2], dtype=np.float64) -> P2Array:
+        """Creates a collection from P2 objects"""
+        return P2Array(
+            np.array([(p.x, p.y) for p in points],
+                     dtype=np.float64).reshape(-1, 2),
+            dtype,
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the stored coordinates, float32 or float64"""
+        return self.data.dtype
+
+    def astype(self, dtype) -> P2Array:
+        """Returns a copy of the collection stored with another dtype"""
+        return P2Array(self.data.astype(_storage_dtype(dtype)))
+
+    def to_points(self) -> list[P2]:
+        """Converts the collection to a list of P2 objects"""
+        return [P2(x, y) for x, y in self.data.tolist()]
+
+    @property
+    def x(self) -> np.ndarray:
+        """The x coordinates of all points"""
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        """The y coordinates of all points"""
+        return self.data[:, 1]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, item) -> P2 | P2Array:
+        """Returns a single point for an integer index and a collection
+        for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            return P2(*self.data[item].tolist())
+        return P2Array(self.data[item])
+
+    def __iter__(self) -> Iterator[P2]:
+        return iter(self.to_points())
+
+    def __str__(self) -> str:
+        return f"P2Array({len(self)} points)"
+
+    __repr__ = __str__
+
+    def __reduce__(self):
+        return P2Array, (self.data,)
+
+
+class Segment2Array:
+    """
+    Represents a collection of line segments in 2D space
+
+    The start and end points are stored in two ``(n, 2)`` arrays of the
+    same dtype.
+    """
+    def __init__(self, starts, ends, dtype=None) -> None:
+        dtype = _storage_dtype(dtype, starts, ends)
+        self.starts: np.ndarray = P2Array(starts, dtype).data
+        self.ends: np.ndarray = P2Array(ends, dtype).data
+        if self.starts.shape != self.ends.shape:
+            raise ValueError(
+                f"Got {len(self.starts)} start and {len(self.ends)} end "
+                f"points"
+            )
+
+    @staticmethod
+    def from_segments(segments: Iterable[tuple[P2, P2]],
+                      dtype=np.float64) -> Segment2Array:
+        """Creates a collection from (start, end) pairs of P2 objects"""
+        segments = list(segments)
+        return Segment2Array(
+            P2Array.from_points(start for start, _ in segments).data,
+            P2Array.from_points(end for _, end in segments).data,
+            dtype,
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the stored points, float32 or float64"""
+        return self.starts.dtype
+
+    def astype(self, dtype) -> Segment2Array:
+        """Returns a copy of the collection stored with another dtype"""
+        dtype = _storage_dtype(dtype)
+        return Segment2Array(self.starts.astype(dtype),
+                             self.ends.astype(dtype))
+
+    def to_segments(self) -> list[tuple[P2, P2]]:
+        """Converts the collection to a list of (start, end) pairs"""
+        return [(P2(*start), P2(*end))
+                for start, end in zip(self.starts.tolist(),
+                                      self.ends.tolist())]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, item) -> tuple[P2, P2] | Segment2Array:
+        """Returns a single (start, end) pair for an integer index and a
+        collection for a slice, an index array or a boolean mask"""
+        if isinstance(item, (int, np.integer)):
+            return (P2(*self.starts[item].tolist()),
+                    P2(*self.ends[item].tolist()))
+        return Segment2Array(self.starts[item], self.ends[item])
+
+    def __iter__(self) -> Iterator[tuple[P2, P2]]:
+        return iter(self.to_segments())
+
+    def __str__(self) -> str:
+        return f"Segment2Array({len(self)} segments)"
+
+    __repr__ = __str__
+
+    def lengths(self) -> np.ndarray:
+        """Calculates the length of every segment"""
+        offsets = self.ends - self.starts
+        return np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+
+
+def _as_points2(points: P2Array | np.ndarray | Iterable[P2]) -> np.ndarray:
+    """Returns the (n, 2) coordinate array of a collection of points,
+    which can also be given as P2 or Vec2 objects or as rows of
+    coordinates"""
+    if isinstance(points, P2Array):
+        return points.data
+    if not isinstance(points, np.ndarray):
+        points = list(points)
+        if not points or isinstance(points[0], (P2, Vec2)):
+            return P2Array.from_points(points).data
+    return P2Array(points).data
+
+
+def _as_segments(segments: Segment2Array | Iterable[tuple[P2, P2]]
+                 ) -> Segment2Array:
+    if isinstance(segments, Segment2Array):
+        return segments
+    return Segment2Array.from_segments(segments)
+
+
+def _cross2(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """The z component of the cross products of rows of (n, 2) arrays"""
+    return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+
+class Polygon:
+    """
+    Represents a simple polygon in 2D space
+
+    The polygon is given by its corners in order, without repeating the
+    first corner at the end. It may be concave, and its corners may go
+    around it in either direction. The vertices keep the dtype they are
+    given in, but every calculation is done in float64.
+    """
+    def __init__(self, vertices: P2Array | np.ndarray | Iterable[P2]) -> None:
+        vertices = _as_points2(vertices)
+        if len(vertices) > 1 and (vertices[0] == vertices[-1]).all():
+            vertices = vertices[:-1]
+        if len(vertices) < 3:
+            raise ValueError(
+                f"A polygon needs at least 3 vertices, got {len(vertices)}"
+            )
+        self.vertices: np.ndarray = vertices
+        self.minimum: np.ndarray = vertices.min(axis=0)
+        self.maximum: np.ndarray = vertices.max(axis=0)
+
+    def __len__(self) -> int:
+        return len(self.vertices)
+
+    def __str__(self) -> str:
+        return f"Polygon({len(self)} vertices)"
+
+    __repr__ = __str__
+
+    def edges(self) -> Segment2Array:
+        """Returns the edges of the polygon in order"""
+        return Segment2Array(self.vertices,
+                             np.roll(self.vertices, -1, axis=0))
+
+    def bounds(self) -> tuple[P2, P2]:
+        """Returns the corners of the smallest axis-aligned rectangle that
+        contains the polygon"""
+        return P2(*self.minimum.tolist()), P2(*self.maximum.tolist())
+
+    def signed_area(self) -> float:
+        """Calculates the area of the polygon, which is positive when its
+        corners go around it counterclockwise and negative otherwise"""
+        # the shoelace formula, relative to the first corner to reduce
+        # rounding errors far from the origin
+        vertices = _float64(self.vertices)
+        relative = vertices - vertices[0]
+        return float(_cross2(relative, np.roll(relative, -1, axis=0)).sum()
+                     / 2)
+
+    def area(self) -> float:
+        """Calculates the area of the polygon"""
+        return abs(self.signed_area())
+
+    def centroid(self) -> P2:
+        """Calculates the center of mass of the area of the polygon"""
+        vertices = _float64(self.vertices)
+        origin = vertices[0]
+        relative = vertices - origin
+        following = np.roll(relative, -1, axis=0)
+        cross = _cross2(relative, following)
+        area = cross.sum() / 2
+        if area == 0:
+            raise ValueError("The centroid of a polygon without area "
+                             "is not defined")
+        center = ((relative + following) * cross[:, None]).sum(axis=0)
+        return P2(*(center / (6 * area) + origin).tolist())
+
+    def contains_point(self, point: P2) -> bool:
+        """Checks if a point is inside the polygon"""
+        return bool(self.contains_points(np.array([[point.x, point.y]]))[0])
+
+    def contains_points(self, points: P2Array | np.ndarray | Iterable[P2]
+                        ) -> np.ndarray:
+        """
+        Checks which points are inside the polygon. Points exactly on the
+        boundary count as inside for some edges and as outside for others,
+        so every point on a shared edge of two polygons is inside exactly
+        one of them
+        """
+        data = _as_points2(points)
+        result = np.zeros(len(data), dtype=bool)
+        candidates = np.flatnonzero(
+            (data >= self.minimum).all(axis=1)
+            & (data <= self.maximum).all(axis=1)
+        )
+        result[candidates] = _crossings(self.vertices, data[candidates])
+        return result
+
+
+def _crossings(vertices: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """
+    The even-odd rule: a point is inside when a ray from it towards +x
+    crosses the boundary an odd number of times. The points are sorted by
+    y once, so every edge only visits the points in its range of y, and
+    all pairs of an edge and a point in its range are tested at once.
+    Float32 points are compared with crossings computed in float64
+    """
+    vertices = _float64(vertices)
+    x, y = data[:, 0], data[:, 1]
+    order = np.argsort(y, kind="stable")
+    sorted_y = y[order]
+    starts = vertices
+    ends = np.roll(vertices, -1, axis=0)
+    # an edge crosses the rays of the points with low <= y < high
+    low = np.minimum(starts[:, 1], ends[:, 1])
+    high = np.maximum(starts[:, 1], ends[:, 1])
+    first = np.searchsorted(sorted_y, low, side="left")
+    counts = np.searchsorted(sorted_y, high, side="left") - first
+    edge = np.repeat(np.arange(len(vertices)), counts)
+    rows = order[np.arange(int(counts.sum()))
+                 - np.repeat(np.cumsum(counts) - counts - first, counts)]
+    # horizontal edges have no points in their range, so no division by 0
+    slope = (ends[edge, 0] - starts[edge, 0]) / (ends[edge, 1]
+                                                 - starts[edge, 1])
+    crossing = starts[edge, 0] + (y[rows] - starts[edge, 1]) * slope
+    crossed = rows[x[rows] < crossing]
+    return np.bincount(crossed, minlength=len(data)) % 2 == 1
+
+
+def points_in_polygons(points: P2Array | np.ndarray | Iterable[P2],
+                       polygons: Iterable[Polygon]) -> np.ndarray:
+    """
+    Finds the polygon that contains every point. Returns, for every point,
+    the index of the first polygon that contains it, or -1 for points
+    outside of all polygons.
+
+    The points are sorted by x once, so every polygon only tests the
+    points in its range of x and y.
+    """
+    data = _as_points2(points)
+    # the points are kept in x order, so the points in the range of a
+    # polygon are one contiguous block
+    order = np.argsort(data[:, 0], kind="stable")
+    data = data[order]
+    found = np.full(len(data), -1, dtype=np.intp)
+    for k, polygon in enumerate(polygons):
+        first = np.searchsorted(data[:, 0], polygon.minimum[0], side="left")
+        last = np.searchsorted(data[:, 0], polygon.maximum[0], side="right")
+        y = data[first:last, 1]
+        rows = np.flatnonzero((y >= polygon.minimum[1])
+                              & (y <= polygon.maximum[1])
+                              & (found[first:last] == -1)) + first
+        found[rows[_crossings(polygon.vertices, data[rows])]] = k
+    result = np.empty_like(found)
+    result[order] = found
+    return result
+
+
+def _segment_segment(starts1: np.ndarray, ends1: np.ndarray,
+                     starts2: np.ndarray, ends2: np.ndarray) -> np.ndarray:
+    """Intersection points of the segments p + t r and q + u s with t and
+    u between 0 and 1, with rows of NaN where they do not intersect. They
+    are computed in float64, from float32 points as well"""
+    p, q = _float64(starts1), _float64(starts2)
+    r, s = _float64(ends1) - p, _float64(ends2) - q
+    denominator = _cross2(r, s)
+    offset = q - p
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = _cross2(offset, s) / denominator
+        u = _cross2(offset, r) / denominator
+        # parallel segments have a zero denominator and get NaN or inf
+        hit = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        result = p + r * t[:, None]
+    result[~hit] = np.nan
+    return result
+
+
+def segment_intersections(segments1: Segment2Array | Iterable[tuple[P2, P2]],
+                          segments2: Segment2Array | Iterable[tuple[P2, P2]]
+                          ) -> np.ndarray:
+    """
+    Points in which corresponding pairs of segments intersect, as an
+    (n, 2) array. Pairs that do not intersect get a row of NaN, and so do
+    parallel pairs, which never have a single intersection point. The
+    points are float32 when both collections are
+    """
+    segments1, segments2 = _as_segments(segments1), _as_segments(segments2)
+    if len(segments1) != len(segments2):
+        raise ValueError(
+            f"Got {len(segments1)} and {len(segments2)} segments, "
+            f"expected the same"
+        )
+    dtype = np.result_type(segments1.dtype, segments2.dtype)
+    if dtype == np.float64:
+        return _segment_segment(segments1.starts, segments1.ends,
+                                segments2.starts, segments2.ends)
+    result = np.empty((len(segments1), 2), dtype=dtype)
+    for start, stop in _upcast_blocks(dtype, 0, len(result)):
+        result[start:stop] = _segment_segment(
+            segments1.starts[start:stop], segments1.ends[start:stop],
+            segments2.starts[start:stop], segments2.ends[start:stop]
+        )
+    return result
+
+
+def pairwise_segment_intersections(
+        segments1: Segment2Array | Iterable[tuple[P2, P2]],
+        segments2: Segment2Array | Iterable[tuple[P2, P2]]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Intersects every segment of one collection with every segment of
+    another. Returns the indices i and j of the pairs that intersect in a
+    single point and the (k, 2) array of those points, which is float32
+    when both collections are. Only pairs whose bounding rectangles overlap
+    are intersected
+    """
+    segments1, segments2 = _as_segments(segments1), _as_segments(segments2)
+    dtype = np.result_type(segments1.dtype, segments2.dtype)
+    low1 = np.minimum(segments1.starts, segments1.ends)
+    high1 = np.maximum(segments1.starts, segments1.ends)
+    low2 = np.minimum(segments2.starts, segments2.ends)
+    high2 = np.maximum(segments2.starts, segments2.ends)
+    results = []
+    block = max(1, _SEGMENT_BLOCK_ELEMENTS // max(1, len(segments2)))
+    for start in range(0, len(segments1), block):
+        stop = start + block
+        overlap = np.ones((len(low1[start:stop]), len(low2)), dtype=bool)
+        for axis in range(2):
+            overlap &= low1[start:stop, axis, None] <= high2[None, :, axis]
+            overlap &= low2[None, :, axis] <= high1[start:stop, axis, None]
+        i, j = np.nonzero(overlap)
+        i += start
+        points = _segment_segment(segments1.starts[i], segments1.ends[i],
+                                  segments2.starts[j], segments2.ends[j])
+        keep = ~np.isnan(points[:, 0])
+        results.append((i[keep], j[keep],
+                        points[keep].astype(dtype, copy=False)))
+    if not results:
+        return (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp),
+                np.empty((0, 2), dtype=dtype))
+    i, j, points = (np.concatenate(r) for r in zip(*results))
+    return i, j, points
@@ -0,0 +1,228 @@
+"""This module stores scenes and geometry collections in a compact binary
+ format and loads them back, optionally memory-mapped"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import struct
+from typing import BinaryIO
+
+import numpy as np
+
+from .batch import P3Array, Vec3Array, Line3Array, PlaneArray
+from .mesh import TriangleMesh
+from .octree import Octree
+from .planar import P2Array
+from .vectorz import Scene
+
+__all__ = [
+    "save",
+    "load",
+    "dumps",
+    "loads",
+]
+
+# Every file starts with these bytes, followed by the format version and
+# the length of the JSON header that describes the arrays
+_MAGIC = b"VECTORZZ"
+_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+
+# Every array starts at a multiple of this many bytes, so memory-mapped
+# arrays are aligned like freshly allocated ones
+_ALIGNMENT = 64
+
+
+def _scene_arrays(scene: Scene) -> tuple[dict[str, np.ndarray], dict]:
+    """The arrays and attributes that describe a scene"""
+    lines = Line3Array.from_lines(scene.lines)
+    meshes = scene.meshes
+    arrays = {
+        "vectors": Vec3Array.from_vectors(scene.vectors).data,
+        "points": P3Array.from_points(scene.points).data,
+        "line_origins": lines.origins,
+        "line_directions": lines.directions,
+        # the vertices and faces of all meshes one after another, and the
+        # number of vertices and faces of every mesh
+        "mesh_vertices": np.concatenate(
+            [np.empty((0, 3))] + [mesh.vertices for mesh in meshes]
+        ),
+        "mesh_faces": np.concatenate(
+            [np.empty((0, 3), dtype=np.int64)]
+            + [mesh.faces.astype(np.int64) for mesh in meshes]
+        ),
+        "mesh_sizes": np.array([(len(mesh.vertices), len(mesh))
+                                for mesh in meshes],
+                               dtype=np.int64).reshape(-1, 2),
+    }
+    return arrays, {"index": scene.point_index is not None}
+
+
+def _scene(arrays: dict[str, np.ndarray], attributes: dict) -> Scene:
+    """Creates a scene from the arrays of _scene_arrays"""
+    scene = Scene()
+    scene.vectors = Vec3Array(arrays["vectors"]).to_vectors()
+    scene.points = P3Array(arrays["points"]).to_points()
+    scene.lines = Line3Array(arrays["line_origins"],
+                             arrays["line_directions"]).to_lines()
+    vertex, face = 0, 0
+    for vertices, faces in arrays["mesh_sizes"].tolist():
+        scene.meshes.append(TriangleMesh(
+            arrays["mesh_vertices"][vertex:vertex + vertices],
+            arrays["mesh_faces"][face:face + faces],
+        ))
+        vertex, face = vertex + vertices, face + faces
+    if attributes["index"]:
+        # building the octrees at once is much faster than inserting
+        # every object, and gives the objects the same indices
+        scene.point_index = Octree.from_points(arrays["points"])
+        scene.vector_index = Octree.from_points(arrays["vectors"])
+    return scene
+
+
+# How every type is split into named arrays and attributes,
+# and how it is put back together
+_ENCODERS = {
+    P3Array: lambda obj: ({"data": obj.data}, {}),
+    Vec3Array: lambda obj: ({"data": obj.data}, {}),
+    P2Array: lambda obj: ({"data": obj.data}, {}),
+    Line3Array: lambda obj: ({"origins": obj.origins,
+                              "directions": obj.directions}, {}),
+    PlaneArray: lambda obj: ({"normals": obj.normals, "d": obj.d}, {}),
+    TriangleMesh: lambda obj: ({"vertices": obj.vertices,
+                                "faces": obj.faces.astype(np.int64)}, {}),
+    Scene: _scene_arrays,
+}
+_DECODERS = {
+    "P3Array": lambda arrays, _: P3Array(arrays["data"]),
+    "Vec3Array": lambda arrays, _: Vec3Array(arrays["data"]),
+    "P2Array": lambda arrays, _: P2Array(arrays["data"]),
+    "Line3Array": lambda arrays, _: Line3Array(arrays["origins"],
+                                               arrays["directions"]),
+    "PlaneArray": lambda arrays, _: PlaneArray(arrays["normals"],
+                                               arrays["d"]),
+    "TriangleMesh": lambda arrays, _: TriangleMesh(arrays["vertices"],
+                                                   arrays["faces"]),
+    "Scene": _scene,
+}
+
+
+def _encode(obj) -> tuple[str, dict[str, np.ndarray], dict]:
+    """Splits an object into its type name, arrays and attributes"""
+    encoder = _ENCODERS.get(type(obj))
+    if encoder is None:
+        raise ValueError(f"Cannot serialize objects of type "
+                         f"{type(obj).__name__}")
+    return (type(obj).__name__, *encoder(obj))
+
+
+def _decode(name: str, arrays: dict[str, np.ndarray], attributes: dict):
+    """Puts an object back together from the output of _encode"""
+    decoder = _DECODERS.get(name)
+    if decoder is None:
+        raise ValueError(f"Cannot deserialize objects of type {name}")
+    return decoder(arrays, attributes)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _write(file: BinaryIO, obj) -> None:
+    """
+    Writes an object as the prefix, a JSON header and the arrays. The
+    header lists the type of the object, its attributes and the dtype,
+    shape and offset of every array. Offsets count from the end of the
+    padded header, and the arrays are stored little-endian in C order
+    """
+    name, arrays, attributes = _encode(obj)
+    layout, offset = {}, 0
+    for key, array in arrays.items():
+        dtype = array.dtype.newbyteorder("<")
+        layout[key] = {"dtype": dtype.str, "shape": list(array.shape),
+                       "offset": offset}
+        offset = _aligned(offset + array.size * dtype.itemsize)
+    header = json.dumps({"type": name, "attributes": attributes,
+                         "arrays": layout}).encode()
+    file.write(_PREFIX.pack(_MAGIC, _VERSION, len(header)))
+    file.write(header)
+    position = _PREFIX.size + len(header)
+    file.write(bytes(_aligned(position) - position))
+    position = 0
+    for key, array in arrays.items():
+        spec = layout[key]
+        file.write(bytes(spec["offset"] - position))
+        array = np.ascontiguousarray(array, dtype=spec["dtype"])
+        # the buffer of the array is written without a copy
+        file.write(array.reshape(-1).view(np.uint8))
+        position = spec["offset"] + array.nbytes
+
+
+def _read(buffer) -> object:
+    """Reads an object from a buffer. The arrays are views of the buffer"""
+    buffer = memoryview(buffer).cast("B")
+    if len(buffer) < _PREFIX.size:
+        raise ValueError("The data is too short for a vectorzz file")
+    magic, version, length = _PREFIX.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError("The data is not a vectorzz file")
+    if version > _VERSION:
+        raise ValueError(f"Unsupported format version {version}, "
+                         f"expected at most {_VERSION}")
+    header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + length]))
+    start = _aligned(_PREFIX.size + length)
+    arrays = {}
+    for key, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape))
+        offset = start + spec["offset"]
+        if offset + count * dtype.itemsize > len(buffer):
+            raise ValueError(f"The data ends inside the array {key!r}")
+        array = np.frombuffer(buffer, dtype, count, offset) if count \
+            else np.empty(0, dtype)
+        # the collections expect arrays in the byte order of the machine
+        arrays[key] = array.reshape(shape).astype(dtype.newbyteorder("="),
+                                                  copy=False)
+    return _decode(header["type"], arrays, header["attributes"])
+
+
+def save(path: str | os.PathLike, obj) -> None:
+    """
+    Saves a Scene, a TriangleMesh or a P3Array, Vec3Array, P2Array,
+    Line3Array or PlaneArray to a file. The arrays of the object are
+    written as they are, so saving runs at the speed of the disk
+    """
+    with open(path, "wb") as file:
+        _write(file, obj)
+
+
+def load(path: str | os.PathLike, mmap: bool = False):
+    """
+    Loads an object saved with ``save``.
+
+    With mmap, the arrays of collections and meshes are mapped from the
+    file instead of being read, so only the parts that are used are ever
+    loaded. Changes to the arrays stay in memory and do not change the
+    file. The objects of a Scene are always created on load
+    """
+    if mmap:
+        return _read(np.memmap(path, dtype=np.uint8, mode="c"))
+    with open(path, "rb") as file:
+        buffer = bytearray(os.fstat(file.fileno()).st_size)
+        file.readinto(buffer)
+    return _read(buffer)
+
+
+def dumps(obj) -> bytes:
+    """Returns the bytes that ``save`` would write for an object"""
+    file = io.BytesIO()
+    _write(file, obj)
+    return file.getvalue()
+
+
+def loads(data: bytes | bytearray | memoryview):
+    """Creates an object from the bytes returned by ``dumps``. The arrays
+    of the object are copied from the bytes"""
+    return _read(bytearray(data))
@@ -0,0 +1,300 @@
+"""This module provides a uniform grid spatial hash for points that move,
+ used as a broadphase for collision and neighbour searches"""
+from __future__ import annotations
+
+import itertools
+import math
+from typing import Iterable
+
+import numpy as np
+
+from .batch import P3Array, _as_array
+from .vectorz import P3
+
+__all__ = [
+    "SpatialHashGrid",
+]
+
+# Cell coordinates are packed into one int64 key with 21 bits per axis,
+# relative to the lowest occupied cell, so the points may span at most
+# 2^21 cells along each axis
+_KEY_BITS = 21
+
+# Largest cell coordinate in absolute value. Beyond it, neighbouring
+# cells can no longer be told apart in float64
+_MAX_CELL = 1 << 52
+
+
+def _key_base(cells: np.ndarray, margin: int) -> np.ndarray:
+    """
+    The cell that keys are packed relative to, leaving room for neighbours
+    up to margin cells beyond the occupied ones. Raises ValueError if the
+    cells and their neighbours do not fit into the bits of a key, which
+    would make keys of different cells collide
+    """
+    if not len(cells):
+        return np.zeros(3, dtype=np.int64)
+    base = cells.min(axis=0) - margin
+    span = int((cells.max(axis=0) + margin - base).max())
+    if span >= 1 << _KEY_BITS:
+        raise ValueError(
+            f"The points span {span} cells along an axis, more than the "
+            f"{1 << _KEY_BITS} a grid supports; use a larger cell size"
+        )
+    return base
+
+
+def _pack(cells: np.ndarray, base: np.ndarray) -> np.ndarray:
+    """Packs (n, 3) integer cell coordinates into (n,) int64 keys, which
+    are ordered like the cells"""
+    shifted = cells - base
+    return ((shifted[:, 0] << (2 * _KEY_BITS))
+            | (shifted[:, 1] << _KEY_BITS) | shifted[:, 2])
+
+
+def _run_pairs(ids: np.ndarray, starts_a: np.ndarray, counts_a: np.ndarray,
+               starts_b: np.ndarray, counts_b: np.ndarray
+               ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every pair of runs (a, b) in ids, lists all pairs of one id from
+    run a and one id from run b
+    """
+    sizes = counts_a * counts_b
+    run = np.repeat(np.arange(len(sizes)), sizes)
+    local = np.arange(int(sizes.sum())) - np.repeat(np.cumsum(sizes) - sizes,
+                                                    sizes)
+    width = counts_b[run]
+    return (ids[starts_a[run] + local // width],
+            ids[starts_b[run] + local % width])
+
+
+class SpatialHashGrid:
+    """
+    A spatial hash over a uniform grid of cubic cells
+
+    Every point is stored in the cell that contains it. Points are
+    identified by the integer id returned by ``insert``; inserting, moving
+    and removing a single point takes constant time, and ``rebuild``
+    replaces all points at once by sorting their cell keys. Ids of removed
+    points are reused by later insertions.
+
+    ``candidate_pairs`` is the broadphase: it returns every pair of points
+    whose cells are at most ``cell_radius`` cells apart along each axis,
+    which includes every pair closer than ``cell_radius`` cell sizes.
+    The points, widened by ``cell_radius`` cells, must span at most 2^21
+    cells along each axis, and coordinates must be finite.
+    """
+    def __init__(self, cell_size: float) -> None:
+        if cell_size <= 0:
+            raise ValueError(
+                f"The cell size must be positive, got {cell_size}"
+            )
+        self.cell_size: float = cell_size
+        self._cells: dict[tuple[int, int, int], set[int]] | None = {}
+        # the positions of all ids ever handed out, with spare capacity
+        self._positions = np.empty((0, 3), dtype=np.float64)
+        self._active = np.empty(0, dtype=bool)
+        # the number of ids handed out so far
+        self._size = 0
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return self._size - len(self._free)
+
+    def __contains__(self, point_id: int) -> bool:
+        return 0 <= point_id < self._size and bool(self._active[point_id])
+
+    def __str__(self) -> str:
+        return (f"SpatialHashGrid({len(self)} points, "
+                f"{len(self._cell_map())} cells, cell size {self.cell_size})")
+
+    __repr__ = __str__
+
+    def cell_of(self, point: P3) -> tuple[int, int, int]:
+        """Returns the integer coordinates of the cell containing a point"""
+        return (math.floor(point.x / self.cell_size),
+                math.floor(point.y / self.cell_size),
+                math.floor(point.z / self.cell_size))
+
+    def _cells_of(self, data: np.ndarray) -> np.ndarray:
+        """Integer cell coordinates of an (n, 3) array of points"""
+        return np.floor(data / self.cell_size).astype(np.int64)
+
+    def _check_coordinates(self, data: np.ndarray) -> None:
+        """Raises ValueError for points whose cells cannot be computed"""
+        # NaN fails the comparison as well
+        if not (np.abs(data / self.cell_size) < _MAX_CELL).all():
+            raise ValueError(
+                f"Coordinates must be finite and within {_MAX_CELL} cells "
+                f"of the origin"
+            )
+
+    def _check(self, point_id: int) -> None:
+        if point_id not in self:
+            raise KeyError(f"No point with id {point_id} in the grid")
+
+    def position(self, point_id: int) -> P3:
+        """Returns the stored position of a point"""
+        self._check(point_id)
+        return P3(*self._positions[point_id].tolist())
+
+    def ids(self) -> np.ndarray:
+        """Returns the ids of all points in the grid"""
+        return np.flatnonzero(self._active[:self._size])
+
+    def points(self) -> P3Array:
+        """Returns the positions of all points, in the order of ids()"""
+        return P3Array(self._positions[self.ids()])
+
+    def insert(self, point: P3) -> int:
+        """Adds a point to the grid and returns its id"""
+        self._check_coordinates(np.array([point.x, point.y, point.z]))
+        if self._free:
+            point_id = self._free.pop()
+        else:
+            point_id = self._size
+            if point_id == len(self._positions):
+                # grow the storage geometrically so inserts stay O(1)
+                capacity = max(16, 2 * point_id)
+                positions = np.empty((capacity, 3), dtype=np.float64)
+                positions[:point_id] = self._positions
+                active = np.zeros(capacity, dtype=bool)
+                active[:point_id] = self._active
+                self._positions, self._active = positions, active
+            self._size += 1
+        self._positions[point_id] = (point.x, point.y, point.z)
+        self._active[point_id] = True
+        self._cell_map().setdefault(self.cell_of(point),
+                                    set()).add(point_id)
+        return point_id
+
+    def _unlink(self, point_id: int) -> None:
+        """Removes a point from the set of its cell"""
+        cell = self.cell_of(P3(*self._positions[point_id].tolist()))
+        cells = self._cell_map()
+        members = cells[cell]
+        members.discard(point_id)
+        if not members:
+            del cells[cell]
+
+    def move(self, point_id: int, point: P3) -> None:
+        """Moves a point to a new position"""
+        self._check(point_id)
+        self._check_coordinates(np.array([point.x, point.y, point.z]))
+        old_cell = self.cell_of(P3(*self._positions[point_id].tolist()))
+        new_cell = self.cell_of(point)
+        if old_cell != new_cell:
+            self._unlink(point_id)
+            self._cell_map().setdefault(new_cell, set()).add(point_id)
+        self._positions[point_id] = (point.x, point.y, point.z)
+
+    def remove(self, point_id: int) -> None:
+        """Removes a point from the grid"""
+        self._check(point_id)
+        self._unlink(point_id)
+        self._active[point_id] = False
+        self._free.append(point_id)
+
+    def rebuild(self, points: P3Array | np.ndarray | Iterable[P3]) -> None:
+        """
+        Replaces all points of the grid. The new points get the ids
+        0 to n - 1 in the order they are given
+        """
+        data = _as_array(points)
+        self._check_coordinates(data)
+        n = len(data)
+        self._positions = data.copy()
+        self._active = np.ones(n, dtype=bool)
+        self._size = n
+        self._free = []
+        # the cell sets are only needed by the single point operations,
+        # so they are built on first use
+        self._cells = None
+
+    def _cell_map(self) -> dict[tuple[int, int, int], set[int]]:
+        """Returns the sets of ids in every occupied cell"""
+        if self._cells is None:
+            ids, cells, starts, _ = self._buckets()
+            runs = np.split(ids, starts[1:]) if len(ids) else []
+            self._cells = dict(zip(map(tuple, cells.tolist()),
+                                   (set(run.tolist()) for run in runs)))
+        return self._cells
+
+    def _buckets(self) -> tuple[np.ndarray, np.ndarray,
+                                np.ndarray, np.ndarray]:
+        """
+        Sorts the ids by cell key. Returns the sorted ids and, for every
+        occupied cell in key order, its coordinates and the start and
+        length of its run of ids
+        """
+        ids = self.ids()
+        cells = self._cells_of(self._positions[ids])
+        keys = _pack(cells, _key_base(cells, 0))
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        _, starts, counts = np.unique(keys, return_index=True,
+                                      return_counts=True)
+        return ids[order], cells[order][starts], starts, counts
+
+    def query(self, point: P3, radius: float) -> np.ndarray:
+        """Returns the ids of all points within radius of a point"""
+        reach = math.ceil(radius / self.cell_size)
+        cx, cy, cz = self.cell_of(point)
+        cells = self._cell_map()
+        candidates = []
+        for dx, dy, dz in itertools.product(range(-reach, reach + 1),
+                                            repeat=3):
+            members = cells.get((cx + dx, cy + dy, cz + dz))
+            if members:
+                candidates.extend(members)
+        candidates = np.array(sorted(candidates), dtype=np.intp)
+        offsets = self._positions[candidates] - (point.x, point.y, point.z)
+        distances_sq = np.einsum("ij,ij->i", offsets, offsets)
+        return candidates[distances_sq <= radius * radius]
+
+    def candidate_pairs(self, cell_radius: int = 1
+                        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns every pair of ids (i, j) with i < j whose cells are at
+        most cell_radius cells apart along each axis
+        """
+        ids, cells, starts, counts = self._buckets()
+        # the neighbours of the occupied cells need keys as well; moving
+        # the base keeps the keys in the order of the cells
+        base = _key_base(cells, cell_radius)
+        keys = _pack(cells, base)
+        # pairs within a cell are listed in both orders and with
+        # themselves; the ids of a run are sorted, so left < right keeps
+        # every pair once
+        left, right = _run_pairs(ids, starts, counts, starts, counts)
+        keep = left < right
+        lefts, rights = [left[keep]], [right[keep]]
+        # every pair of distinct neighbouring cells is visited once by
+        # only looking at offsets in one half of the neighbourhood
+        span = range(-cell_radius, cell_radius + 1)
+        for offset in itertools.product(span, repeat=3):
+            if offset <= (0, 0, 0):
+                continue
+            neighbour_keys = _pack(cells + offset, base)
+            index = np.searchsorted(keys, neighbour_keys)
+            index[index == len(keys)] = 0
+            found = np.flatnonzero(keys[index] == neighbour_keys)
+            if len(found) == 0:
+                continue
+            other = index[found]
+            left, right = _run_pairs(ids, starts[found], counts[found],
+                                     starts[other], counts[other])
+            lefts.append(left)
+            rights.append(right)
+        left = np.concatenate(lefts)
+        right = np.concatenate(rights)
+        return np.minimum(left, right), np.maximum(left, right)
+
+    def pairs_within(self, distance: float
+                     ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns every pair of ids (i, j) with i < j of points that are
+        at most distance apart"""
+        i, j = self.candidate_pairs(math.ceil(distance / self.cell_size))
+        offsets = self._positions[i] - self._positions[j]
+        close = np.einsum("ij,ij->i", offsets, offsets) <= distance ** 2
+        return i[close], j[close]
@@ -37,6 +37,35 @@ class P3:
         return Vec3(self.x, self.y, self.z)
 
 
+class P2:
+    """Represents a point in 2D space"""
+    def __init__(self, x: int | float, y: int | float) -> None:
+        self.x = x
+        self.y = y
+
+    def __str__(self) -> str:
+        """Return a string representation of the point"""
+        return f"P2({self.x}, {self.y})"
+
+    __repr__ = __str__
+
+    def __sub__(self, other: Self) -> Self:
+        """Subtract one point in 2D space from another"""
+        return P2(self.x - other.x, self.y - other.y)
+
+    def __add__(self, other: Self) -> Self:
+        """Adds two 2D points together"""
+        return P2(self.x + other.x, self.y + other.y)
+
+    def __eq__(self, other) -> bool:
+        """Check if two points are equal"""
+        return self.x == other.x and self.y == other.y
+
+    def to_vec2(self) -> Vec2:
+        """Converts a point to a 2D vector from the origin to that point"""
+        return Vec2(self.x, self.y)
+
+
 class Vec3:
     """Represents a 3D vectors with x, y, z components"""
     def __init__(self,
@@ -139,51 +168,104 @@ class Vec2:
         """Calculates the magnitude of the vector"""
         return math.sqrt(self.x**2 + self.y**2)
 
+    def to_point(self) -> P2:
+        """Converts a vector to a point"""
+        return P2(self.x, self.y)
+
 
 class Line3:
-    """Represents a line in 3D space"""
+    """
+    Represents a line in 3D space
+
+    The components of the origin and direction vectors, the squared
+    magnitude of the direction and the unit direction are cached, so
+    repeated predicate queries against the same line are cheap. The cache
+    is refreshed whenever ``origin_vector`` or ``direction_vector`` is
+    reassigned. Mutating the components of those vectors in place is not
+    tracked; reassign the vector afterwards.
+    """
     def __init__(self, origin_vector: Vec3, direction_vector: Vec3) -> None:
         if type(origin_vector) != Vec3 or type(direction_vector) != Vec3:
             raise ValueError(
                 f"Expected type Vec3 for both arguments, got"
                 f" {type(origin_vector)} and {type(direction_vector)} instead"
             )
-        self.origin_vector: Vec3 = origin_vector
-        self.direction_vector: Vec3 = direction_vector
+        self._origin_vector: Vec3 = origin_vector
+        self._direction_vector: Vec3 = direction_vector
+        self._invalidate()
+
+    @property
+    def origin_vector(self) -> Vec3:
+        """The position vector of a point on the line"""
+        return self._origin_vector
+
+    @origin_vector.setter
+    def origin_vector(self, value: Vec3) -> None:
+        self._origin_vector = value
+        self._invalidate()
+
+    @property
+    def direction_vector(self) -> Vec3:
+        """The direction vector of the line"""
+        return self._direction_vector
+
+    @direction_vector.setter
+    def direction_vector(self, value: Vec3) -> None:
+        self._direction_vector = value
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        """Recomputes the cached quantities derived from the vectors"""
+        o = self._origin_vector
+        d = self._direction_vector
+        self._origin = (o.x, o.y, o.z)
+        self._direction = (d.x, d.y, d.z)
+        self._direction_sq = d.x * d.x + d.y * d.y + d.z * d.z
+        # the unit direction needs a square root, so it is computed lazily
+        self._unit_direction = None
+
+    @property
+    def direction_squared_magnitude(self) -> float | int:
+        """The squared magnitude of the direction vector"""
+        return self._direction_sq
+
+    @property
+    def unit_direction(self) -> Vec3:
+        """The direction vector scaled to a magnitude of 1"""
+        if self._unit_direction is None:
+            if self._direction_sq == 0:
+                raise ValueError(
+                    "The unit direction of a line with a zero direction "
+                    "vector is undefined"
+                )
+            length = math.sqrt(self._direction_sq)
+            dx, dy, dz = self._direction
+            self._unit_direction = Vec3(
+                dx / length, dy / length, dz / length
+            )
+        return self._unit_direction
 
     def is_parallel(self, other: Line3) -> bool:
         """Checks if two lines are parallel"""
-        # check if the two direction vectors are multiples of each other
-        try:
-            coefficient_values = [
-                self.direction_vector.x / other.direction_vector.x,
-                self.direction_vector.y / other.direction_vector.y,
-                self.direction_vector.z / other.direction_vector.z
-            ]
-            return len(set(coefficient_values)) == 1
-        except ZeroDivisionError:
-            # If a division by 0 error occurs, the lines are
-            # only parallel if both direction vectors are the zero vector
-            return self.direction_vector == other.direction_vector
+        if self._direction_sq == 0 or other._direction_sq == 0:
+            # a zero direction vector is only parallel to another zero
+            # direction vector
+            return self._direction == other._direction
+        # the direction vectors are multiples of each other if their
+        # cross product is the zero vector
+        return _cross_is_zero(self._direction, other._direction)
 
     def contains_point(self, point: P3) -> bool:
         """Checks if a specific point is on the line"""
         # If a vector is in the form: r = origin_vec + t * direction_vec,
-        # a point is on the line, if there exists a t such that
-        # r = point
-        try:
-            # calculate t values for each component
-            t_values = [
-                (point.x - self.origin_vector.x) / self.direction_vector.x,
-                (point.y - self.origin_vector.y) / self.direction_vector.y,
-                (point.z - self.origin_vector.z) / self.direction_vector.z
-            ]
-            # the point is on the line if all t values are equal
-            return len(set(t_values)) == 1
-        except ZeroDivisionError:
-            # If a division by 0 error occurs, the point is on the line if
-            # the origin vector is the point
-            return self.origin_vector.to_point() == point
+        # a point is on the line, if the vector from the origin to the point
+        # is a multiple of the direction vector
+        ox, oy, oz = self._origin
+        w = (point.x - ox, point.y - oy, point.z - oz)
+        if self._direction_sq == 0:
+            # the line degenerates to its origin
+            return w == (0, 0, 0)
+        return _cross_is_zero(w, self._direction)
 
     def __eq__(self, other: Line3) -> bool:
         """Checks if two lines are equal"""
@@ -207,7 +289,27 @@ class Line3:
     def point_at_t(self, t: int | float) -> P3:
         """Calculates the point at a specific t value.
         t value is a scalar which multiplies the direction vector"""
-        return (self.origin_vector + self.direction_vector * t).to_point()
+        ox, oy, oz = self._origin
+        dx, dy, dz = self._direction
+        return P3(ox + dx * t, oy + dy * t, oz + dz * t)
+
+    def closest_t(self, point: P3) -> float:
+        """
+        The t value of the point of the line closest to a point. This is
+        the scalar projection of the vector from the origin to the point
+        onto the direction, divided by the magnitude of the direction,
+        which is w . d / d . d and needs no square root. A line with a
+        zero direction vector gives 0
+        """
+        if self._direction_sq == 0:
+            return 0
+        ox, oy, oz = self._origin
+        w = (point.x - ox, point.y - oy, point.z - oz)
+        return _dot(w, self._direction) / self._direction_sq
+
+    def closest_point(self, point: P3) -> P3:
+        """The orthogonal projection of a point onto the line"""
+        return self.point_at_t(self.closest_t(point))
 
 
 class Plane:
@@ -220,22 +322,72 @@ class Plane:
     - 2 lines on the plane
     - a point and a line
     - a point and 2 direction vectors
+
+    The coefficients of the plane equation, the squared magnitude of the
+    normal and the canonical form (unit normal and signed distance) are
+    cached. The cache is refreshed whenever ``point`` or ``normal`` is
+    reassigned. Mutating the components of those objects in place is not
+    tracked; reassign them afterwards.
     """
     def __init__(self, point: P3, normal: Vec3) -> None:
         """Creates a plane from a point and a normal vector"""
-        self.point: P3 = point
-        self.normal: Vec3 = normal
+        self._point: P3 = point
+        self._normal: Vec3 = normal
+        self._invalidate()
+
+    @property
+    def point(self) -> P3:
+        """A point on the plane"""
+        return self._point
+
+    @point.setter
+    def point(self, value: P3) -> None:
+        self._point = value
+        self._invalidate()
+
+    @property
+    def normal(self) -> Vec3:
+        """The normal vector of the plane"""
+        return self._normal
+
+    @normal.setter
+    def normal(self, value: Vec3) -> None:
+        self._normal = value
+        self._invalidate()
+
+    @property
+    def d(self) -> float | int:
+        """The D coefficient of the plane equation Ax + By + Cz + D = 0"""
+        return self._d
+
+    def _invalidate(self) -> None:
+        """Recomputes the cached quantities derived from point and normal"""
+        n = self._normal
+        p = self._point
+        self._abc = (n.x, n.y, n.z)
+        self._normal_sq = n.x * n.x + n.y * n.y + n.z * n.z
         # The equation of a plane is Ax + By + Cz + D = 0
         # where A, B, C are the components of the normal vector
         # and D is the negative dot product of the normal vector and the point
-        self.d = -self.normal.x * self.point.x\
-                 - self.normal.y * self.point.y\
-                 - self.normal.z * self.point.z
+        self._d = -n.x * p.x - n.y * p.y - n.z * p.z
+        # the canonical form needs a square root, so it is computed lazily
+        self._canonical = None
 
     @staticmethod
     def from_normal_and_d(normal: Vec3, d: int | float) -> Plane:
         """Creates a plane from a normal vector and a d value"""
-        return Plane(P3(0, 0, -d / normal.z), normal)
+        normal_sq = dot(normal, normal)
+        if normal_sq == 0:
+            raise ValueError("The normal vector of a plane must be non-zero")
+        # the point of the plane closest to the origin is -d * n / |n|^2
+        scale = -d / normal_sq
+        plane = Plane(
+            P3(normal.x * scale, normal.y * scale, normal.z * scale), normal
+        )
+        # keep the exact d value rather than the one recomputed from the
+        # rounded point
+        plane._d = d
+        return plane
 
     def __str__(self) -> str:
         return f"Plane({self.point}, {self.normal})"
@@ -244,25 +396,72 @@ class Plane:
 
     def __eq__(self, other: Plane) -> bool:
         """Checks if two planes are equal"""
-        # Two planes are equal if they have the same normal vector
-        # and the same D value
-        return is_scalar_multiple(self.normal, other.normal)\
+        # Two planes are equal if they have parallel normal vectors
+        # and the point of one lies on the other
+        return _cross_is_zero(self._abc, other._abc)\
             and self.contains_point(other.point)
 
+    @property
+    def normal_squared_magnitude(self) -> float | int:
+        """The squared magnitude of the normal vector"""
+        return self._normal_sq
+
+    def canonical_form(self) -> tuple[Vec3, float]:
+        """
+        Returns the plane in the form n . r + p = 0 where n is the unit
+        normal and p is the signed distance from the plane to the origin
+        """
+        if self._canonical is None:
+            if self._normal_sq == 0:
+                raise ValueError(
+                    "The canonical form of a plane with a zero normal "
+                    "vector is undefined"
+                )
+            length = math.sqrt(self._normal_sq)
+            a, b, c = self._abc
+            self._canonical = (
+                Vec3(a / length, b / length, c / length), self._d / length
+            )
+        return self._canonical
+
+    @property
+    def unit_normal(self) -> Vec3:
+        """The normal vector scaled to a magnitude of 1"""
+        return self.canonical_form()[0]
+
+    def signed_distance(self, point: P3) -> float:
+        """
+        Signed distance from the plane to a point. The distance is
+        positive on the side the normal vector points to
+        """
+        n, p = self.canonical_form()
+        return n.x * point.x + n.y * point.y + n.z * point.z + p
+
+    def closest_point(self, point: P3) -> P3:
+        """The orthogonal projection of a point onto the plane"""
+        if self._normal_sq == 0:
+            raise ValueError(
+                "Points cannot be projected onto a plane with a zero "
+                "normal vector"
+            )
+        a, b, c = self._abc
+        s = (a * point.x + b * point.y + c * point.z + self._d) \
+            / self._normal_sq
+        return P3(point.x - a * s, point.y - b * s, point.z - c * s)
+
     def contains_point(self, point: P3) -> bool:
         """Checks if a point is on the plane"""
-        return (
-                self.normal.x * point.x
-                + self.normal.y * point.y
-                + self.normal.z * point.z + self.d
-        ) == 0
+        a, b, c = self._abc
+        return a * point.x + b * point.y + c * point.z + self._d == 0
 
     def is_parallel(self, other: Plane | Line3) -> bool:
         """Checks if two planes or a plane and a line are parallel"""
         if type(other) == Plane:
-            return is_scalar_multiple(self.normal, other.normal)
+            return _cross_is_zero(self._abc, other._abc)
         elif type(other) == Line3:
-            return dot(self.normal, other.direction_vector) == 0
+            a, b, c = self._abc
+            dx, dy, dz = other._direction
+            return a * dx + b * dy + c * dz == 0
         else:
             raise ValueError(
                 f"Expected type Plane or Line3, got {type(other)} instead"
@@ -341,6 +540,36 @@ def is_scalar_multiple(v1: Vec3, v2: Vec3) -> bool:
         )
 
 
+def _sub(a: tuple, b: tuple) -> tuple:
+    """Subtracts two component tuples"""
+    return a[0] - b[0], a[1] - b[1], a[2] - b[2]
+
+
+def _dot(a: tuple, b: tuple) -> float | int:
+    """Dot product of two component tuples"""
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _cross(a: tuple, b: tuple) -> tuple:
+    """Cross product of two component tuples"""
+    return (
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0],
+    )
+
+
+def _cross_is_zero(a: tuple, b: tuple) -> bool:
+    """Checks if the cross product of two component tuples is zero"""
+    ax, ay, az = a
+    bx, by, bz = b
+    return (
+        ay * bz - az * by == 0
+        and az * bx - ax * bz == 0
+        and ax * by - ay * bx == 0
+    )
+
+
 def neg(n: int | float) -> int | float:
     """Returns the negative of a number"""
     return -n
@@ -353,24 +582,49 @@ class ShortestDistance:
         return p1p2_vector.magnitude()
 
     @staticmethod
-    def point_line(point: P3, line: Line3):
-        pass
+    def point_line(point: P3, line: Line3) -> float:
+        """Shortest distance between a point and a line"""
+        return ShortestDistance.point_point(point, line.closest_point(point))
 
     @staticmethod
-    def line_line(line1: Line3, line2: Line3):
-        pass
+    def line_line(line1: Line3, line2: Line3) -> float:
+        """Shortest distance between two lines"""
+        if line1._direction_sq == 0:
+            # a line with a zero direction vector is a single point
+            return ShortestDistance.point_line(
+                line1.origin_vector.to_point(), line2
+            )
+        closest = Intersection.closest_points(line1, line2)
+        if closest is None:
+            # parallel lines are everywhere the same distance apart
+            w = _sub(line2._origin, line1._origin)
+            return math.sqrt(
+                _dot(_cross(w, line1._direction), _cross(w, line1._direction))
+                / line1._direction_sq
+            )
+        return ShortestDistance.point_point(*closest)
 
     @staticmethod
-    def point_plane(point: P3, plane: Plane):
-        pass
+    def point_plane(point: P3, plane: Plane) -> float:
+        """Shortest distance between a point and a plane"""
+        return abs(plane.signed_distance(point))
 
     @staticmethod
-    def line_plane(line: Line3, plane: Plane):
-        pass
+    def line_plane(line: Line3, plane: Plane) -> float:
+        """Shortest distance between a line and a plane, which is 0
+        unless they are parallel"""
+        if not plane.is_parallel(line):
+            return 0
+        return ShortestDistance.point_plane(line.origin_vector.to_point(),
+                                            plane)
 
     @staticmethod
-    def plane_plane(plane1: Plane, plane2: Plane):
-        pass
+    def plane_plane(plane1: Plane, plane2: Plane) -> float:
+        """Shortest distance between two planes, which is 0 unless they
+        are parallel"""
+        if not plane1.is_parallel(plane2):
+            return 0
+        return ShortestDistance.point_plane(plane2.point, plane1)
 
 
 class Intersection:
@@ -383,9 +637,12 @@ class Intersection:
         the line is parallel to the plane. Otherwise, the line and
         the plane intersect in a single point.
         """
+        a, b, c = plane._abc
+        ox, oy, oz = line._origin
+        dx, dy, dz = line._direction
         try:
-            t = (neg(plane.d) - dot(plane.normal, line.origin_vector)) \
-                / dot(plane.normal, line.direction_vector)
+            t = (neg(plane.d) - (a * ox + b * oy + c * oz)) \
+                / (a * dx + b * dy + c * dz)
         except ZeroDivisionError:
             t = 0
         point_on_line = line.point_at_t(t)
@@ -399,6 +656,99 @@ class Intersection:
         # The line intersects the plane in a single point
         return point_on_line
 
+    @staticmethod
+    def closest_points(line1: Line3, line2: Line3) -> tuple[P3, P3] | None:
+        """
+        Calculate the point on each line that is closest to the other line.
+        Parallel lines have no unique closest points, so None is returned
+        """
+        n = _cross(line1._direction, line2._direction)
+        n_sq = _dot(n, n)
+        if n_sq == 0:
+            return None
+        # solving o1 + t d1 - (o2 + s d2) = k (d1 x d2) for t and s
+        w = _sub(line2._origin, line1._origin)
+        t = _dot(_cross(w, line2._direction), n) / n_sq
+        s = _dot(_cross(w, line1._direction), n) / n_sq
+        return line1.point_at_t(t), line2.point_at_t(s)
+
+    @staticmethod
+    def line_line(line1: Line3, line2: Line3,
+                  tolerance: float = 0) -> Line3 | P3 | None:
+        """
+        Calculate the intersection between two lines
+        Equal lines intersect in a line, other parallel lines and
+        skew lines do not intersect, and all remaining lines intersect
+        in a single point. Lines whose shortest distance is at most
+        tolerance are treated as intersecting. A line with a zero direction
+        vector is a single point, which is the intersection if it lies on
+        the other line.
+        """
+        for line, other in ((line1, line2), (line2, line1)):
+            if line._direction_sq == 0:
+                point = line.origin_vector.to_point()
+                if other.contains_point(point) or \
+                        ShortestDistance.point_line(point, other) <= tolerance:
+                    return point
+                return None
+        if line1.is_parallel(line2):
+            return line1 if line1 == line2 else None
+        n = _cross(line1._direction, line2._direction)
+        w = _sub(line2._origin, line1._origin)
+        # the lines are coplanar if w is perpendicular to d1 x d2
+        if abs(_dot(w, n)) > tolerance * math.sqrt(_dot(n, n)):
+            return None
+        p1, p2 = Intersection.closest_points(line1, line2)
+        if p1 == p2:
+            return p1
+        # within the tolerance the closest points differ, and their
+        # midpoint is the best estimate of the intersection
+        return P3((p1.x + p2.x) / 2, (p1.y + p2.y) / 2, (p1.z + p2.z) / 2)
+
+    @staticmethod
+    def plane_plane(plane1: Plane, plane2: Plane) -> Plane | Line3 | None:
+        """
+        Calculate the intersection between two planes
+        Equal planes intersect in a plane, other parallel planes do not
+        intersect, and all remaining planes intersect in a line.
+        """
+        if plane1.is_parallel(plane2):
+            return plane1 if plane1 == plane2 else None
+        n1, n2 = plane1._abc, plane2._abc
+        u = _cross(n1, n2)
+        u_sq = _dot(u, u)
+        # the point satisfies n1 . r = -d1 and n2 . r = -d2 and is the
+        # point of the line closest to the origin
+        a = _cross(n2, u)
+        b = _cross(u, n1)
+        h1, h2 = -plane1.d, -plane2.d
+        point = Vec3(
+            (h1 * a[0] + h2 * b[0]) / u_sq,
+            (h1 * a[1] + h2 * b[1]) / u_sq,
+            (h1 * a[2] + h2 * b[2]) / u_sq,
+        )
+        return Line3(point, Vec3(*u))
+
+    @staticmethod
+    def plane_plane_plane(plane1: Plane, plane2: Plane,
+                          plane3: Plane) -> P3 | None:
+        """
+        Calculate the single point in which three planes intersect
+        If two of the normal vectors are parallel or all three lie in one
+        plane, there is no single intersection point and None is returned.
+        """
+        n1, n2, n3 = plane1._abc, plane2._abc, plane3._abc
+        c23, c31, c12 = _cross(n2, n3), _cross(n3, n1), _cross(n1, n2)
+        determinant = _dot(n1, c23)
+        if determinant == 0:
+            return None
+        # Cramer's rule for n_i . r = -d_i
+        h1, h2, h3 = -plane1.d, -plane2.d, -plane3.d
+        return P3(*(
+            (h1 * c23[i] + h2 * c31[i] + h3 * c12[i]) / determinant
+            for i in range(3)
+        ))
+
 
 # Axis dimensions for 3D drawing
 DEFAULT_XLIM3D = (-10, 10)
@@ -411,43 +761,144 @@ ZX_PLANE = Plane(P3(0, 0, 0), Vec3(0, 1, 0))
 
 
 class Scene:
-    """A scene is used to store objects and display them"""
-    def __init__(self) -> None:
+    """
+    A scene is used to store objects and display them
+
+    With index=True, points and the tips of vectors are also inserted into
+    octrees as they are added, so drawing a view of a large scene only
+    visits the objects inside the view.
+    """
+    def __init__(self, index: bool = False) -> None:
         self.vectors: list[Vec3] = []
         self.points: list[P3] = []
         self.lines: list[Line3] = []
+        self.meshes: list = []
         self.fig = None
-
-    def add(self, *args: Vec3 | P3 | Line3) -> None:
-        """Adds objects to the scene"""
+        self.point_index = None
+        self.vector_index = None
+        if index:
+            # imported here because the octree module builds on this one
+            from .octree import Octree
+            self.point_index = Octree()
+            self.vector_index = Octree()
+
+    def add(self, *args) -> None:
+        """Adds vectors, points, lines and triangle meshes to the scene"""
+        # imported here because the mesh module builds on this one
+        from .mesh import TriangleMesh
         for obj in args:
+            # the index is updated first, so an object it rejects is not
+            # added to the list either and the indices stay aligned
             if type(obj) == Vec3:
+                if self.vector_index is not None:
+                    self.vector_index.insert(obj.to_point())
                 self.vectors.append(obj)
             elif type(obj) == P3:
+                if self.point_index is not None:
+                    self.point_index.insert(obj)
                 self.points.append(obj)
             elif type(obj) == Line3:
                 self.lines.append(obj)
+            elif type(obj) == TriangleMesh:
+                self.meshes.append(obj)
             else:
                 raise ValueError("Invalid object type")
 
-    def draw(self, show=True) -> None:
-        """Draws the scene"""
+    def __reduce__(self):
+        # the objects are pickled as a few arrays rather than one by one;
+        # imported here because the serialization module builds on this one
+        from .serialization import _encode, _decode
+        return _decode, _encode(self)
+
+    def visible(self, view) -> tuple[list[Vec3], list[P3]]:
+        """
+        Returns the vectors and points inside a view, which is an AABB or
+        a Frustum. Vectors are tested by their tips
+        """
+        from .octree import Frustum
+
+        def select(objects, index):
+            if not objects:
+                return []
+            if index is None:
+                mask = view.contains_points([(o.x, o.y, o.z) for o in objects])
+                return [o for o, inside in zip(objects, mask) if inside]
+            if isinstance(view, Frustum):
+                found = index.query_frustum(view)
+            else:
+                found = index.query_box(view)
+            return [objects[i] for i in found.tolist()]
+
+        return (select(self.vectors, self.vector_index),
+                select(self.points, self.point_index))
+
+    def bounds(self):
+        """
+        Returns the smallest AABB that contains the points and meshes of
+        the scene and the vectors, which are drawn from the origin. Returns
+        None if the scene has no points, vectors or meshes
+        """
+        # imported here because the bounds module builds on this one
+        from .bounds import AABB
+        coordinates = [(p.x, p.y, p.z) for p in self.points]
+        coordinates += [(v.x, v.y, v.z) for v in self.vectors]
+        if self.vectors:
+            coordinates.append((0, 0, 0))
+        for mesh in self.meshes:
+            coordinates.extend(map(tuple, mesh.vertices.tolist()))
+        if not coordinates:
+            return None
+        return AABB.from_points(coordinates)
+
+    def draw(self, show=True, auto_fit=False, view=None) -> None:
+        """
+        Draws the scene. With auto_fit, the axes are fitted to the bounds
+        of the scene instead of the default limits. With a view, which is
+        an AABB or a Frustum, only the points, vectors and triangles
+        inside of it are drawn
+        """
+        vectors, points, meshes = self.vectors, self.points, self.meshes
+        if view is not None:
+            vectors, points = self.visible(view)
+            meshes = [mesh.culled(view) for mesh in meshes]
+
         fig = plt.figure()
         ax = fig.add_subplot(projection='3d')
 
-        ax.set_xlim3d(DEFAULT_XLIM3D)
-        ax.set_ylim3d(DEFAULT_YLIM3D)
-        ax.set_zlim3d(DEFAULT_ZLIM3D)
-
-        for vector in self.vectors:
+        limits = DEFAULT_XLIM3D, DEFAULT_YLIM3D, DEFAULT_ZLIM3D
+        bounds = self.bounds() if auto_fit else None
+        if bounds is not None:
+            # leave a margin so objects on the boundary stay visible
+            bounds = bounds.expanded(max(1.0, float(bounds.size.max()) / 10))
+            limits = zip(bounds.minimum.tolist(), bounds.maximum.tolist())
+        xlim, ylim, zlim = limits
+        ax.set_xlim3d(xlim)
+        ax.set_ylim3d(ylim)
+        ax.set_zlim3d(zlim)
+
+        for vector in vectors:
             ax.quiver(
                 0, 0, 0,
                 vector.x, vector.y, vector.z,
                 color="red"
             )
 
-        for point in self.points:
-            ax.scatter(point.x, point.y, point.z, color="blue")
+        if points:
+            # a single call draws all points much faster than one per point
+            ax.scatter(
+                [point.x for point in points],
+                [point.y for point in points],
+                [point.z for point in points],
+                color="blue"
+            )
+
+        for mesh in meshes:
+            if len(mesh):
+                ax.plot_trisurf(
+                    mesh.vertices[:, 0], mesh.vertices[:, 1],
+                    mesh.vertices[:, 2], triangles=mesh.faces,
+                    color="orange", alpha=0.5
+                )
 
         for line in self.lines:
             xy_intersection = Intersection.line_plane(line, XY_PLANE)